@@ -146,6 +146,106 @@ class Context(object):
         rev = util.get_latest_revision(module)
         del self.modules[(module.arg, rev)]
 
+    def get_affected_modules(self, modules):
+        """Find all modules affected by a change in `modules`
+
+        A module is affected if it imports or includes an affected
+        module, or if it is the target of an augment or deviation in
+        an affected module.  Targets are modified in place when they
+        are validated, so they must be read again before they can be
+        re-validated.  The augmenting and deviating modules of a target
+        which is read again must also be read again, since the nodes
+        they added still refer to the old target.
+
+        Returns a tuple (`reset`, `reread`), where `reread` is the list
+        of the given modules, all targets and their augmenting and
+        deviating modules, and `reset` is the list of all other
+        affected modules.
+        """
+        dependents = {}
+        targets = {}
+        augmenters = {}
+        for m in self.modules.values():
+            if m is None:
+                continue
+            for s in m.search('import') + m.search('include'):
+                dependents.setdefault(s.arg, []).append(m.arg)
+            b = m.search_one('belongs-to')
+            if b is not None:
+                dependents.setdefault(b.arg, []).append(m.arg)
+            for s in m.search('augment') + m.search('deviation'):
+                node = getattr(s, 'i_target_node', None)
+                while node is not None and node.parent is not None:
+                    node = node.parent
+                if node is not None and node.arg != m.arg:
+                    targets.setdefault(m.arg, []).append(node.arg)
+                    augmenters.setdefault(node.arg, []).append(m.arg)
+
+        names = set()
+        reread_names = set()
+        queue = []
+        def add(name, reread):
+            if reread and name not in reread_names:
+                reread_names.add(name)
+            elif name in names:
+                return
+            names.add(name)
+            queue.append(name)
+
+        for m in modules:
+            add(m.arg, True)
+        while queue:
+            name = queue.pop()
+            for t in targets.get(name, []):
+                add(t, True)
+            for d in dependents.get(name, []):
+                add(d, False)
+            if name in reread_names:
+                for a in augmenters.get(name, []):
+                    add(a, True)
+
+        reset = []
+        reread = []
+        for m in self.modules.values():
+            if m is None or m.arg not in names:
+                continue
+            if m.arg in reread_names:
+                reread.append(m)
+            else:
+                reset.append(m)
+        return reset, reread
+
+    def reset_modules(self, reset, reread):
+        """Prepare affected modules for re-validation
+
+        The modules in `reset` are kept in the context, but all
+        validation results are removed.  The modules in `reread` are
+        removed from the context, and must be added again by the
+        caller.  All errors reported in any of these modules are
+        removed.
+        """
+        tops = set()
+        refs = set()
+        for m in reset + reread:
+            tops.add(m)
+            refs.add(m.pos.ref)
+        self.errors = [(pos, tag, args) for (pos, tag, args) in self.errors
+                       if pos.top not in tops and pos.ref not in refs]
+        for m in reset:
+            is_primary_module = m.i_is_primary_module
+            m.internal_reset()
+            m.i_is_primary_module = is_primary_module
+        for m in reread:
+            self.del_module(m)
+            m.internal_reset()
+            # the file may have changed, so it must be read again if the
+            # module is searched for
+            revs = self.revs.get(m.arg, [])
+            for i, (_rev, handle) in enumerate(revs):
+                if (handle is not None and handle[0] == 'parsed' and
+                    len(handle) > 4):
+                    revs[i] = (None, handle[4])
+
     def get_module(self, modulename, revision=None):
         """Return the module if it exists in the context"""
         if revision is None and modulename in self.revs:
@@ -195,7 +295,7 @@ class Context(object):
                 module = p.parse(self, ref, text)
                 if module is not None:
                     rev = util.get_latest_revision(module)
-                    revs[i] = (rev, ('parsed', module, ref, yintext))
+                    revs[i] = (rev, ('parsed', module, ref, yintext, handle))
             i += 1
 
     def search_module(self, pos, modulename, revision=None,
@@ -346,6 +446,8 @@ class Context(object):
         for m in modules:
             # may add new modules by import
             statements.validate_module(self, m)
+        # the deviations and augments may have changed the paths of nodes
+        statements.invalidate_path_cache()
 
         # check for duplicate namespaces across all loaded modules
         uri_map = {}
@@ -0,0 +1,530 @@
+"""Resident pyang server and thin client
+
+The server is started with `pyang --daemon <socket>`.  It loads all
+plugins and builds the XPath parser tables once, and then listens on a
+local Unix socket.
+
+Requests which only differ in their input files are served by the same
+template process.  The template is forked from the server, and runs
+the pyang front-end with the options, working directory and
+environment of the requests up to the point where the input files are
+read, so the module search path is scanned once.  For each set of
+modules imported by the input files, the template keeps a warm
+process, forked from the template, in which the imported modules have
+been loaded and validated, and their errors are kept.  Each request is
+served in a process forked from the warm process, which reads and
+validates the input files as a cold `pyang` does, and reports the
+kept errors as well.  The imported modules are put back in the order
+in which a cold run loads them, so the output is identical to a cold
+run.  A warm process is replaced when one of its files has changed,
+and a template when a directory in the search path has changed.
+
+A request which reads from stdin, or uses --hello, --watch, --verbose
+or transforms, is served in a process forked from the server.  So is a
+request whose input files include submodules, or which imports one of
+its input files, and it then runs in a process forked from the
+template.
+
+The client, `pyang --daemon-client <socket> <args>...`, sends its
+arguments, working directory and environment to the server, together
+with its stdin, stdout and stderr file descriptors, and waits for the
+exit code.  If the server cannot be reached, or refuses the request,
+the client runs pyang in-process instead.
+"""
+
+import io
+import os
+import sys
+import json
+import array
+import signal
+import socket
+import struct
+import traceback
+
+REFUSED = -1
+"""Exit status sent by the server when it cannot serve the request"""
+
+MAX_TEMPLATES = 8
+"""The number of template processes kept by the server"""
+
+MAX_WARM = 8
+"""The number of warm processes kept by each template process"""
+
+_hdr = struct.Struct('!I')
+_status = struct.Struct('!i')
+_nfds = 3
+
+def serve(sockpath, plugindirs):
+    """Serve pyang requests on the Unix socket `sockpath` forever.
+
+    `plugindirs` is the list of plugin directories the server was
+    initialized with.  Requests that need another set of plugins are
+    refused.
+    """
+    try:
+        os.unlink(sockpath)
+    except OSError:
+        pass
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    srv.bind(sockpath)
+    srv.listen(64)
+    pluginpath = os.getenv('PYANG_PLUGINPATH')
+    # let the kernel reap the children
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    # remove the socket when terminated
+    signal.signal(signal.SIGTERM, lambda _signo, _frame: sys.exit(0))
+    # the template processes, by key, least recently used first
+    templates = {}
+    # the keys whose template process could not be started
+    failed = set()
+    try:
+        while True:
+            conn, _addr = srv.accept()
+            try:
+                req, fds = _recv_msg(conn, _nfds)
+            except (OSError, ValueError):
+                conn.close()
+                continue
+            if (req['plugindirs'] != plugindirs or
+                req['env'].get('PYANG_PLUGINPATH') != pluginpath):
+                _send_status(conn, REFUSED)
+                _close_all(conn, fds)
+                continue
+            key = _template_key(req)
+            if key is not None and key not in failed:
+                tmpl = templates.pop(key, None)
+                if tmpl is not None and tmpl.is_stale():
+                    tmpl.close()
+                    tmpl = None
+                if tmpl is None:
+                    if len(templates) >= MAX_TEMPLATES:
+                        templates.pop(next(iter(templates))).close()
+                    tmpl = _start_template(srv, templates, conn, req, fds)
+                if tmpl is None:
+                    failed.add(key)
+                elif tmpl.forward(req, [conn.fileno()] + fds):
+                    templates[key] = tmpl
+                    _close_all(conn, fds)
+                    continue
+                else:
+                    tmpl.close()
+            pid = os.fork()
+            if pid == 0:
+                srv.close()
+                for tmpl in templates.values():
+                    tmpl.sock.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                _serve_child(conn, req, fds)
+                # not reached
+            _close_all(conn, fds)
+    finally:
+        srv.close()
+        try:
+            os.unlink(sockpath)
+        except OSError:
+            pass
+
+def request(sockpath, args, plugindirs):
+    """Run pyang with `args` in the server listening on `sockpath`.
+
+    Returns the exit code, or None if the request could not be served
+    by the server.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(sockpath)
+        _send_msg(conn, {'args': args,
+                         'cwd': os.getcwd(),
+                         'env': dict(os.environ),
+                         'plugindirs': plugindirs},
+                  [0, 1, 2])
+        data = _recv_exactly(conn, _status.size)
+    except OSError:
+        return None
+    finally:
+        conn.close()
+    if len(data) != _status.size:
+        # the server died while serving the request
+        return None
+    (code,) = _status.unpack(data)
+    if code == REFUSED:
+        return None
+    return code
+
+def _template_key(req):
+    """Return the key of the template process which can serve `req`,
+    or None if it must be served on its own.
+
+    The input files of the request are stored in `req`.
+    """
+    from .scripts import pyang_tool
+    optparser = pyang_tool.create_optparser()
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = io.StringIO()
+    try:
+        o, args = optparser.parse_args(req['args'][1:])
+    except SystemExit:
+        # the request will report the error
+        return None
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+    if len(args) == 0 or o.hello or o.watch or o.verbose or o.transforms:
+        return None
+    req['files'] = args
+    opts = sorted((name, repr(val)) for name, val in vars(o).items())
+    return json.dumps([req['args'][0], opts, req['cwd'],
+                       sorted(req['env'].items())])
+
+def _start_template(srv, templates, conn, req, fds):
+    """Start a template process for requests like `req`, which is
+    received on `conn` with the file descriptors `fds`.
+
+    Returns the template, or None if it could not be started.
+    """
+    sock, child_sock = socket.socketpair()
+    pid = os.fork()
+    if pid == 0:
+        srv.close()
+        sock.close()
+        for tmpl in templates.values():
+            tmpl.sock.close()
+        # the request is forwarded to the template
+        _close_all(conn, fds)
+        _serve_template(child_sock, req)
+        # not reached
+    child_sock.close()
+    try:
+        msg, _fds = _recv_msg(sock, 0)
+    except (OSError, ValueError):
+        sock.close()
+        return None
+    return _Process(sock, msg['stamps'])
+
+class _Process(object):
+    """A template or warm process, as seen from the process which
+    forwards the requests to it"""
+
+    def __init__(self, sock, stamps, names=()):
+        self.sock = sock
+        # [path, stamp] of each file or directory the process depends on
+        self.stamps = stamps
+        # the names of the modules loaded by the process
+        self.names = set(names)
+
+    def is_stale(self):
+        return any(_stamp(path) != stamp for path, stamp in self.stamps)
+
+    def forward(self, req, fds):
+        try:
+            _send_msg(self.sock, req, fds)
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        # the process exits when the socket is closed
+        self.sock.close()
+
+class _Template(object):
+    """The hooks of the pyang front-end in a template process
+
+    `serve` and `pre_validate` are called by `pyang_tool.run`.
+    """
+
+    def __init__(self, sock):
+        # the socket on which the requests are received
+        self.sock = sock
+        # the warm processes, by imported modules, least recently used
+        # first
+        self.warm = {}
+        # the keys of the modules loaded in a warm process
+        self.loaded = []
+        # the connection to the client, in the process which serves
+        # a request
+        self.conn = None
+        self.ctx = None
+
+    def serve(self, ctx, _filenames):
+        """Serve requests forever.
+
+        Returns the input files of a request in the process which
+        serves it.
+        """
+        self.ctx = ctx
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        _send_msg(self.sock, {'stamps': _search_path_stamps(ctx.repository)},
+                  [])
+        while True:
+            req, fds = self.next_request()
+            imports, names = self.imports(req['files'])
+            key = json.dumps(imports)
+            warm = self.warm.pop(key, None)
+            if warm is not None and warm.is_stale():
+                warm.close()
+                warm = None
+            if warm is None and imports:
+                if len(self.warm) >= MAX_WARM:
+                    self.warm.pop(next(iter(self.warm))).close()
+                sock, child_sock = socket.socketpair()
+                pid = os.fork()
+                if pid == 0:
+                    sock.close()
+                    self.close_siblings()
+                    self.sock = child_sock
+                    return self.serve_warm(imports, fds)
+                child_sock.close()
+                try:
+                    msg, _fds = _recv_msg(sock, 0)
+                    warm = _Process(sock, msg['stamps'], msg['names'])
+                except (OSError, ValueError):
+                    sock.close()
+            if warm is not None:
+                self.warm[key] = warm
+                if not (warm.names & names) and warm.forward(req, fds):
+                    _close_all(None, fds)
+                    continue
+            pid = os.fork()
+            if pid == 0:
+                return self.start_request(req, fds)
+            _close_all(None, fds)
+
+    def serve_warm(self, imports, fds):
+        """Load and validate the modules `imports`, and serve requests
+        forever.
+
+        `fds` are the file descriptors of the request for which the
+        process was started, which is received again.
+        Returns the input files of a request in the process which
+        serves it.
+        """
+        from . import error
+        from . import plugin
+        from . import statements
+        _close_all(None, fds)
+        ctx = self.ctx
+        for p in plugin.plugins:
+            p.pre_validate_ctx(ctx, [])
+        for name, rev in imports:
+            if name not in ctx.revs:
+                continue
+            nerrors = len(ctx.errors)
+            m = ctx.search_module(error.Position(''), name, rev)
+            if m is None:
+                # the import reports the error
+                del ctx.errors[nerrors:]
+            else:
+                statements.validate_module(ctx, m)
+        self.loaded = [k for k, m in ctx.modules.items() if m is not None]
+        modules = [ctx.modules[k] for k in self.loaded]
+        _send_msg(self.sock,
+                  {'stamps': [[m.pos.ref, _stamp(m.pos.ref)]
+                              for m in modules],
+                   'names': [m.arg for m in modules]},
+                  [])
+        while True:
+            req, fds = self.next_request()
+            pid = os.fork()
+            if pid == 0:
+                return self.start_request(req, fds)
+            _close_all(None, fds)
+
+    def next_request(self):
+        try:
+            return _recv_msg(self.sock, _nfds + 1)
+        except (OSError, ValueError):
+            # the socket was closed
+            os._exit(0)
+
+    def close_siblings(self):
+        for warm in self.warm.values():
+            warm.close()
+        self.warm = {}
+        self.sock.close()
+
+    def start_request(self, req, fds):
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        self.close_siblings()
+        self.conn = socket.socket(fileno=fds[0])
+        _redirect(fds[1:])
+        return req['files']
+
+    def imports(self, files):
+        """Return the modules imported by the modules in `files`, as a
+        list of [name, revision], and the names of these modules and of
+        the deviation modules.
+
+        No modules are returned if a file cannot be parsed, or is not a
+        module without submodules.
+        """
+        from . import context
+        from . import util
+        from . import yang_parser
+        from . import yin_parser
+        scratch = context.Context(self.ctx.repository)
+        imports = []
+        names = set()
+        for ref in files + self.ctx.opts.deviations:
+            try:
+                with io.open(ref, "r", encoding="utf-8") as fd:
+                    text = fd.read()
+            except (IOError, UnicodeDecodeError):
+                return [], names
+            if util.guess_format(text) == 'yin':
+                p = yin_parser.YinParser()
+            else:
+                p = yang_parser.YangParser()
+            m = p.parse(scratch, ref, text)
+            if m is None or m.keyword != 'module':
+                return [], names
+            names.add(m.arg)
+            if ref not in files:
+                continue
+            if m.search('include'):
+                # a cold run loads the submodules and their imports
+                # between the imports of the modules
+                return [], names
+            for i in m.search('import'):
+                r = i.search_one('revision-date')
+                imp = [i.arg, None if r is None else r.arg]
+                if imp not in imports:
+                    imports.append(imp)
+        if any(name in names for name, _rev in imports):
+            # an input file is imported
+            return [], names
+        return imports, names
+
+    def pre_validate(self, ctx):
+        """Put the modules loaded in the warm process after the input
+        files, where a cold run loads them."""
+        for k in self.loaded:
+            m = ctx.modules.pop(k, None)
+            if m is not None:
+                ctx.modules[k] = m
+
+def _serve_template(sock, req):
+    from .scripts import pyang_tool
+    server = _Template(sock)
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        os.chdir(req['cwd'])
+        os.environ.clear()
+        os.environ.update(req['env'])
+        devnull = os.open(os.devnull, os.O_RDWR)
+        _redirect([devnull, os.dup(devnull), os.dup(devnull)])
+        sys.argv = req['args']
+        code = _run(pyang_tool.run, init_plugins=False, server=server)
+        if server.conn is not None:
+            _send_status(server.conn, code)
+    finally:
+        os._exit(0)
+
+def _serve_child(conn, req, fds):
+    from .scripts import pyang_tool
+    try:
+        os.chdir(req['cwd'])
+        os.environ.clear()
+        os.environ.update(req['env'])
+        _redirect(fds)
+        sys.argv = req['args']
+        code = _run(pyang_tool.run, init_plugins=False)
+        _send_status(conn, code)
+    finally:
+        os._exit(0)
+
+def _run(func, **kwargs):
+    """Call `func`, and return the exit code"""
+    code = 1
+    try:
+        func(**kwargs)
+        code = 0
+    except SystemExit as ex:
+        if ex.code is None:
+            code = 0
+        elif isinstance(ex.code, int):
+            code = ex.code
+        else:
+            sys.stderr.write('%s\n' % ex.code)
+    except:
+        traceback.print_exc()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return code
+
+def _redirect(fds):
+    """Use `fds` as stdin, stdout and stderr."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for i, fd in enumerate(fds):
+        os.dup2(fd, i)
+        os.close(fd)
+
+def _search_path_stamps(repos):
+    """Return [path, stamp] for the directories, archives and databases
+    which were scanned by `repos`."""
+    paths = []
+    for d in repos.dirs:
+        if d in repos.file_repos or d == '.' or repos.no_path_recurse:
+            paths.append(d)
+        else:
+            paths.extend(root for root, _dirs, _files
+                         in os.walk(d, followlinks=True))
+    return [[path, _stamp(path)] for path in map(os.path.abspath, paths)]
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def _send_msg(conn, obj, fds):
+    payload = json.dumps(obj).encode('utf-8')
+    anc = []
+    if fds:
+        anc = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))]
+    conn.sendmsg([_hdr.pack(len(payload))], anc)
+    conn.sendall(payload)
+
+def _recv_msg(conn, nfds):
+    fdsize = nfds * array.array('i').itemsize
+    data, ancdata, _flags, _addr = conn.recvmsg(
+        _hdr.size, socket.CMSG_SPACE(fdsize) if nfds else 0)
+    fds = array.array('i')
+    for level, typ, cdata in ancdata:
+        if level == socket.SOL_SOCKET and typ == socket.SCM_RIGHTS:
+            fds.frombytes(cdata[:len(cdata) - (len(cdata) % fds.itemsize)])
+    fds = list(fds)
+    if len(data) != _hdr.size or len(fds) != nfds:
+        _close_all(None, fds)
+        raise ValueError('bad request')
+    (length,) = _hdr.unpack(data)
+    payload = _recv_exactly(conn, length)
+    if len(payload) != length:
+        _close_all(None, fds)
+        raise ValueError('bad request')
+    return json.loads(payload.decode('utf-8')), fds
+
+def _recv_exactly(conn, length):
+    chunks = []
+    while length > 0:
+        chunk = conn.recv(length)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        length -= len(chunk)
+    return b''.join(chunks)
+
+def _send_status(conn, code):
+    try:
+        conn.sendall(_status.pack(code))
+    except OSError:
+        pass
+
+def _close_all(conn, fds):
+    if conn is not None:
+        conn.close()
+    for fd in fds:
+        os.close(fd)
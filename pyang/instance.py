@@ -0,0 +1,962 @@
+"""Validation of instance documents against YANG modules
+
+An instance document, in XML or in JSON (RFC 7951), is read into a
+tree of `Node` objects, and checked against the data nodes of a set of
+validated modules:
+
+  - every element or member must be a data node in the schema
+  - leaf and leaf-list values must match their types, and in JSON,
+    the encoding of their types
+  - list entries must have all keys, and the keys must be unique
+  - "unique", "min-elements", "max-elements" and "mandatory"
+  - nodes from different cases of a choice must not be mixed
+  - leafref values must refer to existing leafs (require-instance),
+    selected by the predicates in the path
+  - "must" expressions must be true, and nodes must be present only
+    if their "when" expressions are true
+
+The modules must have been validated by `Context.validate`.  A
+`Validator` can be used for many documents; the lookup tables built
+from the schema are then reused.
+
+Errors are reported as in `Context.errors`, as (pos, tag, args)
+tuples, where `pos.ref` is the name of the instance document and
+`pos.line` the line in the document (0 for JSON documents).
+
+"must" and "when" expressions are compiled once per `Validator` and
+evaluated with `xpath_eval`.  For a "when" expression on a data node,
+the context node is a node with the same name but no value and no
+children, as in RFC 7950, section 7.21.5.
+"""
+
+import json
+import re
+import xml.parsers.expat
+
+from . import error
+from . import types
+from . import util
+from . import xpath_eval
+from . import xpath_lexer
+from . import xpath_parser
+from .error import err_add
+
+NC_URI = "urn:ietf:params:xml:ns:netconf:base:1.0"
+
+error.add_error_code(
+    'INSTANCE_SYNTAX', 1,
+    "%s")
+error.add_error_code(
+    'INSTANCE_UNKNOWN_NODE', 1,
+    "%s: unknown data node")
+error.add_error_code(
+    'INSTANCE_CONFIG_FALSE', 1,
+    "%s: state data node in configuration")
+error.add_error_code(
+    'INSTANCE_BAD_VALUE', 1,
+    "%s: %s")
+error.add_error_code(
+    'INSTANCE_BAD_JSON_VALUE', 1,
+    "%s: expected a JSON %s")
+error.add_error_code(
+    'INSTANCE_DUPLICATE_NODE', 1,
+    "%s: more than one instance of a %s")
+error.add_error_code(
+    'INSTANCE_MISSING_KEY', 1,
+    "%s: list entry without key \"%s\"")
+error.add_error_code(
+    'INSTANCE_DUPLICATE_KEY', 1,
+    "%s: duplicate list entry %s")
+error.add_error_code(
+    'INSTANCE_DUPLICATE_VALUE', 1,
+    "%s: duplicate leaf-list value \"%s\"")
+error.add_error_code(
+    'INSTANCE_NOT_UNIQUE', 1,
+    "%s: the unique constraint \"%s\" is violated by entries %d and %d")
+error.add_error_code(
+    'INSTANCE_MIN_ELEMENTS', 1,
+    "%s: %d entries, but min-elements is %d")
+error.add_error_code(
+    'INSTANCE_MAX_ELEMENTS', 1,
+    "%s: %d entries, but max-elements is %d")
+error.add_error_code(
+    'INSTANCE_MANDATORY', 1,
+    "%s: missing mandatory node \"%s\"")
+error.add_error_code(
+    'INSTANCE_MANDATORY_CHOICE', 1,
+    "%s: no case of mandatory choice \"%s\" is present")
+error.add_error_code(
+    'INSTANCE_CASES', 1,
+    "%s: nodes from more than one case of choice \"%s\" are present")
+error.add_error_code(
+    'INSTANCE_MISSING_INSTANCE', 1,
+    "%s: the leafref value \"%s\" does not refer to an existing leaf")
+error.add_error_code(
+    'INSTANCE_MUST', 1,
+    "%s: the \"must\" expression \"%s\" is false")
+error.add_error_code(
+    'INSTANCE_MUST_MESSAGE', 1,
+    "%s: %s")
+error.add_error_code(
+    'INSTANCE_WHEN', 1,
+    "%s: the node is present, but the \"when\" expression \"%s\" is false")
+error.add_error_code(
+    'INSTANCE_XPATH', 1,
+    "%s: cannot evaluate \"%s\": %s")
+
+_data_keywords = ('container', 'leaf', 'leaf-list', 'list', 'anyxml',
+                  'anydata', 'choice', 'case')
+
+_int_types = ('int8', 'int16', 'int32', 'int64',
+              'uint8', 'uint16', 'uint32', 'uint64')
+
+_re_int = re.compile(r"^[-+]?[0-9]+$")
+
+_json_kinds = {
+    'int8': 'number', 'int16': 'number', 'int32': 'number',
+    'uint8': 'number', 'uint16': 'number', 'uint32': 'number',
+    'boolean': 'boolean',
+    'empty': 'empty',
+}
+"""The kind of JSON value for a built-in type, as in RFC 7951, section 6.
+All other types are encoded as strings."""
+
+_json_kind_names = {
+    'number': "number",
+    'string': "string",
+    'boolean': "boolean",
+    'empty': "array [null]",
+}
+
+
+class Node(object):
+    """A node in an instance document.
+
+    `schema` is the schema node (None for the root), `children` maps
+    the schema nodes of the children to the lists of their instances,
+    in document order, and `value` is the value of a leaf or
+    leaf-list entry, as returned by `TypeSpec.str_to_val`.
+    """
+
+    __slots__ = ('schema', 'parent', 'children', 'value', 'line')
+
+    def __init__(self, schema, parent, line=0):
+        self.schema = schema
+        self.parent = parent
+        self.children = {}
+        self.value = None
+        self.line = line
+        if parent is not None:
+            parent.children.setdefault(schema, []).append(self)
+
+    def path(self):
+        """Return the path of the node, for error messages."""
+        if self.parent is None:
+            return "/"
+        segs = []
+        node = self
+        while node.parent is not None:
+            s = node.schema
+            seg = s.arg
+            if (node.parent.schema is None or
+                node.parent.schema.i_module.i_modulename !=
+                s.i_module.i_modulename):
+                seg = s.i_module.i_modulename + ":" + seg
+            if s.keyword == 'list':
+                for k in s.i_key:
+                    kn = node.children.get(k)
+                    if kn:
+                        seg += "[%s='%s']" % (k.arg, value_str(kn[0].value))
+            segs.append(seg)
+            node = node.parent
+        return "/" + "/".join(reversed(segs))
+
+    def child_path(self, schema):
+        """Return the path of a child node `schema`, for error messages."""
+        if (self.schema is None or
+            self.schema.i_module.i_modulename != schema.i_module.i_modulename):
+            name = schema.i_module.i_modulename + ":" + schema.arg
+        else:
+            name = schema.arg
+        return self.path().rstrip("/") + "/" + name
+
+
+class Validator(object):
+    """Validates instance documents against the data nodes of `modules`.
+
+    `target` is "data" for configuration and state data, or "config"
+    for configuration data only.
+    """
+
+    def __init__(self, ctx, modules, target="data"):
+        self.ctx = ctx
+        self.modules = modules
+        self.target = target
+        self.uri_modules = {}
+        """namespace URI -> module name, for all modules in the context"""
+        self.name_modules = {}
+        """module name -> module, for all modules in the context"""
+        for m in ctx.modules.values():
+            if m is None or m.keyword != 'module':
+                continue
+            ns = m.search_one('namespace')
+            if ns is not None:
+                self.uri_modules[ns.arg] = m.i_modulename
+            self.name_modules[m.i_modulename] = m
+        self.tables = {}
+        self.cases = {}
+        self.leaf_types = {}
+        self.xpaths = {}
+        self.leafref_paths = {}
+        self.errors = []
+
+    def validate(self, fd, ref, fmt="xml"):
+        """Validate the document read from `fd`, and return the errors.
+
+        `fd` must be opened in binary mode for XML, and may be opened
+        in text mode for JSON.  `ref` is the name of the document, for
+        error messages.
+        """
+        self.errors = []
+        self.ref = ref
+        self.leafrefs = []
+        if fmt == "json":
+            root = self.parse_json(fd)
+        else:
+            root = self.parse_xml(fd)
+        if root is not None:
+            self.env = xpath_eval.Environment(root)
+            self.check_node(root)
+            self.check_leafrefs(root)
+            self.env = None
+        return self.errors
+
+    ## schema tables
+
+    def child_table(self, schema):
+        """Return a dict mapping (module name, name) to a data node.
+
+        The data nodes are the children of `schema` (or the top-level
+        data nodes of `self.modules` if `schema` is None), and of the
+        choices and cases among them.
+        """
+        try:
+            return self.tables[schema]
+        except KeyError:
+            pass
+        table = {}
+        if schema is None:
+            for m in self.modules:
+                self._add_children(table, m.i_children, ())
+        else:
+            self._add_children(table, schema.i_children, ())
+        self.tables[schema] = table
+        return table
+
+    def _add_children(self, table, children, cases):
+        for ch in children:
+            if ch.keyword not in _data_keywords:
+                continue
+            if ch.keyword == 'choice':
+                for case in ch.i_children:
+                    self._add_children(table, case.i_children,
+                                       cases + ((ch, case),))
+                continue
+            table[(ch.i_module.i_modulename, ch.arg)] = ch
+            if cases:
+                self.cases[ch] = cases
+
+    def leaf_type(self, schema):
+        try:
+            return self.leaf_types[schema]
+        except KeyError:
+            t = self.leaf_types[schema] = schema.search_one('type')
+            return t
+
+    ## XML input
+
+    def parse_xml(self, fd):
+        """Read an XML document from `fd`, and return its root node."""
+        self.nsmap = {}
+        stack = []
+        roots = []
+        parser = xml.parsers.expat.ParserCreate(namespace_separator=" ")
+        parser.buffer_text = True
+        text = []
+
+        def start_ns(prefix, uri):
+            self.nsmap.setdefault(prefix, []).append(uri)
+
+        def end_ns(prefix):
+            self.nsmap[prefix].pop()
+
+        def start(name, attrs):
+            uri, _sep, tag = name.rpartition(" ")
+            line = parser.CurrentLineNumber
+            if not stack:
+                root = Node(None, None)
+                roots.append(root)
+                if uri == NC_URI and tag == "rpc-reply":
+                    stack.append(("wrapper", root))
+                    return
+                stack.append(("root", root))
+                if uri == NC_URI:
+                    return
+            kind, parent = stack[-1]
+            if kind == "wrapper":
+                if uri == NC_URI and tag == "data":
+                    stack.append(("root", parent))
+                else:
+                    stack.append(("skip", None))
+                return
+            if kind in ("skip", "leaf"):
+                stack.append(("skip", None))
+                return
+            schema = self.child_table(parent.schema).get(
+                (self.uri_modules.get(uri), tag))
+            if schema is None:
+                if kind == "root":
+                    path = "/" + tag
+                else:
+                    path = parent.path() + "/" + tag
+                err_add(self.errors, self.pos(line),
+                        'INSTANCE_UNKNOWN_NODE', path)
+                stack.append(("skip", None))
+                return
+            node = Node(schema, parent, line)
+            self.check_config(node)
+            if schema.keyword in ('leaf', 'leaf-list'):
+                del text[:]
+                stack.append(("leaf", node))
+            elif schema.keyword in ('anyxml', 'anydata'):
+                stack.append(("skip", node))
+            else:
+                stack.append(("inner", node))
+
+        def end(name):
+            kind, node = stack.pop()
+            if kind == "leaf":
+                self.leaf_value(node, "".join(text), self.xml_prefix)
+
+        def char_data(data):
+            if stack and stack[-1][0] == "leaf":
+                text.append(data)
+
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = char_data
+        parser.StartNamespaceDeclHandler = start_ns
+        parser.EndNamespaceDeclHandler = end_ns
+        try:
+            parser.ParseFile(fd)
+        except xml.parsers.expat.ExpatError as e:
+            err_add(self.errors, self.pos(e.lineno), 'INSTANCE_SYNTAX',
+                    str(e))
+            return None
+        return roots[0] if roots else None
+
+    def xml_prefix(self, prefix, node):
+        """Return the module name for XML namespace prefix `prefix`."""
+        uris = self.nsmap.get(prefix)
+        if not uris:
+            return None
+        return self.uri_modules.get(uris[-1])
+
+    ## JSON input
+
+    def parse_json(self, fd):
+        """Read a JSON document from `fd`, and return its root node."""
+        try:
+            doc = json.load(fd)
+        except ValueError as e:
+            err_add(self.errors, self.pos(0), 'INSTANCE_SYNTAX', str(e))
+            return None
+        root = Node(None, None)
+        if not isinstance(doc, dict):
+            err_add(self.errors, self.pos(0), 'INSTANCE_BAD_JSON_VALUE',
+                    ("/", "object"))
+            return None
+        self.json_object(doc, root)
+        return root
+
+    def json_object(self, obj, parent):
+        table = self.child_table(parent.schema)
+        pmod = (None if parent.schema is None
+                else parent.schema.i_module.i_modulename)
+        for member, val in obj.items():
+            if member.startswith("@"):
+                continue
+            mod, sep, name = member.partition(":")
+            if not sep:
+                mod, name = pmod, member
+            schema = table.get((mod, name))
+            if schema is None:
+                err_add(self.errors, self.pos(0), 'INSTANCE_UNKNOWN_NODE',
+                        parent.path().rstrip("/") + "/" + member)
+                continue
+            kw = schema.keyword
+            if kw == 'container':
+                if self.json_type(val, dict, parent, member, "object"):
+                    node = Node(schema, parent)
+                    self.check_config(node)
+                    self.json_object(val, node)
+            elif kw == 'list':
+                if self.json_type(val, list, parent, member, "array"):
+                    for entry in val:
+                        if self.json_type(entry, dict, parent, member,
+                                          "object"):
+                            node = Node(schema, parent)
+                            self.check_config(node)
+                            self.json_object(entry, node)
+            elif kw == 'leaf-list':
+                if self.json_type(val, list, parent, member, "array"):
+                    for v in val:
+                        node = Node(schema, parent)
+                        self.check_config(node)
+                        self.json_leaf(node, v)
+            elif kw == 'leaf':
+                node = Node(schema, parent)
+                self.check_config(node)
+                self.json_leaf(node, val)
+            else:
+                node = Node(schema, parent)
+                self.check_config(node)
+
+    def json_type(self, val, typ, parent, member, what):
+        if isinstance(val, typ):
+            return True
+        err_add(self.errors, self.pos(0), 'INSTANCE_BAD_JSON_VALUE',
+                (parent.path().rstrip("/") + "/" + member, what))
+        return False
+
+    def json_leaf(self, node, val):
+        """Check the JSON value `val` of a leaf or leaf-list entry."""
+        if val == [None]:
+            kind, text = 'empty', ""
+        elif isinstance(val, bool):
+            kind, text = 'boolean', "true" if val else "false"
+        elif isinstance(val, int):
+            kind, text = 'number', str(val)
+        elif isinstance(val, str):
+            kind, text = 'string', val
+        else:
+            err_add(self.errors, self.pos(0), 'INSTANCE_BAD_JSON_VALUE',
+                    (node.path(), "scalar value"))
+            return
+        self.leaf_value(node, text, self.json_prefix, kind)
+
+    def json_prefix(self, prefix, node):
+        """Return the module name for JSON prefix `prefix`."""
+        if prefix in self.name_modules:
+            return prefix
+        return None
+
+    ## values
+
+    def leaf_value(self, node, text, resolve, kind=None):
+        """Check and set the value of leaf or leaf-list entry `node`.
+
+        `resolve` is a function returning the module name for a prefix
+        in an identityref value.  For JSON, `kind` is the kind of the
+        JSON value, which must match the encoding of the type, see
+        `_json_kinds`.
+        """
+        type_ = self.leaf_type(node.schema)
+        errors = []
+        node.value = self.type_value(type_, text, node, resolve, errors,
+                                     kind)
+        if errors:
+            _pos, tag, args = errors[0]
+            if tag != 'INSTANCE_BAD_JSON_VALUE':
+                tag, args = ('INSTANCE_BAD_VALUE',
+                             (node.path(), error.err_to_str(tag, args)))
+            err_add(self.errors, self.pos(node.line), tag, args)
+            return
+        ts = type_.i_type_spec
+        if (ts is not None and ts.name == 'leafref'
+            and getattr(ts, 'require_instance', True)
+            and hasattr(ts, 'i_target_node')):
+            self.leafrefs.append(node)
+
+    def type_value(self, type_, text, node, resolve, errors, kind=None):
+        """Return `text` as a value of `type_`, or add to `errors`.
+
+        `kind` is the kind of the JSON value, or None for XML.
+        """
+        ts = type_.i_type_spec
+        if ts is None:
+            return text
+        name = ts.name
+        pos = self.pos(node.line)
+        if name == 'leafref':
+            if not hasattr(ts, 'i_target_node'):
+                return text
+            return self.type_value(self.leaf_type(ts.i_target_node), text,
+                                   node, resolve, errors, kind)
+        if name == 'union':
+            for t in ts.types:
+                val = self.type_value(t, text, node, resolve, [], kind)
+                if val is not None:
+                    return val
+            err_add(errors, pos, 'TYPE_VALUE',
+                    (text, ts.definition, 'no member type matched'))
+            return None
+        if kind is not None:
+            expected = _json_kinds.get(name, 'string')
+            if kind != expected:
+                err_add(errors, pos, 'INSTANCE_BAD_JSON_VALUE',
+                        (node.path(), _json_kind_names[expected]))
+                return None
+        if name != 'string':
+            text = text.strip()
+        if name == 'empty':
+            if text:
+                err_add(errors, pos, 'TYPE_VALUE',
+                        (text, ts.definition, 'not empty'))
+                return None
+            return ""
+        if name == 'identityref':
+            return self.identity_value(ts, text, node, resolve, errors)
+        if name in _int_types:
+            if _re_int.search(text) is None:
+                err_add(errors, pos, 'TYPE_VALUE',
+                        (text, ts.definition, 'not an integer'))
+                return None
+            val = int(text)
+        else:
+            val = ts.str_to_val(errors, pos, text, node.schema.i_module)
+            if val is None:
+                if not errors:
+                    err_add(errors, pos, 'TYPE_VALUE',
+                            (text, ts.definition, 'bad value'))
+                return None
+        if ts.validate(errors, pos, val, node.schema.i_module) is False:
+            return None
+        return val
+
+    def identity_value(self, ts, text, node, resolve, errors):
+        pos = self.pos(node.line)
+        prefix, sep, name = text.partition(":")
+        if not sep:
+            prefix, name = None, text
+        if prefix is None and resolve == self.json_prefix:
+            modname = node.schema.i_module.i_modulename
+        else:
+            modname = resolve(prefix, node)
+        module = self.name_modules.get(modname)
+        if module is None or name not in module.i_identities:
+            err_add(errors, pos, 'TYPE_VALUE',
+                    (text, ts.definition, 'identityref not found'))
+            return None
+        val = module.i_identities[name]
+        while not hasattr(ts, 'idbases') and ts.base is not None:
+            ts = ts.base
+        for idbase in getattr(ts, 'idbases', []):
+            if not types.is_derived_from(val, idbase.i_identity):
+                err_add(errors, pos, 'TYPE_VALUE',
+                        (text, ts.definition,
+                         'identityref not derived from %s'
+                         % idbase.i_identity.arg))
+                return None
+        return val
+
+    ## structure
+
+    def check_config(self, node):
+        if (self.target == "config" and
+            getattr(node.schema, 'i_config', True) is False and
+            getattr(node.parent.schema, 'i_config', True) is not False):
+            err_add(self.errors, self.pos(node.line),
+                    'INSTANCE_CONFIG_FALSE', node.path())
+
+    def check_node(self, node):
+        """Check the children of `node`, and recursively their children."""
+        present = {}
+        for schema, insts in node.children.items():
+            present.update(dict.fromkeys(self.cases.get(schema, ())))
+            kw = schema.keyword
+            if kw == 'list':
+                self.check_list(node, schema, insts)
+            elif kw == 'leaf-list':
+                self.check_leaf_list(node, schema, insts)
+            elif len(insts) > 1:
+                err_add(self.errors, self.pos(insts[1].line),
+                        'INSTANCE_DUPLICATE_NODE', (insts[1].path(), kw))
+            whens, musts = self.xpath_exprs(schema)
+            if whens or musts:
+                for inst in insts:
+                    self.check_xpath(inst, whens, musts)
+            if kw in ('container', 'list'):
+                for inst in insts:
+                    self.check_node(inst)
+        if present:
+            self.check_cases(node, present)
+        children = (node.schema.i_children if node.schema is not None
+                    else [ch for m in self.modules for ch in m.i_children])
+        self.check_mandatory(node, children, present)
+
+    def check_cases(self, node, present):
+        seen = {}
+        for choice, case in present:
+            other = seen.setdefault(choice, case)
+            if other is not case and other is not None:
+                seen[choice] = None
+                err_add(self.errors, self.pos(node.line), 'INSTANCE_CASES',
+                        (node.path(), choice.arg))
+
+    def check_mandatory(self, node, children, present):
+        """Check the mandatory nodes among `children` of `node`.
+
+        `present` has the (choice, case) pairs present in `node` as keys.
+        """
+        for ch in children:
+            kw = ch.keyword
+            if kw not in _data_keywords:
+                continue
+            if self.target == "config" and getattr(ch, 'i_config',
+                                                   True) is False:
+                continue
+            if kw == 'choice':
+                cases = [case for case in ch.i_children
+                         if (ch, case) in present]
+                if cases:
+                    self.check_mandatory(node, cases[0].i_children, present)
+                elif (ch.search_one('mandatory', 'true') is not None and
+                      not self.inactive(node, ch)):
+                    err_add(self.errors, self.pos(node.line),
+                            'INSTANCE_MANDATORY_CHOICE',
+                            (node.path(), ch.arg))
+            elif ch in node.children:
+                continue
+            elif self.inactive(node, ch):
+                continue
+            elif kw == 'leaf':
+                if ch.search_one('mandatory', 'true') is not None:
+                    err_add(self.errors, self.pos(node.line),
+                            'INSTANCE_MANDATORY', (node.path(), ch.arg))
+            elif kw in ('list', 'leaf-list'):
+                self.check_elements(node, ch, 0, node.line)
+            elif kw == 'container' and ch.search_one('presence') is None:
+                # the mandatory nodes in a non-presence container
+                # must be present in the parent
+                self.check_mandatory(node, ch.i_children, present)
+
+    def check_elements(self, node, schema, count, line):
+        mine = schema.search_one('min-elements')
+        if mine is not None and count < int(mine.arg):
+            err_add(self.errors, self.pos(line), 'INSTANCE_MIN_ELEMENTS',
+                    (node.child_path(schema), count,
+                     int(mine.arg)))
+        maxe = schema.search_one('max-elements')
+        if (maxe is not None and maxe.arg != 'unbounded' and
+            count > int(maxe.arg)):
+            err_add(self.errors, self.pos(line), 'INSTANCE_MAX_ELEMENTS',
+                    (node.child_path(schema), count,
+                     int(maxe.arg)))
+
+    def check_list(self, node, schema, entries):
+        self.check_elements(node, schema, len(entries), entries[0].line)
+        keys = getattr(schema, 'i_key', None) or []
+        if keys:
+            seen = {}
+            for e in entries:
+                kval = []
+                for k in keys:
+                    kn = e.children.get(k)
+                    if not kn:
+                        err_add(self.errors, self.pos(e.line),
+                                'INSTANCE_MISSING_KEY', (e.path(), k.arg))
+                        break
+                    kval.append(hashable(kn[0].value))
+                else:
+                    kval = tuple(kval)
+                    if kval in seen:
+                        err_add(self.errors, self.pos(e.line),
+                                'INSTANCE_DUPLICATE_KEY',
+                                (node.child_path(schema),
+                                 e.path().rpartition("/")[2]))
+                    else:
+                        seen[kval] = e
+        for u, leafs in getattr(schema, 'i_unique', []):
+            seen = {}
+            for i, e in enumerate(entries):
+                uval = []
+                for leaf in leafs:
+                    ln = descendant(e, leaf)
+                    if ln is None:
+                        break
+                    uval.append(hashable(ln.value))
+                else:
+                    uval = tuple(uval)
+                    if uval in seen:
+                        err_add(self.errors, self.pos(e.line),
+                                'INSTANCE_NOT_UNIQUE',
+                                (node.child_path(schema),
+                                 u.arg, seen[uval] + 1, i + 1))
+                    else:
+                        seen[uval] = i
+
+    def check_leaf_list(self, node, schema, entries):
+        self.check_elements(node, schema, len(entries), entries[0].line)
+        if getattr(schema, 'i_config', True) is False:
+            return
+        seen = set()
+        for e in entries:
+            v = hashable(e.value)
+            if v in seen:
+                err_add(self.errors, self.pos(e.line),
+                        'INSTANCE_DUPLICATE_VALUE',
+                        (e.path(), value_str(e.value)))
+            seen.add(v)
+
+    def xpath_exprs(self, schema):
+        """Return the compiled "when" and "must" expressions of `schema`.
+
+        Returns (whens, musts), where `whens` has (stmt, expr, up)
+        tuples, and `up` is True if the context node is the parent of
+        the instance, and `musts` has (stmt, expr) tuples.  `expr` is
+        None if the expression cannot be compiled.
+        """
+        try:
+            return self.xpaths[schema]
+        except KeyError:
+            pass
+        whens = []
+        for s in schema.search('when'):
+            up = (getattr(s, 'i_origin', None) == 'uses' or
+                  schema.keyword in ('choice', 'case'))
+            whens.append((s, self.compile_xpath(s), up))
+        # "when" on the enclosing choices and cases, and on augments
+        p = schema
+        while p is not None:
+            if p is not schema:
+                for s in p.search('when'):
+                    whens.append((s, self.compile_xpath(s), True))
+            aug = getattr(p, 'i_augment', None)
+            if aug is not None:
+                for s in aug.search('when'):
+                    whens.append((s, self.compile_xpath(s), True))
+            p = p.parent
+            if p is None or p.keyword not in ('choice', 'case'):
+                break
+        musts = [(s, self.compile_xpath(s)) for s in schema.search('must')]
+        res = self.xpaths[schema] = (whens, musts)
+        return res
+
+    def compile_xpath(self, stmt):
+        """Compile the expression of a "must" or "when" statement.
+
+        The initial context node is found as in `statements.v_xpath`.
+        """
+        q = getattr(stmt, 'i_xpath', None)
+        if q is None:
+            return None
+        if stmt.parent.keyword == 'augment':
+            node = stmt.parent.i_target_node
+        elif (getattr(stmt, 'i_origin', None) == 'uses' and
+              stmt.parent.keyword != 'choice'):
+            node = util.data_node_up(stmt.parent)
+        else:
+            node = stmt.parent
+        if node is not None:
+            node = util.closest_ancestor_data_node(node)
+        try:
+            return xpath_eval.compile_expr(q, stmt.i_orig_module, node)
+        except xpath_eval.XPathEvalError as e:
+            return e
+
+    def check_xpath(self, node, whens, musts):
+        for stmt, expr, up in whens:
+            ctxnode = when_context(node.parent, node.schema, up)
+            if self.eval_xpath(node, stmt, expr, ctxnode) is False:
+                err_add(self.errors, self.pos(node.line), 'INSTANCE_WHEN',
+                        (node.path(), stmt.arg))
+        for stmt, expr in musts:
+            if self.eval_xpath(node, stmt, expr, node) is False:
+                msg = stmt.search_one('error-message')
+                if msg is not None:
+                    err_add(self.errors, self.pos(node.line),
+                            'INSTANCE_MUST_MESSAGE', (node.path(), msg.arg))
+                else:
+                    err_add(self.errors, self.pos(node.line),
+                            'INSTANCE_MUST', (node.path(), stmt.arg))
+
+    def inactive(self, node, schema):
+        """Return True if a "when" expression of `schema` is false.
+
+        `node` is the parent of the (missing) instances of `schema`.
+        """
+        whens, _musts = self.xpath_exprs(schema)
+        for stmt, expr, up in whens:
+            ctxnode = when_context(node, schema, up)
+            if self.eval_xpath(node, stmt, expr, ctxnode) is False:
+                return True
+        return False
+
+    def eval_xpath(self, node, stmt, expr, ctxnode):
+        """Return the boolean value of `expr`, or None on errors."""
+        if expr is None:
+            return None
+        if isinstance(expr, xpath_eval.XPathEvalError):
+            e = expr
+        else:
+            try:
+                return xpath_eval.to_boolean(self.env.evaluate(expr, ctxnode))
+            except xpath_eval.XPathEvalError as ex:
+                e = ex
+        err_add(self.errors, self.pos(node.line), 'INSTANCE_XPATH',
+                (node.path(), stmt.arg, e.msg))
+        return None
+
+    def check_leafrefs(self, root):
+        """Check that all leafrefs refer to existing leafs.
+
+        If the path has predicates, the value must be the value of one
+        of the nodes selected by the path, with the leafref as context
+        node.  Otherwise, it must be the value of some instance of the
+        target leaf.
+        """
+        targets = {}
+        for node in self.leafrefs:
+            ts = self.leaf_type(node.schema).i_type_spec
+            found = None
+            expr = self.leafref_expr(ts, node.schema)
+            if expr is not None:
+                try:
+                    nodes = self.env.evaluate(expr, node)
+                except xpath_eval.XPathEvalError:
+                    nodes = None
+                if isinstance(nodes, list):
+                    val = hashable(node.value)
+                    found = any(hashable(n.value) == val for n in nodes)
+            if found is None:
+                target = ts.i_target_node
+                try:
+                    values = targets[target]
+                except KeyError:
+                    values = targets[target] = set(
+                        hashable(n.value) for n in instances(root, target))
+                found = hashable(node.value) in values
+            if not found:
+                err_add(self.errors, self.pos(node.line),
+                        'INSTANCE_MISSING_INSTANCE',
+                        (node.path(), value_str(node.value)))
+
+    def leafref_expr(self, ts, schema):
+        """Return the compiled path of the leafref type `ts` of `schema`.
+
+        Returns None if the path has no predicates, or if it cannot be
+        compiled.  Prefixes and unprefixed names are resolved as in
+        `statements.validate_leafref_path`.
+        """
+        path = getattr(ts, 'path_', None)
+        if path is None:
+            return None
+        if (path.parent.parent is not None and
+            path.parent.parent.keyword == 'typedef' and
+            path.i_module.i_version == '1'):
+            local_module = path.i_module
+        else:
+            local_module = schema.i_module
+        key = (path, local_module)
+        try:
+            return self.leafref_paths[key]
+        except KeyError:
+            pass
+        expr = None
+        try:
+            q = xpath_parser.parse(path.arg)
+            if has_predicates(q):
+                expr = xpath_eval.compile_expr(q, path.i_module, local_module)
+        except (xpath_lexer.XPathError, xpath_eval.XPathEvalError):
+            expr = None
+        self.leafref_paths[key] = expr
+        return expr
+
+    def pos(self, line):
+        pos = error.Position(self.ref)
+        pos.line = line
+        return pos
+
+
+def validate_instance(ctx, modules, fd, ref, fmt="xml", target="data"):
+    """Validate an instance document against `modules`.
+
+    Return the list of errors.  See `Validator.validate`.
+    """
+    return Validator(ctx, modules, target).validate(fd, ref, fmt)
+
+def when_context(parent, schema, up):
+    """Return the context node for a "when" expression of `schema`.
+
+    If `up` is False, this is a dummy instance of `schema` without
+    value and children.
+    """
+    if up:
+        return parent
+    node = Node(schema, None)
+    node.parent = parent
+    return node
+
+def data_parent(schema):
+    p = schema.parent
+    while p is not None and p.keyword in ('choice', 'case'):
+        p = p.parent
+    if p is None or p.keyword in ('module', 'submodule'):
+        return None
+    return p
+
+def instances(root, schema):
+    """Return all instances of `schema` in the tree under `root`."""
+    parent = data_parent(schema)
+    if parent is None:
+        return root.children.get(schema, [])
+    return [n for p in instances(root, parent)
+            for n in p.children.get(schema, [])]
+
+def descendant(node, schema):
+    """Return the instance of `schema` under `node`, or None."""
+    path = []
+    while schema is not node.schema:
+        path.append(schema)
+        schema = data_parent(schema)
+        if schema is None:
+            return None
+    for s in reversed(path):
+        insts = node.children.get(s)
+        if not insts:
+            return None
+        node = insts[0]
+    return node
+
+def has_predicates(q):
+    """Return True if the leafref path `q` has predicates.
+
+    A path which is not a plain location path, e.g. one that starts
+    with deref(), counts as having predicates.
+    """
+    if q[0] not in ('absolute', 'relative'):
+        return True
+    return any(step[0] != 'step' or step[3] for step in q[1])
+
+def hashable(val):
+    """Return `val`, or a hashable value which compares like `val`."""
+    if isinstance(val, list):
+        return tuple(val)
+    if isinstance(val, types.Decimal64Value):
+        return ('decimal64', val.value)
+    return val
+
+def value_str(val):
+    if isinstance(val, list):
+        return " ".join(val)
+    if isinstance(val, bytes):
+        return val.decode('ascii', 'replace')
+    if hasattr(val, 'i_module'):
+        # identity
+        return val.i_module.i_modulename + ":" + val.arg
+    if val is True:
+        return "true"
+    if val is False:
+        return "false"
+    return str(val)
@@ -15,6 +15,7 @@ from pyang import statements
 from pyang import error
 from pyang import util
 from pyang import types
+from pyang import snapshot
 from pyang.error import err_add
 
 sxmod = 'ietf-yang-structure-ext'
@@ -164,6 +165,9 @@ class CheckUpdatePlugin(plugin.PyangPlugin):
         error.add_error_code(
             'CHK_IO_ERROR', 1,
             "error %s: %s")
+        error.add_error_code(
+            'CHK_NOT_IN_SNAPSHOT', 1,
+            "module %s not found in the snapshot %s")
 
     def post_validate_ctx(self, ctx, modules):
         if not ctx.opts.check_update_from:
@@ -172,6 +176,9 @@ class CheckUpdatePlugin(plugin.PyangPlugin):
         check_update(ctx, modules[0])
 
 def check_update(ctx, newmod):
+    if snapshot.is_snapshot(ctx.opts.check_update_from):
+        check_update_from_snapshot(ctx, newmod)
+        return
     oldpath = os.pathsep.join(ctx.opts.old_path)
     olddir = os.path.dirname(ctx.opts.check_update_from)
     if olddir == '':
@@ -225,6 +232,48 @@ def check_update(ctx, newmod):
 
     chk_module(ctx, oldmod, newmod)
 
+def check_update_from_snapshot(ctx, newmod):
+    """Check `newmod` against the module with the same name in a
+    snapshot made by yangcheckupdate --save-snapshot."""
+    filename = ctx.opts.check_update_from
+    pos = error.Position(filename)
+    try:
+        oldctx, _members, key = snapshot.load(filename, ctx.opts)
+    except snapshot.SnapshotError as ex:
+        err_add(ctx.errors, pos, "CHK_IO_ERROR", (filename, ex))
+        return
+
+    if ctx.opts.verbose:
+        print("Loaded old modules from snapshot %s (%s)" % (filename, key))
+        print("")
+
+    oldmod = oldctx.get_module(newmod.arg)
+    if oldmod is None:
+        err_add(ctx.errors, pos, "CHK_NOT_IN_SNAPSHOT", (newmod.arg, filename))
+        return
+
+    # the snapshot holds the errors of the whole set; only the errors
+    # in the old module are of interest here
+    olderrors = [e for e in oldctx.errors if e[0].ref == oldmod.pos.ref]
+    ctx.errors.extend(olderrors)
+
+    for epos, etag, eargs in ctx.errors:
+        if (epos.ref in (newmod.pos.ref, oldmod.pos.ref)
+            and error.is_error(error.err_level(etag))):
+            return
+
+    chk_module(ctx, oldmod, newmod)
+
+
+class Report(object):
+    """Collects the errors found when comparing two modules.
+
+    Can be used instead of a Context as the `ctx` argument to
+    `chk_module`.
+    """
+    def __init__(self, opts):
+        self.opts = opts
+        self.errors = []
 
 def chk_module(ctx, oldmod, newmod):
 
@@ -246,18 +295,21 @@ def chk_module(ctx, oldmod, newmod):
     for olds in oldmod.search('grouping'):
         chk_grouping(olds, newmod, ctx)
 
+    # the top-level statements in newmod, by keyword and argument
+    newstmts = stmt_map(newmod.substmts)
+
     for olds in oldmod.search('rpc'):
-        chk_rpc(olds, newmod, ctx)
+        chk_rpc(olds, newmod, ctx, newstmts)
 
     for olds in oldmod.search('notification'):
-        chk_notification(olds, newmod, ctx)
+        chk_notification(olds, newmod, ctx, newstmts)
 
     for olds in oldmod.search('extension'):
         chk_extension(olds, newmod, ctx)
 
     if ctx.opts.check_update_structures:
         for olds in oldmod.search((sxmod, 'structure')):
-            chk_structure(olds, newmod, ctx)
+            chk_structure(olds, newmod, ctx, newstmts)
     chk_augment(oldmod, newmod, ctx)
 
     chk_i_children(oldmod, newmod, ctx)
@@ -303,13 +355,13 @@ def chk_identity(olds, newmod, ctx):
     oldbases = olds.search('base')
     newbases = news.search('base')
     if newmod.i_version == '1.1':
-        old_ids = [oldbase.i_identity.arg for oldbase in oldbases]
-        new_ids = [newbase.i_identity.arg for newbase in newbases]
-        for old_id in set(old_ids) - set(new_ids):
-            err_def_removed(oldbases[old_ids.index(old_id)], news, ctx)
-        for old_id in set(old_ids) & set(new_ids):
-            oldbase = oldbases[old_ids.index(old_id)]
-            newbase = newbases[new_ids.index(old_id)]
+        old_ids = dict_by_first(oldbases, lambda b: b.i_identity.arg)
+        new_ids = dict_by_first(newbases, lambda b: b.i_identity.arg)
+        for old_id in sorted(set(old_ids) - set(new_ids)):
+            err_def_removed(old_ids[old_id], news, ctx)
+        for old_id in sorted(set(old_ids) & set(new_ids)):
+            oldbase = old_ids[old_id]
+            newbase = new_ids[old_id]
             if oldbase.i_identity.i_module.i_modulename != \
                newbase.i_identity.i_module.i_modulename:
                 err_def_changed(oldbase, newbase, ctx)
@@ -339,20 +391,20 @@ def chk_grouping(olds, newmod, ctx):
         return
     chk_i_children(olds, news, ctx)
 
-def chk_rpc(olds, newmod, ctx):
-    news = chk_stmt(olds, newmod, ctx)
+def chk_rpc(olds, newmod, ctx, newstmts):
+    news = chk_stmt(olds, newmod, ctx, newstmts)
     if news is None:
         return
     chk_i_children(olds, news, ctx)
 
-def chk_notification(olds, newmod, ctx):
-    news = chk_stmt(olds, newmod, ctx)
+def chk_notification(olds, newmod, ctx, newstmts):
+    news = chk_stmt(olds, newmod, ctx, newstmts)
     if news is None:
         return
     chk_i_children(olds, news, ctx)
 
-def chk_structure(olds, newmod, ctx):
-    news = chk_stmt(olds, newmod, ctx)
+def chk_structure(olds, newmod, ctx, newstmts):
+    news = chk_stmt(olds, newmod, ctx, newstmts)
     if news is None:
         return
     chk_i_children(olds, news, ctx)
@@ -384,25 +436,24 @@ def chk_augment(oldmod, newmod, ctx):
     # augment of same target in newmod
     targets = {}
     for olds in oldmod.search('augment'):
-        if olds.arg in targets:
-            targets[olds.arg].extend(olds.i_children)
-        else:
-            targets[olds.arg] = list(olds.i_children) # copy
+        targets.setdefault(olds.arg, []).append(olds)
+    # this is not quite correct; it should be ok to change the
+    # prefix, so augmenting /x:a in the old module, but /y:a in the
+    # new module, if x and y are prefixes to the same module, should
+    # be ok.
+    newtargets = {}
+    for news in newmod.search('augment'):
+        newtargets.setdefault(news.arg, []).append(news)
     for t in targets:
-        newchs = []
-        # this is not quite correct; it should be ok to change the
-        # prefix, so augmenting /x:a in the old module, but /y:a in the
-        # new module, if x and y are prefixes to the same module, should
-        # be ok.
-        for news in newmod.search('augment', arg=t):
-            newchs.extend(news.i_children)
-
+        newchs = [ch for news in newtargets.get(t, []) for ch in news.i_children]
         if len(newchs) == 0:
-            for olds in oldmod.search('augment', arg=t):
+            for olds in targets[t]:
                 err_def_removed(olds, newmod, ctx)
         else:
-            for oldch in targets[t]:
-                chk_children(oldch, newchs, newmod, ctx)
+            newchs = child_map(newchs)
+            for olds in targets[t]:
+                for oldch in olds.i_children:
+                    chk_children(oldch, newchs, newmod, ctx)
 
 def chk_stmt_definitions(olds, newp, ctx, definitions):
     news = None
@@ -415,8 +466,8 @@ def chk_stmt_definitions(olds, newp, ctx, definitions):
     chk_if_feature(olds, news, ctx)
     return news
 
-def chk_stmt(olds, newp, ctx):
-    news = newp.search_one(olds.keyword, arg = olds.arg)
+def chk_stmt(olds, newp, ctx, newstmts):
+    news = newstmts.get((olds.keyword, olds.arg))
     if news is None:
         err_def_removed(olds, newp, ctx)
         return None
@@ -425,24 +476,56 @@ def chk_stmt(olds, newp, ctx):
     return news
 
 def chk_i_children(old, new, ctx):
+    # nodes augmented by other modules are checked with those modules
+    oldname = modulename(old)
+    newname = modulename(new)
+    newchs = child_map(ch for ch in new.i_children
+                       if ch.i_module.i_modulename == newname)
+    old_child_args = set()
     for oldch in old.i_children:
-        chk_child(oldch, new, ctx)
+        if oldch.i_module.i_modulename == oldname:
+            old_child_args.add(oldch.arg)
+            chk_children(oldch, newchs, new, ctx)
 
-    old_child_args = [oldch.arg for oldch in old.i_children]
-    added_new_children = [new_child for new_child in new.i_children if new_child.arg not in old_child_args]
-    for newch in added_new_children:
-        if statements.is_mandatory_node(newch):
+    for newch in newchs.values():
+        if (newch.arg not in old_child_args and
+                statements.is_mandatory_node(newch)):
             err_add(ctx.errors, newch.pos, 'CHK_NEW_MANDATORY', newch.arg)
 
-def chk_child(oldch, newp, ctx):
-    chk_children(oldch, newp.i_children, newp, ctx)
+def modulename(stmt):
+    """Return the name of the module which defines `stmt`."""
+    if stmt.keyword in ('module', 'submodule'):
+        return stmt.i_modulename
+    return stmt.i_module.i_modulename
+
+def child_map(chs):
+    """Return a dict which maps the name of each child in `chs` to it.
+
+    If two children have the same name, the first one is used.
+    """
+    return dict_by_first(chs, lambda ch: ch.arg)
+
+def stmt_map(stmts):
+    """Return a dict which maps (keyword, arg) to the statement in `stmts`.
+
+    If two statements have the same keyword and argument, the first one
+    is used.
+    """
+    return dict_by_first(stmts, lambda s: (s.keyword, s.arg))
+
+def dict_by_first(items, key):
+    res = {}
+    for item in items:
+        res.setdefault(key(item), item)
+    return res
 
 def chk_children(oldch, newchs, newp, ctx):
-    newch = None
-    for ch in newchs:
-        if ch.arg == oldch.arg:
-            newch = ch
-            break
+    """Compare `oldch` with the child with the same name in `newchs`.
+
+    `newchs` maps child names to the children of `newp`, as returned
+    by `child_map`.
+    """
+    newch = newchs.get(oldch.arg)
     if newch is None:
         err_def_removed(oldch, newp, ctx)
         return
@@ -722,9 +805,8 @@ def chk_range(old, new, oldts, newts, ctx):
     if not isinstance(nts, types.RangeTypeSpec):
         return
     if isinstance(ots, types.RangeTypeSpec):
-        tmperrors = []
-        types.validate_ranges(tmperrors, new.pos, ots.ranges, new)
-        if tmperrors:
+        # the new range must contain all values in the old range
+        if not ots.intervals.issubset(nts.intervals):
             errcode = verrcode('CHK_RESTRICTION_CHANGED', new)
             err_add(ctx.errors, new.pos, errcode, 'range')
     else:
@@ -754,26 +836,26 @@ def chk_string(old, new, oldts, newts, ctx):
 def chk_enumeration(old, new, oldts, newts, ctx):
     # verify that all old enums are still in new, with the same values
     for name, val in oldts.enums:
-        n = util.keysearch(name, 0, newts.enums)
+        n = newts.get_value(name)
         if n is None:
             err_add(ctx.errors, new.pos, 'CHK_DEF_REMOVED',
                     ('enum', name, old.pos))
-        elif n[1] != val:
+        elif n != val:
             errcode = verrcode('CHK_ENUM_VALUE_CHANGED', new)
             err_add(ctx.errors, new.pos, errcode,
-                    (name, val, n[1]))
+                    (name, val, n))
 
 def chk_bits(old, new, oldts, newts, ctx):
     # verify that all old bits are still in new, with the same positions
     for name, pos in oldts.bits:
-        n = util.keysearch(name, 0, newts.bits)
+        n = newts.get_position(name)
         if n is None:
             err_add(ctx.errors, new.pos, 'CHK_DEF_REMOVED',
                     ('bit', name, old.pos))
-        elif n[1] != pos:
+        elif n != pos:
             errcode = verrcode('CHK_BIT_POSITION_CHANGED', new)
             err_add(ctx.errors, new.pos, errcode,
-                    (name, pos, n[1]))
+                    (name, pos, n))
 
 def chk_binary(old, new, oldts, newts, ctx):
     # FIXME: see types.py; we can't check the length
@@ -53,6 +53,9 @@ Arguments
     Output the status statement value.
 --flatten-resolve-leafref
     Output the XPath of the leafref target.
+--flatten-jobs <n>
+    Flatten the modules in n worker processes. The output is the same as
+    with one process.
 
 Examples
 --------
@@ -67,11 +70,17 @@ pyang -f flatten --flatten-filter-keyword container *.yang
 
 import optparse
 import csv
+import io
+import multiprocessing
 
 from pyang import plugin
 from pyang import statements, types
 
 
+_flatten_jobs = None
+"""(plugin, ctx, modules) inherited by the worker processes"""
+
+
 def pyang_plugin_init():
     plugin.register_plugin(FlattenPlugin())
 
@@ -211,6 +220,14 @@ class FlattenPlugin(plugin.PyangPlugin):
                 help="Output the XPath of the leafref target.",
                 action="store_true",
             ),
+            optparse.make_option(
+                "--flatten-jobs",
+                dest="flatten_jobs",
+                type="int",
+                default=1,
+                help="Number of worker processes, each flattening"
+                " one module at a time (default: 1).",
+            ),
         ]
         g = optparser.add_option_group("Flatten output specific options")
         g.add_options(optlist)
@@ -248,15 +265,45 @@ class FlattenPlugin(plugin.PyangPlugin):
         )
 
     def emit(self, ctx, modules, fd):
-        output_writer = csv.DictWriter(
-            fd,
-            fieldnames=self.__field_names,
-            dialect=ctx.opts.flatten_csv_dialect,
-        )
         if not ctx.opts.flatten_no_header:
-            output_writer.writeheader()
-        for module in sorted(modules, key=lambda m: m.arg):
-            self.output_module(ctx, module, output_writer)
+            output_writer = csv.writer(
+                fd, dialect=ctx.opts.flatten_csv_dialect
+            )
+            output_writer.writerow(self.__field_names)
+        modules = sorted(modules, key=lambda m: m.arg)
+        for output in self.flatten_modules(ctx, modules):
+            fd.write(output)
+
+    def flatten_modules(self, ctx, modules):
+        """Yields the CSV output of each module, in order.
+        The modules are flattened in --flatten-jobs worker processes.
+        """
+        jobs = ctx.opts.flatten_jobs
+        if (
+            jobs <= 1
+            or len(modules) <= 1
+            or "fork" not in multiprocessing.get_all_start_methods()
+        ):
+            for module in modules:
+                yield self.flatten_module(ctx, module)
+            return
+        global _flatten_jobs
+        # the workers inherit the validated modules
+        _flatten_jobs = (self, ctx, modules)
+        pool = multiprocessing.get_context("fork").Pool(jobs)
+        try:
+            for output in pool.imap(run_flatten_job, range(len(modules))):
+                yield output
+        finally:
+            pool.terminate()
+            _flatten_jobs = None
+
+    def flatten_module(self, ctx, module):
+        """Returns the CSV output of `module`."""
+        buf = io.StringIO()
+        output_writer = csv.writer(buf, dialect=ctx.opts.flatten_csv_dialect)
+        self.output_module(ctx, module, output_writer)
+        return buf.getvalue()
 
     def output_module(
         self,
@@ -309,15 +356,6 @@ class FlattenPlugin(plugin.PyangPlugin):
         deviated = (
             getattr(child, "i_this_not_supported", False) or parent_deviated
         )
-        # Keys map to self.__field_names for CSV output
-        output_content = {
-            "xpath": statements.get_xpath(
-                child,
-                prefix_to_module=(not ctx.opts.flatten_prefix_in_xpath),
-                qualified=ctx.opts.flatten_qualified_in_xpath,
-                with_keys=ctx.opts.flatten_keys_in_xpath,
-            )
-        }
         # Sometimes we won't have the full set of YANG models...
         # Handle whether to error out or just set as "nil" for primitive type
         try:
@@ -334,7 +372,52 @@ class FlattenPlugin(plugin.PyangPlugin):
             if override_flag
             else self.get_flag(child)
         )
-        child_keys = set(statements.get_keys(child))
+        # Filters are specified as a positive in the command line arguments
+        # In this case we're negating compared to what we want to output
+        # Final statement: Always ignore input/output, children will be printed.
+        output_filters = set(
+            [
+                ctx.opts.flatten_filter_keyword
+                and child.keyword not in ctx.opts.flatten_filter_keyword,
+                ctx.opts.flatten_filter_primitive
+                and primitive_type not in ctx.opts.flatten_filter_primitive,
+                ctx.opts.flatten_filter_flag
+                and flag != ctx.opts.flatten_filter_flag,
+                child.keyword in {"input", "output"},
+            ]
+        )
+        if not any(output_filters):
+            # We want to traverse the entire tree for output
+            # Simply don't output what we don't want, don't stop processing
+            output_content = self.get_output_content(
+                ctx, child, primitive_type, flag, deviated, known_keys
+            )
+            output_writer.writerow(
+                [output_content[name] for name in self.__field_names]
+            )
+        if hasattr(child, "i_children"):
+            self.output_module(
+                ctx,
+                child,
+                output_writer,
+                deviated,
+                override_flag,
+                set(statements.get_keys(child)),
+            )
+
+    def get_output_content(
+        self, ctx, child, primitive_type, flag, deviated, known_keys
+    ):
+        """Returns the row of `child`, keyed by the CSV field names."""
+        # Keys map to self.__field_names for CSV output
+        output_content = {
+            "xpath": statements.get_xpath(
+                child,
+                prefix_to_module=(not ctx.opts.flatten_prefix_in_xpath),
+                qualified=ctx.opts.flatten_qualified_in_xpath,
+                with_keys=ctx.opts.flatten_keys_in_xpath,
+            )
+        }
         # Set the output content based on the options specified
         if ctx.opts.flatten_keyword:
             output_content["keyword"] = child.keyword
@@ -381,28 +464,7 @@ class FlattenPlugin(plugin.PyangPlugin):
                 output_content["resolved_leafref"] = None
         if set(output_content.keys()) != self.__field_names_set:
             raise Exception("Output keys do not match CSV field names!")
-        # Filters are specified as a positive in the command line arguments
-        # In this case we're negating compared to what we want to output
-        # Final statement: Always ignore input/output, children will be printed.
-        output_filters = set(
-            [
-                ctx.opts.flatten_filter_keyword
-                and child.keyword not in ctx.opts.flatten_filter_keyword,
-                ctx.opts.flatten_filter_primitive
-                and primitive_type not in ctx.opts.flatten_filter_primitive,
-                ctx.opts.flatten_filter_flag
-                and flag != ctx.opts.flatten_filter_flag,
-                child.keyword in {"input", "output"},
-            ]
-        )
-        if not any(output_filters):
-            # We want to traverse the entire tree for output
-            # Simply don't output what we don't want, don't stop processing
-            output_writer.writerow(output_content)
-        if hasattr(child, "i_children"):
-            self.output_module(
-                ctx, child, output_writer, deviated, override_flag, child_keys
-            )
+        return output_content
 
     def get_flag(self, node, parent_flag=None):
         """Pulled from tree plugin.
@@ -445,3 +507,9 @@ class FlattenPlugin(plugin.PyangPlugin):
                     xpath_element = "%s[%s]" % (xpath_element, node_key)
             xpath_elements.append(xpath_element)
         return "/%s" % "/".join(xpath_elements)
+
+
+def run_flatten_job(i):
+    """Returns the CSV output of the `i`th module, in a worker process."""
+    flatten_plugin, ctx, modules = _flatten_jobs
+    return flatten_plugin.flatten_module(ctx, modules[i])
@@ -4,6 +4,9 @@ to the YANG module(s).
 """
 
 import optparse
+import io
+import json
+import os
 
 from pyang import plugin
 from pyang import statements
@@ -27,6 +30,11 @@ class JSTreePlugin(plugin.PyangPlugin):
             optparse.make_option("--jstree-path",
                                  dest="jstree_path",
                                  help="Subtree to print"),
+            optparse.make_option("--jstree-chunk-dir",
+                                 dest="jstree_chunk_dir",
+                                 metavar="DIR",
+                                 help="""Write the subtrees to files in DIR,
+                                       which are loaded when expanded"""),
             ]
 
         g = optparser.add_option_group("JSTree output specific options")
@@ -44,6 +52,9 @@ class JSTreePlugin(plugin.PyangPlugin):
             path = None
         emit_header(modules, fd, ctx)
         emit_css(fd, ctx)
+        if ctx.opts.jstree_chunk_dir is not None:
+            emit_chunked(modules, fd, ctx, path)
+            return
         emit_js(fd, ctx)
         emit_bodystart(modules, fd, ctx)
         emit_tree(modules, fd, ctx, path)
@@ -208,7 +219,30 @@ levelcnt = [0]*100
 def emit_bodystart(modules, fd, ctx):
     fd.write("""
 <body onload="collapseAllRows();">
-<a href="http://www.tail-f.com">
+""")
+    emit_module_headers(modules, fd)
+    fd.write("""
+ <table width="100%">
+
+ <tr>
+  <!-- specifing one or more widths keeps columns
+       constant despite changes in visible content -->
+  <th align=left>
+     Element
+     <a href='#' onclick='expandAllRows();'>[+]Expand all</a>
+     <a href='#' onclick='collapseAllRows();'>[-]Collapse all</a>
+  </th>
+  <th align=left>Schema</th>
+  <th align=left>Type</th>
+  <th align=left>Flags</th>
+  <th align=left>Opts</th>
+  <th align=left>Status</th>
+  <th align=left>Path</th>
+</tr>
+""")
+
+def emit_module_headers(modules, fd):
+    fd.write("""<a href="http://www.tail-f.com">
    <img src="""+get_tailf_logo()+""" />
 </a>
 <div class="app">
@@ -243,26 +277,6 @@ def emit_bodystart(modules, fd, ctx):
             fd.write("<h1> %s: <font color=blue>%s%s</font></h1> \n"
                      % (module.keyword.capitalize(), module.arg, bstr))
 
-    fd.write("""
- <table width="100%">
-
- <tr>
-  <!-- specifing one or more widths keeps columns
-       constant despite changes in visible content -->
-  <th align=left>
-     Element
-     <a href='#' onclick='expandAllRows();'>[+]Expand all</a>
-     <a href='#' onclick='collapseAllRows();'>[-]Collapse all</a>
-  </th>
-  <th align=left>Schema</th>
-  <th align=left>Type</th>
-  <th align=left>Flags</th>
-  <th align=left>Opts</th>
-  <th align=left>Status</th>
-  <th align=left>Path</th>
-</tr>
-""")
-
 def emit_tree(modules, fd, ctx, path):
     global levelcnt
     for module in modules:
@@ -502,6 +516,376 @@ def print_node(s, module, fd, prefix, path, ctx, level=0):
         else:
             print_children(chs, module, fd, prefix, path, ctx, level)
 
+# With --jstree-chunk-dir, the page only holds the top-level rows.  The
+# rows of the children of each node are written to the file
+# DIR/chunk-<id>.js, which is loaded when the node is expanded, and the
+# paths of all nodes are written to DIR/index.js, which is loaded for
+# the search box.  The files are scripts which call a function in the
+# page, so that they can be loaded from file: URLs as well.
+
+def emit_chunked(modules, fd, ctx, path):
+    chunkdir = ctx.opts.jstree_chunk_dir
+    if not os.path.isdir(chunkdir):
+        os.makedirs(chunkdir)
+    # the chunks are loaded relative to the page
+    src = chunkdir
+    name = getattr(fd, 'name', None)
+    if isinstance(name, str) and not name.startswith('<'):
+        src = os.path.relpath(chunkdir,
+                              os.path.dirname(os.path.abspath(name)))
+    writer = ChunkWriter(ctx, chunkdir)
+    rows = []
+    for module in modules:
+        pr = module.search_one('prefix')
+        if pr is not None:
+            prstr = pr.arg
+        else:
+            prstr = ""
+        sections = [
+            (module.keyword, module.arg,
+             [ch for ch in module.i_children
+              if ch.keyword in statements.data_definition_keywords]),
+            ('', prstr + ':rpcs', module.search('rpc')),
+            ('', prstr + ':notifs', module.search('notification'))]
+        for keyword, name, chs in sections:
+            subpath = path
+            if path is not None and len(path) > 0:
+                chs = [ch for ch in chs if ch.arg == path[0]]
+                subpath = path[1:]
+            if len(chs) > 0:
+                rows.append({'name': name, 'class': keyword, 'icon': 'folder',
+                             'chunk': writer.add_chunk(chs, module, subpath,
+                                                       (0, len(rows)))})
+    writer.write_index()
+    emit_chunked_js(fd, src.replace(os.sep, '/'), rows)
+    fd.write("""
+<body onload="showRoot();">
+""")
+    emit_module_headers(modules, fd)
+    fd.write("""
+<form onsubmit="search(); return false;">
+  Search: <input id="search" size="40"/> <input type="submit" value="Find"/>
+</form>
+<div id="results"></div>
+ <table width="100%">
+ <thead>
+ <tr>
+  <th align=left>Element</th>
+  <th align=left>Schema</th>
+  <th align=left>Type</th>
+  <th align=left>Flags</th>
+  <th align=left>Opts</th>
+  <th align=left>Status</th>
+  <th align=left>Path</th>
+</tr>
+</thead>
+<tbody id="rows"></tbody>""")
+    emit_footer(fd, ctx)
+
+def js_dumps(obj):
+    # safe to put in a <script> element
+    return json.dumps(obj, separators=(',', ':')).replace('</', '<\\/')
+
+class ChunkWriter(object):
+    """Writes the chunk files and the search index of a page"""
+
+    def __init__(self, ctx, chunkdir):
+        self.ctx = ctx
+        self.chunkdir = chunkdir
+        # the (chunk, row) which is expanded to the chunk, by chunk id;
+        # chunk 0 holds the top-level rows, in the page
+        self.parents = [None]
+        # [path, chunk, row] for each node
+        self.index = []
+
+    def add_chunk(self, chs, module, path, parent):
+        """Write the chunk with the rows of `chs`, and the chunks of their
+        children.  Returns the id of the chunk."""
+        chunk = len(self.parents)
+        self.parents.append(parent)
+        rows = []
+        for ch in chs:
+            row = node_row(ch, module, self.ctx)
+            pathstr = statements.mk_path_str(ch, True)
+            if not self.ctx.opts.jstree_no_path:
+                row['path'] = pathstr
+            self.index.append([pathstr, chunk, len(rows)])
+            if hasattr(ch, 'i_children'):
+                chs1 = ch.i_children
+                path1 = path
+                if path is not None and len(path) > 0:
+                    chs1 = [c for c in chs1 if c.arg == path[0]]
+                    path1 = path[1:]
+                if len(chs1) > 0:
+                    row['chunk'] = self.add_chunk(chs1, module, path1,
+                                                  (chunk, len(rows)))
+            rows.append(row)
+        self.write('chunk-%d.js' % chunk,
+                   'jstreeChunk(%d,%s);\n' % (chunk, js_dumps(rows)))
+        return chunk
+
+    def write_index(self):
+        self.write('index.js', 'jstreeIndex(%s,%s);\n' %
+                   (js_dumps(self.index), js_dumps(self.parents)))
+
+    def write(self, filename, text):
+        with io.open(os.path.join(self.chunkdir, filename), 'w',
+                     encoding='ascii') as fd:
+            fd.write(text)
+
+def node_row(s, module, ctx):
+    """Return the columns of the row of `s` in a chunk, as print_node
+    prints them.  Empty columns are left out."""
+    if s.i_module.i_modulename == module.i_modulename:
+        name = s.arg
+    else:
+        name = s.i_module.i_prefix + ':' + s.arg
+    row = {'class': util.keyword_to_str(s.keyword),
+           'flags': get_flags_str(s)}
+    if s.keyword in ('list', 'input', 'output', 'rpc', 'notification',
+                     'action', 'container', 'choice', 'case'):
+        row['icon'] = 'folder'
+        if s.keyword in ('action', 'rpc', 'notification'):
+            row['type'] = 'parameters'
+            row['typeinfo'] = action_params(s)
+        if s.keyword == 'container':
+            p = s.search_one('presence')
+            if p is not None:
+                row['opts'] = 'Presence'
+                row['presence'] = p.arg
+        elif s.keyword == 'choice':
+            name = '(' + s.arg + ')'
+            m = s.search_one('mandatory')
+            if m is None or m.arg == 'false':
+                row['opts'] = 'Choice'
+        elif s.keyword == 'case':
+            name = ':(' + s.arg + ')'
+    elif s.keyword == ('tailf-common', 'action'):
+        row['icon'] = row['class'] = 'action'
+        row['type'] = 'parameters'
+        row['typeinfo'] = action_params(s)
+    else:
+        row['icon'] = row['class']
+        if s.keyword == 'leaf-list':
+            row['opts'] = '*'
+        elif s.keyword == 'leaf' and not hasattr(s, 'i_is_key'):
+            m = s.search_one('mandatory')
+            if m is None or m.arg == 'false':
+                row['opts'] = '?'
+        row['type'] = get_typename(s)
+        row['typeinfo'] = typestring(s)
+    if s.keyword == 'list' and s.search_one('key') is not None:
+        name += '[' + s.search_one('key').arg +  ']'
+    row['name'] = name
+    descr = s.search_one('description')
+    if descr is not None:
+        row['descr'] = descr.arg
+    status = get_status_str(s)
+    row['status'] = getattr(status, 'arg', status)
+    return dict((k, v) for k, v in row.items() if v)
+
+def emit_chunked_js(fd, chunkdir, rows):
+    fd.write("""
+<style type="text/css" media="all">
+.folder.open {background-image: """ + get_folder_open_img() + """;}
+#results {margin: 2px 0 4px 5px;}
+</style>
+<script language="javascript">
+var chunkDir = """ + js_dumps(chunkdir) + """;
+var chunks = [];
+var loading = [];
+var index = null;
+var indexLoading = null;
+var selected = null;
+
+function loadScript(src) {
+  var s = document.createElement("script");
+  s.src = src;
+  document.getElementsByTagName("head")[0].appendChild(s);
+}
+
+function jstreeChunk(id, rows) {
+  chunks[id] = rows;
+  var callbacks = loading[id] || [];
+  delete loading[id];
+  for (var i = 0; i < callbacks.length; i++)
+    callbacks[i](rows);
+}
+
+function loadChunk(id, callback) {
+  if (chunks[id]) {
+    callback(chunks[id]);
+  } else if (loading[id]) {
+    loading[id].push(callback);
+  } else {
+    loading[id] = [callback];
+    loadScript(chunkDir + "/chunk-" + id + ".js");
+  }
+}
+
+function jstreeIndex(entries, parents) {
+  index = {entries: entries, parents: parents};
+  var callbacks = indexLoading;
+  indexLoading = null;
+  for (var i = 0; i < callbacks.length; i++)
+    callbacks[i]();
+}
+
+function loadIndex(callback) {
+  if (index) {
+    callback();
+  } else if (indexLoading) {
+    indexLoading.push(callback);
+  } else {
+    indexLoading = [callback];
+    loadScript(chunkDir + "/index.js");
+  }
+}
+
+function addCell(tr, text, title, nowrap) {
+  var td = document.createElement("td");
+  td.noWrap = nowrap;
+  var parent = td;
+  if (title) {
+    parent = document.createElement("abbr");
+    parent.title = title;
+    td.appendChild(parent);
+  }
+  parent.appendChild(document.createTextNode(text || ""));
+  tr.appendChild(td);
+}
+
+function makeRow(row, level, chunk, i) {
+  var tr = document.createElement("tr");
+  tr.className = "a";
+  tr.id = "row-" + chunk + "-" + i;
+  tr.level = level;
+  var td = document.createElement("td");
+  td.noWrap = true;
+  var div = document.createElement("div");
+  div.style.marginLeft = (1.5 * (level - 1)) + "em";
+  var a = document.createElement("a");
+  a.className = row.icon || "";
+  a.innerHTML = "&nbsp;";
+  if (row.chunk) {
+    tr.chunk = row.chunk;
+    a.href = "#";
+    a.onclick = function () { toggleRow(tr); return false; };
+  }
+  div.appendChild(a);
+  var abbr = document.createElement("abbr");
+  abbr.title = row.descr || "No description";
+  var name = abbr;
+  if (row.opts == "?") {
+    name = document.createElement("em");
+    abbr.appendChild(name);
+  }
+  name.appendChild(document.createTextNode(row.name));
+  div.appendChild(abbr);
+  td.appendChild(div);
+  tr.appendChild(td);
+  addCell(tr, row["class"], null, true);
+  addCell(tr, row.type, row.typeinfo, true);
+  addCell(tr, row.flags, null, true);
+  addCell(tr, row.opts, row.presence, false);
+  addCell(tr, row.status, null, false);
+  addCell(tr, row.path, null, true);
+  return tr;
+}
+
+function folderOf(tr) {
+  return tr.cells[0].getElementsByTagName("A")[0];
+}
+
+function expandRow(tr, callback) {
+  loadChunk(tr.chunk, function (rows) {
+    if (!tr.expanded) {
+      var next = tr.nextSibling;
+      for (var i = 0; i < rows.length; i++) {
+        tr.parentNode.insertBefore(makeRow(rows[i], tr.level + 1,
+                                           tr.chunk, i), next);
+      }
+      tr.expanded = true;
+      folderOf(tr).className = "folder open";
+    }
+    if (callback) callback();
+  });
+}
+
+function collapseRow(tr) {
+  var next = tr.nextSibling;
+  while (next && next.level > tr.level) {
+    var r = next;
+    next = next.nextSibling;
+    r.parentNode.removeChild(r);
+  }
+  tr.expanded = false;
+  folderOf(tr).className = "folder";
+}
+
+function toggleRow(tr) {
+  if (tr.expanded) collapseRow(tr);
+  else expandRow(tr);
+}
+
+function showRoot() {
+  var tbody = document.getElementById("rows");
+  var rows = chunks[0];
+  for (var i = 0; i < rows.length; i++)
+    tbody.appendChild(makeRow(rows[i], 1, 0, i));
+}
+
+// expand the rows down to row i in chunk, and select it
+function reveal(chunk, i) {
+  var chain = [];
+  for (var c = chunk; c != 0; c = index.parents[c][0])
+    chain.unshift(index.parents[c]);
+  function step(k) {
+    if (k < chain.length) {
+      var tr = document.getElementById("row-" + chain[k][0] + "-" +
+                                       chain[k][1]);
+      if (tr.expanded) step(k + 1);
+      else expandRow(tr, function () { step(k + 1); });
+      return;
+    }
+    if (selected) selected.style.background = "";
+    selected = document.getElementById("row-" + chunk + "-" + i);
+    selected.style.background = "#ffd";
+    selected.scrollIntoView();
+  }
+  step(0);
+}
+
+function search() {
+  var text = document.getElementById("search").value.toLowerCase();
+  var results = document.getElementById("results");
+  results.innerHTML = "";
+  if (text.length == 0) return;
+  loadIndex(function () {
+    var found = 0;
+    var entries = index.entries;
+    for (var i = 0; i < entries.length && found < 100; i++) {
+      var e = entries[i];
+      if (e[0].toLowerCase().indexOf(text) < 0) continue;
+      var a = document.createElement("a");
+      a.href = "#";
+      a.appendChild(document.createTextNode(e[0]));
+      a.onclick = (function (e) {
+        return function () { reveal(e[1], e[2]); return false; };
+      })(e);
+      results.appendChild(a);
+      results.appendChild(document.createElement("br"));
+      found++;
+    }
+    if (found == 0)
+      results.appendChild(document.createTextNode("No match"));
+  });
+}
+
+jstreeChunk(0, """ + js_dumps(rows) + """);
+</script>
+""")
+
 def get_status_str(s):
     status = s.search_one('status')
     if status is None or status.arg == 'current':
@@ -18,22 +18,39 @@
 
 This plugin takes a YANG data model and produces a JSON driver file
 that can be used by the *json2xml* script for translating a valid JSON
-configuration or state data to XML.
+configuration or state data to XML, and by the *xml2json* script for
+the reverse translation.
 """
 
 import json
+import optparse
 
 from pyang import plugin, error
 from pyang.util import unique_prefixes
+from pyang.scripts.json2xml import type_conversion
 
 def pyang_plugin_init():
     plugin.register_plugin(JtoXPlugin())
 
 class JtoXPlugin(plugin.PyangPlugin):
+    compiled_version = 3
+    """version of the compiled driver format"""
+
     def add_output_format(self, fmts):
         self.multiple_modules = True
         fmts['jtox'] = self
 
+    def add_opts(self, optparser):
+        optlist = [
+            optparse.make_option("--jtox-compiled",
+                                 dest="jtox_compiled",
+                                 action="store_true",
+                                 help="""Write the driver as a flat node
+                                       table, which is loaded faster"""),
+            ]
+        g = optparser.add_option_group("JTOX output specific options")
+        g.add_options(optlist)
+
     def setup_fmt(self, ctx):
         ctx.implicit_errors = False
 
@@ -55,7 +72,47 @@ class JtoXPlugin(plugin.PyangPlugin):
                     "string" if typ is None else self.base_type(ann, typ))
         for module in modules:
             self.process_children(module, tree, None)
-        json.dump({"modules": mods, "tree": tree, "annotations": annots}, fd)
+        if ctx.opts.jtox_compiled:
+            nodes, types = self.compile_tree(tree)
+            json.dump({"version": self.compiled_version, "modules": mods,
+                       "nodes": nodes, "types": types,
+                       "conversions": [type_conversion(t) for t in types],
+                       "annotations": annots}, fd, separators=(",", ":"))
+        else:
+            json.dump({"modules": mods, "tree": tree,
+                       "annotations": annots}, fd)
+
+    def compile_tree(self, tree):
+        """Return the node table and type table for `tree`.
+
+        Node 0 is the root.  Each node is the node specification from
+        `tree`, except that a container or list maps the names of its
+        children to their node ids, and a leaf or leaf-list has the
+        index of its type in the type table, in which equal type
+        specifications are stored only once.  The conversion of each
+        type, which json2xml dispatches on, is written in a parallel
+        table.
+        """
+        nodes = [["root", {}]]
+        types = []
+        type_ids = {}
+        def add(children, cmap):
+            for name, ndata in children.items():
+                cmap[name] = len(nodes)
+                node = [ndata[0]]
+                nodes.append(node)
+                if ndata[0] in ("container", "list"):
+                    node.append({})
+                    add(ndata[1], node[1])
+                    node.extend(ndata[2:])
+                elif ndata[0] in ("leaf", "leaf-list"):
+                    tkey = json.dumps(ndata[1])
+                    if tkey not in type_ids:
+                        type_ids[tkey] = len(types)
+                        types.append(ndata[1])
+                    node.append(type_ids[tkey])
+        add(tree, nodes[0][1])
+        return nodes, types
 
     def process_children(self, node, parent, pmod):
         """Process all children of `node`, except "rpc" and "notification".
@@ -86,8 +143,9 @@ class JtoXPlugin(plugin.PyangPlugin):
             modname = ch.i_module.i_modulename
             parent[nodename] = ndata
 
-    def base_type(self, ch, of_type):
-        """Return the base type of `of_type`."""
+    def type_chain(self, ch, of_type):
+        """Return `of_type` and the types it is derived from."""
+        res = [of_type]
         while 1:
             if of_type.arg == "leafref":
                 if of_type.i_module.i_version == "1":
@@ -99,9 +157,28 @@ class JtoXPlugin(plugin.PyangPlugin):
             else:
                 node = of_type.i_typedef
             of_type = node.search_one("type")
+            res.append(of_type)
+        return res
+
+    def base_type(self, ch, of_type):
+        """Return the base type of `of_type`."""
+        of_type = self.type_chain(ch, of_type)[-1]
         if of_type.arg == "decimal64":
             return [of_type.arg, int(of_type.search_one("fraction-digits").arg)]
         elif of_type.arg == "union":
-            return [of_type.arg, [self.base_type(ch, x) for x in of_type.i_type_spec.types]]
+            return [of_type.arg, [self.member_type(ch, x) for x in of_type.i_type_spec.types]]
         else:
             return of_type.arg
+
+    def member_type(self, ch, of_type):
+        """Return the base type of the union member `of_type`.
+
+        A string member with a length or pattern restriction is
+        ["string", "restricted"], since it does not match every value.
+        """
+        res = self.base_type(ch, of_type)
+        if res == "string":
+            for t in self.type_chain(ch, of_type):
+                if t.search_one("length") or t.search_one("pattern"):
+                    return [res, "restricted"]
+        return res
@@ -8,7 +8,11 @@ and [I-D.ietf-core-yang-library] for more information.
 
 import optparse
 import sys
+import bisect
 import collections
+import contextlib
+import io
+import multiprocessing
 import re
 import os
 import errno
@@ -64,6 +68,18 @@ class SidPlugin(plugin.PyangPlugin):
                                  type="string",
                                  dest="extra_sid_range",
                                  help="Add an extra SID range during a .sid file update."),
+            optparse.make_option("--sid-manifest",
+                                 action="store",
+                                 type="string",
+                                 dest="sid_manifest",
+                                 help="Generate, update or check the .sid files "
+                                 "listed in a manifest, for all given modules."),
+            optparse.make_option("--sid-jobs",
+                                 action="store",
+                                 type="int",
+                                 dest="sid_jobs",
+                                 default=1,
+                                 help="Number of processes used with --sid-manifest."),
             ]
 
         g = optparser.add_option_group("SID file specific options")
@@ -85,12 +101,17 @@ class SidPlugin(plugin.PyangPlugin):
             nbr_option_specified += 1
         if ctx.opts.check_sid_file is not None:
             nbr_option_specified += 1
+        if ctx.opts.sid_manifest is not None:
+            nbr_option_specified += 1
         if nbr_option_specified == 0:
             return
         if nbr_option_specified > 1:
             sys.stderr.write("Invalid option, only one process on .sid file can be requested.\n")
             return
 
+        if ctx.opts.sid_manifest is not None:
+            sys.exit(process_manifest(ctx, modules))
+
         fatal_error = False
         for _, etag, _ in ctx.errors:
             if not error.is_warning(error.err_level(etag)):
@@ -100,61 +121,264 @@ class SidPlugin(plugin.PyangPlugin):
             sys.stderr.write("Invalid YANG module\n")
             return
 
-        sid_file = SidFile()
+        sid_file = new_sid_file(ctx, ctx.opts.generate_sid_file,
+                                ctx.opts.update_sid_file,
+                                ctx.opts.check_sid_file,
+                                ctx.opts.extra_sid_range)
+        if sid_file is None:
+            return
+        sys.exit(run_sid_file(sid_file, modules[0]))
 
-        if ctx.opts.sid_registration_info:
-            sid_file.sid_registration_info = True
+def new_sid_file(ctx, generate, update, check, extra_range):
+    """Return a SidFile which generates, updates or checks a .sid file,
+    or None if the arguments are invalid."""
+    sid_file = SidFile()
 
-        if ctx.opts.generate_sid_file is not None:
-            sid_file.range = ctx.opts.generate_sid_file
-            sid_file.is_consistent = False
-            sid_file.sid_file_created = True
+    if ctx.opts.sid_registration_info:
+        sid_file.sid_registration_info = True
 
-        if ctx.opts.update_sid_file is not None:
-            sid_file.input_file_name = ctx.opts.update_sid_file
+    if generate is not None:
+        sid_file.range = generate
+        sid_file.is_consistent = False
+        sid_file.sid_file_created = True
 
-        if ctx.opts.check_sid_file is not None:
-            sid_file.input_file_name = ctx.opts.check_sid_file
-            sid_file.check_consistency = True
-            if not sid_file.sid_registration_info:
-                print("Checking consistency of '%s'" % sid_file.input_file_name)
-
-        if ctx.opts.extra_sid_range is not None:
-            if ctx.opts.update_sid_file is not None:
-                sid_file.extra_range = ctx.opts.extra_sid_range
-            else:
-                sys.stderr.write(
-                    "An extra SID range can be specified only during a .sid file update.\n")
-                return
+    if update is not None:
+        sid_file.input_file_name = update
 
-        if ctx.opts.list_sid:
-            sid_file.list_content = True
+    if check is not None:
+        sid_file.input_file_name = check
+        sid_file.check_consistency = True
+        if not sid_file.sid_registration_info:
+            print("Checking consistency of '%s'" % sid_file.input_file_name)
 
-        if ctx.opts.finalize_sid:
-            print("Will mark unstable allocations finalized")
-            sid_file.check_consistency = False
-            sid_file.is_consistent = False
-            sid_file.finalize_sid  = True
+    if extra_range is not None:
+        if update is not None:
+            sid_file.extra_range = extra_range
+        else:
+            sys.stderr.write(
+                "An extra SID range can be specified only during a .sid file update.\n")
+            return None
+
+    if ctx.opts.list_sid:
+        sid_file.list_content = True
+
+    if ctx.opts.finalize_sid:
+        print("Will mark unstable allocations finalized")
+        sid_file.check_consistency = False
+        sid_file.is_consistent = False
+        sid_file.finalize_sid  = True
+
+    return sid_file
+
+def run_sid_file(sid_file, module):
+    """Process the .sid file of `module`.  Returns the exit code."""
+    try:
+        sid_file.process_sid_file(module)
+
+    except SidParsingError as e:
+        sys.stderr.write("ERROR, %s\n" % e)
+    except SidFileError as e:
+        sys.stderr.write("ERROR in '%s', %s\n" % (sid_file.input_file_name, e))
+    except EnvironmentError as e:
+        if e.errno == errno.ENOENT:
+            sys.stderr.write("ERROR, file '%s' not found\n" % e.filename)
+        else:
+            sys.stderr.write("ERROR, in file '%s' " % e.filename)
+    except JSONDecodeError as e:
+        sys.stderr.write("ERROR in '%s', %s\n" % (sid_file.input_file_name, e))
+    except ValueError as e:
+        sys.stderr.write("ERROR in '%s', invalid JSON content\n" % sid_file.input_file_name)
+    else:
+        return 0
+    return 1
 
+############################################################
+# Batch mode, for the .sid files of many modules validated in one context
+
+manifest_actions = ('generate-file', 'update-file', 'check-file')
+
+def read_manifest(filename):
+    """Read a manifest of .sid files to generate, update or check.
+
+    The manifest is a JSON list of objects with the keys 'module' and
+    one of 'generate-file', 'update-file' and 'check-file', and
+    optionally 'extra-range'.  The values are as for the corresponding
+    --sid-* options, and .sid files are relative to the manifest.
+    """
+    with open(filename) as f:
+        entries = json.load(f, object_pairs_hook=collections.OrderedDict)
+    if not isinstance(entries, list):
+        raise SidFileError("the manifest must be a list.")
+    basedir = os.path.dirname(filename)
+    names = set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise SidFileError("invalid entry '%s'." % entry)
+        for key in entry:
+            if key not in ('module', 'extra-range') + manifest_actions:
+                raise SidFileError("invalid key '%s'." % key)
+            if not isinstance(entry[key], str):
+                raise SidFileError("invalid '%s' value '%s'." % (key, entry[key]))
+        if 'module' not in entry:
+            raise SidFileError("mandatory field 'module' not present")
+        if entry['module'] in names:
+            raise SidFileError("module '%s' listed twice." % entry['module'])
+        names.add(entry['module'])
+        actions = [key for key in manifest_actions if key in entry]
+        if len(actions) != 1:
+            raise SidFileError("module '%s' needs one of '%s'."
+                               % (entry['module'], "', '".join(manifest_actions)))
+        for key in ('update-file', 'check-file'):
+            if key in entry:
+                entry[key] = os.path.join(basedir, entry[key])
+    return entries
+
+def get_module_closure(ctx, module):
+    """Return the modules and submodules which `module` imports or
+    includes, directly or indirectly, and `module` itself."""
+    closure = []
+    seen = set()
+    todo = [module]
+    while todo:
+        m = todo.pop()
+        if id(m) in seen:
+            continue
+        seen.add(id(m))
+        closure.append(m)
+        for stmt in m.search('import') + m.search('include'):
+            rev = stmt.search_one('revision-date')
+            other = ctx.get_module(stmt.arg, rev.arg if rev is not None else None)
+            if other is not None:
+                todo.append(other)
+    return closure
+
+def parse_range(srange):
+    match = re.match(r'^(\d+):(\d+)$', srange)
+    if match is None:
+        return None
+    low = int(match.group(1))
+    return low, low + int(match.group(2))
+
+def get_entry_ranges(entry):
+    """Return the assignment ranges of a manifest entry, as [low, high)
+    intervals.  Invalid ranges and files are reported when the entry is
+    processed."""
+    ranges = []
+    srange = entry.get('generate-file')
+    if srange is not None and parse_range(srange) is not None:
+        ranges.append(parse_range(srange))
+    filename = entry.get('update-file') or entry.get('check-file')
+    if filename is not None:
         try:
-            sid_file.process_sid_file(modules[0])
-
-        except SidParsingError as e:
-            sys.stderr.write("ERROR, %s\n" % e)
-        except SidFileError as e:
-            sys.stderr.write("ERROR in '%s', %s\n" % (sid_file.input_file_name, e))
-        except EnvironmentError as e:
-            if e.errno == errno.ENOENT:
-                sys.stderr.write("ERROR, file '%s' not found\n" % e.filename)
-            else:
-                sys.stderr.write("ERROR, in file '%s' " % e.filename)
-        except JSONDecodeError as e:
-            sys.stderr.write("ERROR in '%s', %s\n" % (sid_file.input_file_name, e))
-        except ValueError as e:
-            sys.stderr.write("ERROR in '%s', invalid JSON content\n" % sid_file.input_file_name)
+            with open(filename) as f:
+                content = json.load(f)
+            for arange in content['assignment-ranges']:
+                low = arange['entry-point']
+                ranges.append((low, low + arange['size']))
+        except (EnvironmentError, ValueError, KeyError, TypeError):
+            pass
+    srange = entry.get('extra-range')
+    if srange is not None and parse_range(srange) is not None:
+        ranges.append(parse_range(srange))
+    return ranges
+
+def check_overlapping_ranges(entries):
+    """Verify that the assignment ranges of different modules are
+    distinct."""
+    index = []
+    for entry in entries:
+        for low, high in get_entry_ranges(entry):
+            index.append((low, high, entry['module']))
+    index.sort()
+    high_module = None
+    max_high = None
+    for low, high, module in index:
+        if max_high is not None and low < max_high and module != high_module:
+            raise SidFileError("overlapping ranges in modules '%s' and '%s'."
+                               % (high_module, module))
+        if max_high is None or high > max_high:
+            max_high = high
+            high_module = module
+
+def process_manifest(ctx, modules):
+    """Process the .sid files in the manifest given by --sid-manifest,
+    for the modules validated in `ctx`.  Returns the exit code."""
+    filename = ctx.opts.sid_manifest
+    try:
+        entries = read_manifest(filename)
+        check_overlapping_ranges(entries)
+    except EnvironmentError as e:
+        sys.stderr.write("ERROR, file '%s' not found\n" % e.filename)
+        return 1
+    except (SidFileError, ValueError) as e:
+        sys.stderr.write("ERROR in '%s', %s\n" % (filename, e))
+        return 1
+
+    by_name = dict((m.arg, m) for m in modules)
+    ret = 0
+    jobs = []
+    for entry in entries:
+        module = by_name.get(entry['module'])
+        if module is None:
+            sys.stderr.write("ERROR in '%s', module '%s' not given\n"
+                             % (filename, entry['module']))
+            ret = 1
+            continue
+        jobs.append((entry, module))
+
+    global _manifest_jobs
+    _manifest_jobs = (ctx, jobs)
+    for res, out, err in run_manifest_jobs(len(jobs), ctx.opts.sid_jobs):
+        sys.stdout.write(out)
+        sys.stderr.write(err)
+        ret = max(ret, res)
+    return ret
+
+_manifest_jobs = None
+"""the (ctx, [(entry, module)]) processed by process_manifest"""
+
+def run_manifest_jobs(njobs, nprocs):
+    """Yield the results of `run_manifest_job` for each job, in order,
+    computed in `nprocs` worker processes."""
+    if (nprocs <= 1 or njobs <= 1
+        or 'fork' not in multiprocessing.get_all_start_methods()):
+        for i in range(njobs):
+            yield run_manifest_job(i)
+        return
+    # the workers inherit the validated modules
+    pool = multiprocessing.get_context('fork').Pool(nprocs)
+    try:
+        for res in pool.imap(run_manifest_job, range(njobs)):
+            yield res
+    finally:
+        pool.terminate()
+
+def run_manifest_job(i):
+    """Process the .sid file of the `i`th module in the manifest.
+
+    Returns (exit code, output, error output).
+    """
+    ctx, jobs = _manifest_jobs
+    entry, module = jobs[i]
+    out = io.StringIO()
+    err = io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        print("\n*** %s" % module.arg)
+        res = 1
+        refs = set(m.pos.ref for m in get_module_closure(ctx, module))
+        check = entry.get('check-file')
+        for epos, etag, _ in ctx.errors:
+            if epos.ref in refs and (check is not None or
+                                     not error.is_warning(error.err_level(etag))):
+                sys.stderr.write("Invalid YANG module '%s'\n" % module.arg)
+                break
         else:
-            sys.exit(0)
-        sys.exit(1)
+            sid_file = new_sid_file(ctx, entry.get('generate-file'),
+                                    entry.get('update-file'), check,
+                                    entry.get('extra-range'))
+            if sid_file is not None:
+                res = run_sid_file(sid_file, module)
+    return res, out.getvalue(), err.getvalue()
 
 def print_help():
     print("""
@@ -170,6 +394,8 @@ pyang [--sid-list] --sid-generate-file {count | entry-point:size} yang-filename
 pyang [--sid-list] --sid-update-file sid-filename yang-filename
       [--sid-extra-range {count | entry-point:size}]
 pyang [--sid-list] --sid-check-file sid-filename yang-filename
+pyang [--sid-list] [--sid-jobs count] --sid-manifest manifest-filename
+      yang-filename...
 
 
 OPTIONS
@@ -264,6 +490,30 @@ OPTIONS
 
   $ pyang --sid-update-file toaster@2009-11-20.sid
           toaster@2009-12-28.yang --sid-extra-range count
+
+--sid-manifest
+
+  The .sid files of many YANG modules can be generated, updated or checked in
+  one run with the --sid-manifest option. The modules are given on the
+  command line and validated together, and the manifest is a JSON list with
+  one object per module. Each object has the module name as 'module' and one
+  of 'generate-file', 'update-file' and 'check-file', and optionally
+  'extra-range', with the same values as the corresponding options. The
+  assignment ranges of the modules must not overlap.
+
+  For example, with the manifest sids.json:
+
+  [
+    {"module": "toaster", "update-file": "toaster@2009-11-20.sid"},
+    {"module": "ietf-voucher", "generate-file": "2450:50"}
+  ]
+
+  $ pyang --sid-manifest sids.json toaster@2009-12-28.yang
+          ietf-voucher@2018-05-09.yang
+
+--sid-jobs
+
+  The number of processes used to process the modules of a --sid-manifest.
 """)
 
 ############################################################
@@ -288,6 +538,10 @@ class SidFile:
         self.count = False
         self.node_highest = 0
         self.content = collections.OrderedDict()
+        # (namespace, identifier) -> item, for the items in content
+        self.item_index = {}
+        # (statement, unqualified) -> the path of the statement
+        self.paths = {}
         self.module_name = ''
         self.module_revision = ''
         self.output_file_name = ''
@@ -575,19 +829,24 @@ class SidFile:
         if 'items' not in self.content:
             self.content['items'] = []
 
+        self.item_index = {}
         for item in self.content['items']:
             item['lifecycle'] = 'd' # Set to 'd' deleted, updated to 'o' if present in .yang file
+            key = (item['namespace'], item['identifier'])
+            self.item_index.setdefault(key, item)
 
         self.merge_item('module', self.module_name)
 
-        for name in module.i_ctx.modules:
-            if module.i_ctx.modules[name].keyword == 'submodule':
-                self.merge_item('module', module.i_ctx.modules[name].arg)
+        for m in get_module_closure(module.i_ctx, module):
+            if m.keyword == 'submodule':
+                self.merge_item('module', m.arg)
 
         for feature in module.i_features:
             self.merge_item('feature', feature)
 
         for statement in module.i_children:
+            if self.is_augmented_by_other_module(statement):
+                continue
             if statement.keyword in self.leaf_keywords:
                 self.merge_item('data', self.get_path(statement))
 
@@ -619,6 +878,8 @@ class SidFile:
 
     def collect_inner_data_nodes(self, statements, prefix=""):
         for statement in statements:
+            if prefix == "" and self.is_augmented_by_other_module(statement):
+                continue
             if statement.keyword in self.leaf_keywords:
                 self.merge_item('data', self.get_path(statement, prefix))
 
@@ -639,6 +900,12 @@ class SidFile:
             elif statement.keyword in self.choice_keywords:
                 self.collect_inner_data_nodes(statement.i_children, prefix)
 
+    def is_augmented_by_other_module(self, statement):
+        # Nodes which other modules add to this module's tree get their SIDs
+        # from the other modules; they are found here when the modules are
+        # validated together, with --sid-manifest.
+        return statement.i_module.i_modulename != self.module_name
+
     def collect_in_substmts(self, substmts):
         for statement in substmts:
             if statement.keyword in self.leaf_keywords:
@@ -656,37 +923,48 @@ class SidFile:
                 self.collect_inner_data_nodes(statement.i_grouping.i_children, prefix)
 
     def get_path(self, statement, prefix=""):
-        path = ""
-
-        while statement.i_module is not None:
-            if (statement.keyword not in self.grouping_keywords
-                    and not self.has_yang_data_extension(statement)):
-                # Locate the data node parent
-                parent = statement.parent
-                while parent.i_module is not None:
-                    if parent.keyword in self.module_keywords:
-                        break
-                    parent = parent.parent
-
-                if (prefix != "" or
-                    (parent.i_module is not None and parent.i_module == statement.i_module)):
-                    path = "/" + statement.arg + path
-                else:
-                    path = "/" + statement.i_module.arg + ":" + statement.arg + path
-
-            statement = statement.parent
+        return prefix + self.get_path_from_parent(statement, prefix != "")
+
+    def get_path_from_parent(self, statement, unqualified):
+        # The path of a statement is the path of its parent followed by the
+        # statement's own step, so the paths are kept for the parents.
+        if statement.i_module is None:
+            return ""
+        key = (statement, unqualified)
+        path = self.paths.get(key)
+        if path is not None:
+            return path
+
+        path = self.get_path_from_parent(statement.parent, unqualified)
+        if (statement.keyword not in self.grouping_keywords
+                and not self.has_yang_data_extension(statement)):
+            # Locate the data node parent
+            parent = statement.parent
+            while parent.i_module is not None:
+                if parent.keyword in self.module_keywords:
+                    break
+                parent = parent.parent
+
+            if (unqualified or
+                (parent.i_module is not None and parent.i_module == statement.i_module)):
+                path += "/" + statement.arg
+            else:
+                path += "/" + statement.i_module.arg + ":" + statement.arg
 
-        return prefix + path
+        self.paths[key] = path
+        return path
 
     def merge_item(self, namespace, identifier):
-        for item in self.content['items']:
-            if (namespace == item['namespace'] and identifier == item['identifier']):
-                item['lifecycle'] = 'o' # Item already assigned
-                return
-        self.content['items'].append(collections.OrderedDict(
+        item = self.item_index.get((namespace, identifier))
+        if item is not None:
+            item['lifecycle'] = 'o' # Item already assigned
+            return
+        item = collections.OrderedDict(
             [('namespace', namespace), ('identifier', identifier),
              ('status', 'unstable'),
-             ('sid', -1), ('lifecycle', 'n')]))
+             ('sid', -1), ('lifecycle', 'n')])
+        self.content['items'].append(item)
+        self.item_index[(namespace, identifier)] = item
         self.is_consistent = False
 
     ########################################################
@@ -702,55 +980,42 @@ class SidFile:
         unassigned = [item for item in items if item['sid'] == -1]
         if not unassigned:
             return
-        used = sorted(item['sid'] for item in items if item['sid'] != -1)
         needed = len(unassigned)
-        source = self.gen_sids(used)
-
-        for item in unassigned:
-            try:
-                item['sid'] = next(source)
+        source = iter(unassigned)
+        for low, high in self.free_intervals(self.used_sids()):
+            for sid, item in zip(range(low, high), source):
+                item['sid'] = sid
                 item['status'] = 'unstable'
-            except StopIteration:
-                raise SidParsingError(
-                    "The current SID range(s) are exhausted, %d extra SID(s) "
-                    "are required, use the --sid-extra-range option to add "
-                    "a SID range to this YANG module." % needed)
-            needed -= 1
-
-    def sid_used(self, sid):
-        for item in self.content['items']:
-            if item['sid'] == sid:
-                return True
-        return False
-
-    def gen_sids(self, used):
+                needed -= 1
+            if needed == 0:
+                return
+        raise SidParsingError(
+            "The current SID range(s) are exhausted, %d extra SID(s) "
+            "are required, use the --sid-extra-range option to add "
+            "a SID range to this YANG module." % needed)
+
+    def used_sids(self):
+        """Return the sorted list of the assigned SIDs."""
+        return sorted(item['sid'] for item in self.content['items']
+                      if item['sid'] != -1)
+
+    def free_intervals(self, used):
+        """Generate the intervals [low, high) of unused SIDs in the
+        assignment ranges, in order.  `used` is sorted."""
         ranges = sorted((arange['entry-point'], arange['size'])
                         for arange in self.content.get('assignment-ranges') or [])
-        used_idx = 0
-        used_len = len(used)
-        for sid, size in ranges:
-            high = sid + size
-            while sid < high:
-                # find next upper bound of unused sids above sid
-                while used_idx < used_len:
-                    stop = used[used_idx]
-                    if stop < sid:
-                        used_idx += 1
-                    else:
-                        if stop == sid:
-                            # go past the used sid, recheck sid < high
-                            sid += 1
-                        elif stop > high:
-                            # next used is above current range
-                            stop = high
-                        break
+        for low, size in ranges:
+            high = low + size
+            i = bisect.bisect_left(used, low)
+            while low < high:
+                if i < len(used) and used[i] < high:
+                    stop = used[i]
+                    i += 1
                 else:
-                    # no more used sids
                     stop = high
-
-                while sid < stop:
-                    yield sid
-                    sid += 1
+                if low < stop:
+                    yield low, stop
+                low = max(low, stop + 1)
 
     ########################################################
     def list_all_items(self):
@@ -821,10 +1086,9 @@ class SidFile:
     def number_of_sids_used(self):
         return len([0 for item in self.content['items'] if item['sid'] != -1])
 
-    def number_of_sids_used_in_range(self, entry_point, size):
-        low = entry_point
-        high = low + size
-        return len([0 for item in self.content['items'] if low <= item['sid'] < high])
+    def number_of_sids_used_in_range(self, entry_point, size, used):
+        return (bisect.bisect_left(used, entry_point + size)
+                - bisect.bisect_left(used, entry_point))
 
     ########################################################
     def print_registration_information(self, module):
@@ -838,15 +1102,16 @@ class SidFile:
             'submodules' : submodules,
         }
 
-        for arange in self.content('assignment-ranges') or []:
+        used = self.used_sids()
+        for arange in self.content.get('assignment-ranges') or []:
             ranges.append({
                 'entry_point' : arange['entry-point'],
                 'size' : arange['size'],
-                'used' : self.number_of_sids_used_in_range(arange['entry-point'], arange['size'])
+                'used' : self.number_of_sids_used_in_range(arange['entry-point'],
+                                                           arange['size'], used)
             })
 
-        for name in module.i_ctx.modules:
-            submodule = module.i_ctx.modules[name]
+        for submodule in get_module_closure(module.i_ctx, module):
             if submodule.keyword == 'submodule':
                 submodules.append('%s@%s.yang' % (submodule.arg, submodule.i_latest_revision))
 
@@ -135,7 +135,35 @@ Each node is printed as:
     within curly brackets and a question mark "{...}?"
 """)
 
+class LineBuffer(object):
+    """Collects the lines written, and writes them to `fd` in large
+    chunks, since the tree of a large model has very many short lines."""
+
+    def __init__(self, fd, size=1 << 16):
+        self.fd = fd
+        self.size = size
+        self.parts = []
+        self.length = 0
+
+    def write(self, s):
+        self.parts.append(s)
+        self.length += len(s)
+        if self.length >= self.size:
+            self.flush()
+
+    def flush(self):
+        self.fd.write(''.join(self.parts))
+        self.parts = []
+        self.length = 0
+
 def emit_tree(ctx, modules, fd, depth, llen, path):
+    out = LineBuffer(fd)
+    try:
+        _emit_tree(ctx, modules, out, depth, llen, path)
+    finally:
+        out.flush()
+
+def _emit_tree(ctx, modules, fd, depth, llen, path):
     def print_header(module):
         if not printed_header:
             bstr = ""
@@ -293,14 +321,14 @@ def emit_tree(ctx, modules, fd, depth, llen, path):
 
 def unexpand_uses(i_children):
     res = []
-    uses = []
+    uses = set()
     for ch in i_children:
         if hasattr(ch, 'i_uses'):
             # take first from i_uses, which means "closest" grouping
             g = ch.i_uses[0].arg
             if g not in uses:
                 # first node from this uses
-                uses.append(g)
+                uses.add(g)
                 res.append(ch.i_uses[0])
         else:
             res.append(ch)
@@ -345,24 +373,12 @@ def print_children(i_children, module, fd, prefix, path, mode, depth,
         if i_children:
             fd.write(prefix + '     ...\n')
         return
-    def get_width(w, chs):
-        for ch in chs:
-            if ch.keyword in ['choice', 'case']:
-                nlen = 3 + get_width(0, ch.i_children)
-            else:
-                if ch.i_module.i_modulename == module.i_modulename:
-                    nlen = len(ch.arg)
-                else:
-                    nlen = len(ch.i_module.i_prefix) + 1 + len(ch.arg)
-            if nlen > w:
-                w = nlen
-        return w
 
     if no_expand_uses:
         i_children = unexpand_uses(i_children)
 
     if width == 0:
-        width = get_width(0, i_children)
+        width = get_width(i_children, module)
 
     for ch in i_children:
         if ((ch.keyword == 'input' or ch.keyword == 'output') and
@@ -385,6 +401,24 @@ def print_children(i_children, module, fd, prefix, path, mode, depth,
                        no_expand_uses, width,
                        prefix_with_modname=prefix_with_modname)
 
+def get_width(chs, module):
+    """Return the width of the name column for the nodes `chs`.
+
+    The children of choices and cases are printed in the same column,
+    indented, so they are included.
+    """
+    w = 0
+    for ch in chs:
+        if ch.keyword in ('choice', 'case'):
+            nlen = 3 + get_width(ch.i_children, module)
+        elif ch.i_module.i_modulename == module.i_modulename:
+            nlen = len(ch.arg)
+        else:
+            nlen = len(ch.i_module.i_prefix) + 1 + len(ch.arg)
+        if nlen > w:
+            w = nlen
+    return w
+
 def print_node(s, module, fd, prefix, path, mode, depth, llen,
                no_expand_uses, width, prefix_with_modname=False):
 
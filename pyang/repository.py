@@ -3,6 +3,11 @@
 import os
 import sys
 import io
+import hashlib
+import sqlite3
+import tarfile
+import zipfile
+import zlib
 
 from pathlib import Path
 
@@ -46,6 +51,7 @@ class FileRepository(Repository):
 
         Repository.__init__(self)
         self.dirs = []
+        self.file_repos = {}
         self.no_path_recurse = no_path_recurse
         self.modules = None
         self.verbose = verbose
@@ -105,8 +111,15 @@ class FileRepository(Repository):
 
     def _add_directory(self, directory):
         if (not directory
-            or directory in self.dirs
-            or not os.path.isdir(directory)):
+            or directory in self.dirs):
+            return False
+        if os.path.isfile(directory) and is_sqlite(directory):
+            self.file_repos[directory] = SQLiteRepository(
+                directory, verbose=self.verbose)
+        elif os.path.isfile(directory) and is_archive(directory):
+            self.file_repos[directory] = ArchiveRepository(
+                directory, self.no_path_recurse, self.verbose)
+        elif not os.path.isdir(directory):
             return False
         self.dirs.append(directory)
         return True
@@ -133,7 +146,11 @@ class FileRepository(Repository):
                       and d != '.' and file_path.is_dir()):
                     add_files_from_dir(file_path)
         for d in self.dirs:
-            add_files_from_dir(d)
+            if d in self.file_repos:
+                self.modules.extend(
+                    self.file_repos[d].get_modules_and_revisions(ctx))
+            else:
+                add_files_from_dir(d)
 
     def get_modules_and_revisions(self, ctx):
         if self.modules is None:
@@ -141,6 +158,9 @@ class FileRepository(Repository):
         return self.modules
 
     def get_module_from_handle(self, handle):
+        if len(handle) == 3:
+            # a module in an archive or database in the path
+            return self.file_repos[handle[1]].get_module_from_handle(handle)
         in_format, absfilename = handle
         fd = None
         try:
@@ -160,3 +180,283 @@ class FileRepository(Repository):
         if in_format is None:
             in_format = util.guess_format(text)
         return absfilename, in_format, text
+
+
+class ArchiveRepository(Repository):
+    def __init__(self, filename, no_path_recurse=False, verbose=False):
+        """Create a Repository which serves modules from a zip or tar file
+
+        The members are found from the archive's index, and are read
+        on demand, without extracting the archive.  A compressed tar
+        file can only be read efficiently from the start, so its
+        modules are all read when the archive is opened.
+        """
+
+        Repository.__init__(self)
+        self.filename = filename
+        self.no_path_recurse = no_path_recurse
+        self.verbose = verbose
+        self.modules = None
+        self.archive = None
+        self.members = {}
+        self.data = {}
+        """dict of member name:bytes, for a compressed tar file"""
+
+    def _open(self):
+        if self.archive is not None:
+            return
+        try:
+            if zipfile.is_zipfile(self.filename):
+                self.archive = zipfile.ZipFile(self.filename)
+                for info in self.archive.infolist():
+                    if not info.is_dir():
+                        self.members[info.filename] = info
+            else:
+                try:
+                    self.archive = tarfile.open(self.filename, 'r:')
+                except tarfile.ReadError:
+                    self._read_stream()
+                    return
+                for info in self.archive.getmembers():
+                    if info.isfile():
+                        self.members[info.name] = info
+        except (IOError, zipfile.BadZipFile, tarfile.TarError) as ex:
+            raise self.ReadError("%s: %s" % (self.filename, ex))
+
+    def _read_stream(self):
+        """Read all modules in a compressed tar file in one pass"""
+        with tarfile.open(self.filename, 'r|*') as archive:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                self.members[info.name] = info
+                if syntax.re_filename.search(info.name.rsplit('/', 1)[-1]):
+                    self.data[info.name] = archive.extractfile(info).read()
+        self.archive = archive
+
+    def _setup(self, ctx):
+        self.modules = []
+        try:
+            self._open()
+        except self.ReadError as ex:
+            if self.verbose:
+                sys.stderr.write('# %s\n' % ex)
+            return
+        for name in self.members:
+            if (self.no_path_recurse and
+                '/' in os.path.normpath(name).replace(os.sep, '/')):
+                continue
+            m = syntax.re_filename.search(name.rsplit('/', 1)[-1])
+            if m is not None:
+                modname, rev, in_format = m.groups()
+                handle = in_format, self.filename, name
+                self.modules.append((modname, rev, handle))
+
+    def get_modules_and_revisions(self, ctx):
+        if self.modules is None:
+            self._setup(ctx)
+        return self.modules
+
+    def get_module_from_handle(self, handle):
+        in_format, _filename, name = handle
+        ref = os.path.join(self.filename, os.path.normpath(name))
+        try:
+            self._open()
+            info = self.members[name]
+            if isinstance(self.archive, zipfile.ZipFile):
+                data = self.archive.read(info)
+            elif name in self.data:
+                data = self.data[name]
+            else:
+                data = self.archive.extractfile(info).read()
+            text = data.decode('utf-8')
+            if self.verbose:
+                util.report_file_read(ref)
+        except (IOError, KeyError, zipfile.BadZipFile,
+                tarfile.TarError) as ex:
+            raise self.ReadError("%s: %s" % (ref, ex))
+        except UnicodeDecodeError as ex:
+            s = str(ex).replace('utf-8', 'utf8')
+            raise self.ReadError("%s: unicode error: %s" % (ref, s))
+
+        if in_format is None:
+            in_format = util.guess_format(text)
+        return ref, in_format, text
+
+
+class SQLiteRepository(Repository):
+    """A Repository which serves modules from an SQLite database
+
+    The database has one row per module revision, with the module text
+    (optionally compressed), name, revision, namespace, prefix, the
+    imported and included modules, and a hash of the text.  The list of
+    modules is read from the index, so no filesystem walk is needed.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS modules (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        revision TEXT NOT NULL,   -- '' if the module has no revision
+        format TEXT NOT NULL,
+        keyword TEXT NOT NULL,
+        namespace TEXT,
+        prefix TEXT,
+        belongs_to TEXT,
+        hash TEXT NOT NULL,
+        compressed INTEGER NOT NULL,
+        text BLOB NOT NULL,
+        UNIQUE (name, revision)
+    );
+    CREATE INDEX IF NOT EXISTS modules_namespace ON modules (namespace);
+    CREATE TABLE IF NOT EXISTS dependencies (
+        module_id INTEGER NOT NULL REFERENCES modules (id)
+            ON DELETE CASCADE,
+        keyword TEXT NOT NULL,    -- 'import' or 'include'
+        name TEXT NOT NULL,
+        revision TEXT
+    );
+    CREATE INDEX IF NOT EXISTS dependencies_module_id
+        ON dependencies (module_id);
+    CREATE INDEX IF NOT EXISTS dependencies_name ON dependencies (name);
+    """
+
+    def __init__(self, filename, verbose=False, create=False):
+        """Create a Repository which serves modules from `filename`
+
+        The database is opened read-only, unless `create` is True, in
+        which case it is created with its tables if needed, and
+        modules can be added to it.
+        """
+        Repository.__init__(self)
+        self.filename = filename
+        self.verbose = verbose
+        self.create = create
+        self.modules = None
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            try:
+                if self.create:
+                    self.db = sqlite3.connect(self.filename)
+                    self.db.executescript(self.SCHEMA)
+                else:
+                    uri = Path(os.path.abspath(self.filename)).as_uri()
+                    self.db = sqlite3.connect(uri + '?mode=ro', uri=True)
+            except sqlite3.Error as ex:
+                self.db = None
+                raise self.ReadError("%s: %s" % (self.filename, ex))
+        return self.db
+
+    def get_modules_and_revisions(self, ctx):
+        if self.modules is None:
+            self.modules = []
+            try:
+                rows = self._connect().execute(
+                    "SELECT id, name, revision, format FROM modules")
+            except (self.ReadError, sqlite3.Error) as ex:
+                if self.verbose:
+                    sys.stderr.write('# %s\n' % ex)
+                return self.modules
+            for rowid, name, rev, in_format in rows:
+                handle = in_format, self.filename, rowid
+                self.modules.append((name, rev or None, handle))
+        return self.modules
+
+    def get_module_from_handle(self, handle):
+        in_format, _filename, rowid = handle
+        try:
+            row = self._connect().execute(
+                "SELECT name, revision, compressed, text FROM modules"
+                " WHERE id = ?", (rowid,)).fetchone()
+        except sqlite3.Error as ex:
+            raise self.ReadError("%s: %s" % (self.filename, ex))
+        if row is None:
+            raise self.ReadError("%s: module %s not found"
+                                 % (self.filename, rowid))
+        name, rev, compressed, data = row
+        if rev:
+            name += '@' + rev
+        ref = os.path.join(self.filename, name + '.' + in_format)
+        try:
+            if compressed:
+                data = zlib.decompress(data)
+            text = data.decode('utf-8')
+        except zlib.error as ex:
+            raise self.ReadError("%s: %s" % (ref, ex))
+        except UnicodeDecodeError as ex:
+            s = str(ex).replace('utf-8', 'utf8')
+            raise self.ReadError("%s: unicode error: %s" % (ref, s))
+        if self.verbose:
+            util.report_file_read(ref)
+        return ref, in_format, text
+
+    def add_module(self, module, text, in_format, compress=True):
+        """Store the parsed `module` with the raw `text` in the database
+
+        If the same revision of the module is already stored, it is
+        replaced.  Returns False if it was already stored with the
+        same text, and True otherwise.
+        """
+        db = self._connect()
+        rev = util.get_latest_revision(module)
+        if rev == 'unknown':
+            rev = ''
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        row = db.execute("SELECT id, hash FROM modules"
+                         " WHERE name = ? AND revision = ?",
+                         (module.arg, rev)).fetchone()
+        if row is not None:
+            if row[1] == digest:
+                return False
+            db.execute("DELETE FROM dependencies WHERE module_id = ?",
+                       (row[0],))
+            db.execute("DELETE FROM modules WHERE id = ?", (row[0],))
+        if compress:
+            data = zlib.compress(data)
+        def arg(stmt):
+            return stmt.arg if stmt is not None else None
+        belongs_to = module.search_one('belongs-to')
+        if module.keyword == 'module':
+            prefix = module.search_one('prefix')
+        else:
+            prefix = (belongs_to.search_one('prefix')
+                      if belongs_to is not None else None)
+        cur = db.execute(
+            "INSERT INTO modules (name, revision, format, keyword, namespace,"
+            " prefix, belongs_to, hash, compressed, text)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (module.arg, rev, in_format, module.keyword,
+             arg(module.search_one('namespace')), arg(prefix),
+             arg(belongs_to), digest, compress, data))
+        for keyword in ('import', 'include'):
+            for s in module.search(keyword):
+                db.execute(
+                    "INSERT INTO dependencies (module_id, keyword, name,"
+                    " revision) VALUES (?, ?, ?, ?)",
+                    (cur.lastrowid, keyword, s.arg,
+                     arg(s.search_one('revision-date'))))
+        self.modules = None
+        return True
+
+    def commit(self):
+        if self.db is not None:
+            self.db.commit()
+
+
+def is_sqlite(filename):
+    """Return True if `filename` is an SQLite database"""
+    try:
+        with open(filename, 'rb') as fd:
+            return fd.read(16) == b'SQLite format 3\x00'
+    except IOError:
+        return False
+
+def is_archive(filename):
+    """Return True if `filename` is a zip or tar file"""
+    try:
+        return zipfile.is_zipfile(filename) or tarfile.is_tarfile(filename)
+    except IOError:
+        return False
@@ -2,13 +2,22 @@
 import argparse
 import codecs
 import json
+import multiprocessing
 import numbers
+import os
 import re
 import sys
 import xml.etree.ElementTree as ET
+from json.decoder import scanstring
 
+NC_URI = "urn:ietf:params:xml:ns:netconf:base:1.0"
 
+DRIVER_VERSION = 3
+"""latest version of the compiled driver format"""
 
+(CONV_STRING, CONV_INT, CONV_UINT, CONV_DECIMAL64, CONV_BOOLEAN, CONV_EMPTY,
+ CONV_UNION, CONV_IDENTITYREF, CONV_INSTANCE_ID) = range(9)
+"""codes for the conversion of leaf values, used in the compiled driver"""
 
 class Error(Exception):
     """Abstract base class for exceptions in this program."""
@@ -84,6 +93,397 @@ class JSONError(Error):
     def __str__(self):
         return "%s" % self.path
 
+class StreamingError(Error):
+    """Exception raised for input that cannot be translated in one pass."""
+
+    def __init__(self, path, reason):
+        Error.__init__(self, path)
+        self.reason = reason
+
+    def __str__(self):
+        return Error.__str__(self) + " - " + self.reason
+
+
+class JSONEventReader(object):
+    """Read a JSON document in chunks, as a sequence of parse events.
+
+    Iterating over the reader yields tuples (`event`, `value`), where
+    `event` is one of "start_map", "map_key", "end_map",
+    "start_array", "end_array" and "value".  Only the current chunk
+    of the input is kept in memory.  Syntax errors are raised as
+    `ValueError`.
+
+    With `next_value`, values which fit in `whole_limit` characters
+    are instead returned whole, as decoded by the json module.
+    """
+
+    chunk_size = 65536
+    whole_limit = 16 * chunk_size
+
+    ws_re = re.compile(r"[ \t\n\r]*")
+    scalar_re = re.compile(
+        r"(-?(?:0|[1-9][0-9]*))(\.[0-9]+)?([eE][-+]?[0-9]+)?|true|false|null")
+    delim_re = re.compile(r"[^-+.0-9a-zA-Z]")
+    literals = {"true": True, "false": False, "null": None}
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+        self.stack = []
+        self.state = "value"
+        """one of "value", "map" (after '{'), "array" (after '[')
+        and "after" (after a value)"""
+        self.decoder = json.JSONDecoder()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.state == "value":
+            return self.start_value()
+        if self.state == "map":
+            if self.peek() == "}":
+                return self.end()
+            return self.map_key()
+        if self.state == "array":
+            if self.peek() == "]":
+                return self.end()
+            return self.start_value()
+        c = self.peek()
+        if not self.stack:
+            if c is not None:
+                self.fail("Extra data")
+            raise StopIteration
+        if c == ",":
+            self.pos += 1
+            if self.stack[-1] == "}":
+                return self.map_key()
+            return self.start_value()
+        if c == self.stack[-1]:
+            return self.end()
+        self.fail("Expecting ',' delimiter")
+
+    def next_value(self):
+        """Return the next event, or the next value as a whole.
+
+        If the next event starts an object or array which ends within
+        `whole_limit` characters, it is returned as ("value", value).
+        """
+        if self.state == "after" and self.stack:
+            c = self.peek()
+            if c == ",":
+                self.pos += 1
+                if self.stack[-1] == "}":
+                    return self.map_key()
+                self.state = "value"
+        elif self.state == "array":
+            if self.peek() == "]":
+                return self.end()
+            self.state = "value"
+        if self.state != "value" or self.peek() not in ("{", "["):
+            return next(self)
+        while True:
+            try:
+                val, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise
+                end = len(self.buf)
+            if end < len(self.buf) or self.eof:
+                self.pos = end
+                self.state = "after"
+                return "value", val
+            # the value may continue in the next chunk
+            if len(self.buf) - self.pos >= self.whole_limit or not self.fill():
+                return self.start_value()
+
+    def start_value(self):
+        c = self.peek()
+        if c == "{" or c == "[":
+            self.pos += 1
+            if c == "{":
+                self.stack.append("}")
+                self.state = "map"
+                return "start_map", None
+            self.stack.append("]")
+            self.state = "array"
+            return "start_array", None
+        val = self.read_scalar()
+        self.state = "after"
+        return "value", val
+
+    def end(self):
+        self.pos += 1
+        self.state = "after"
+        return ("end_map" if self.stack.pop() == "}" else "end_array"), None
+
+    def map_key(self):
+        if self.peek() != '"':
+            self.fail("Expecting property name enclosed in double quotes")
+        key = self.read_scalar()
+        if self.peek() != ":":
+            self.fail("Expecting ':' delimiter")
+        self.pos += 1
+        self.state = "value"
+        return "map_key", key
+
+    def fail(self, msg):
+        raise ValueError("%s: char %d" % (msg, self.offset + self.pos))
+
+    def fill(self):
+        """Read the next chunk.  Return False at the end of the input."""
+        if self.eof:
+            return False
+        chunk = self.fd.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace, and return the next character or None."""
+        while True:
+            self.pos = self.ws_re.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return None
+
+    def read_scalar(self):
+        while True:
+            if self.peek() == '"':
+                try:
+                    val, end = scanstring(self.buf, self.pos + 1)
+                except ValueError:
+                    # the string may continue in the next chunk
+                    if self.fill():
+                        continue
+                    raise
+            else:
+                # the token may continue in the next chunk
+                if (self.delim_re.search(self.buf, self.pos) is None
+                    and self.fill()):
+                    continue
+                mo = self.scalar_re.match(self.buf, self.pos)
+                if mo is None:
+                    self.fail("Expecting value")
+                end = mo.end()
+                if mo.group(1) is None:
+                    val = self.literals[mo.group()]
+                elif mo.group(2) or mo.group(3):
+                    val = float(mo.group())
+                else:
+                    val = int(mo.group())
+            self.pos = end
+            return val
+
+    def read_value(self, ev=None):
+        """Return the next value as a whole, however large it is.
+
+        If `ev` is given, it is the event which started the value.
+        """
+        if ev is None:
+            ev, val = self.next_value()
+            if ev == "value":
+                return val
+        stack = [{} if ev == "start_map" else []]
+        keys = [None]
+        for ev, val in self:
+            if ev == "map_key":
+                keys[-1] = val
+                continue
+            if ev in ("end_map", "end_array"):
+                val = stack.pop()
+                keys.pop()
+                if not stack:
+                    return val
+            elif ev in ("start_map", "start_array"):
+                stack.append({} if ev == "start_map" else [])
+                keys.append(None)
+                continue
+            top = stack[-1]
+            if isinstance(top, dict):
+                top[keys[-1]] = val
+            else:
+                top.append(val)
+        raise ValueError("Unexpected end of input")
+
+
+def escape_cdata(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def escape_attrib(text):
+    return (escape_cdata(text).replace('"', "&quot;").replace("\r", "&#13;")
+            .replace("\n", "&#10;").replace("\t", "&#09;"))
+
+
+class StreamElement(object):
+    """An XML element written by the streaming translator.
+
+    The start tag is written as late as possible: list entries are
+    started when all their keys have been seen, so that the keys can
+    be written first.  Until then, child elements are kept in
+    `self.pending`.  Other children are also kept there until a large
+    container or list child is written, so that their annotations,
+    which may follow them in the JSON object, can still be added.
+    """
+
+    def __init__(self, trans, write, tag, path, keys=()):
+        self.trans = trans
+        self.write = write
+        self.path = path
+        self.keys = keys
+        """list of (module name, key name) pairs"""
+        self.keyqns = [trans.et_qname(*k) for k in keys]
+        self.holder = ET.Element(tag)
+        """start tag and attributes; new children are added here"""
+        self.keyels = {}
+        self.pending = []
+        """elements (or lists of strings) not yet written"""
+        self.children = {}
+        """member name -> (module name, path, pending child elements)"""
+        self.flushed = set()
+        """member names of children already written"""
+        self.annots = {}
+        """member name -> annotations of a child not yet seen"""
+        self.started = False
+
+    def can_start(self):
+        return len(self.keyels) == len(self.keys)
+
+    def writer(self):
+        """Return a function for writing a container or list entry."""
+        if self.can_start():
+            self.flush()
+            return self.write
+        # the child must wait for our keys
+        buf = []
+        self.pending.append(buf)
+        return buf.append
+
+    def child(self, tag, path, keys=()):
+        """Return a new StreamElement for a container or list entry."""
+        return StreamElement(self.trans, self.writer(), tag, path, keys)
+
+    def add_children(self, name, mod_name, path):
+        """Take the children just added to `self.holder` as member `name`."""
+        els = list(self.holder)
+        del self.holder[:]
+        if name in self.flushed:
+            raise StreamingError(path, "duplicate member")
+        if name in self.children:
+            # a duplicate member replaces the earlier one, as in json.load
+            old = self.children[name][2]
+            self.pending = [x for x in self.pending if x not in old]
+        self.children[name] = (mod_name, path, els)
+        for el in els:
+            if not self.started and el.tag in self.keyqns:
+                self.keyels[el.tag] = el
+            else:
+                self.pending.append(el)
+
+    def flush(self):
+        write = self.write
+        if not self.started:
+            for k, qn in zip(self.keys, self.keyqns):
+                if qn not in self.keyels:
+                    raise MissingKeyError(self.path, k)
+            write(self.trans.start_tag(self.holder))
+            for qn in self.keyqns:
+                write(self.trans.serialize(self.keyels[qn]))
+            self.started = True
+        for x in self.pending:
+            if isinstance(x, list):
+                write("".join(x))
+            else:
+                write(self.trans.serialize(x))
+        self.pending = []
+        self.flushed.update(self.children)
+        self.children = {}
+
+    def close(self):
+        if not self.started and not self.pending and not self.keys:
+            self.write(self.trans.start_tag(self.holder, " />"))
+            return
+        self.flush()
+        self.write("</%s>" % self.trans.xml_name(self.holder.tag))
+
+
+def check_val(cond, path, ytyp):
+    if not cond:
+        raise NodeTypeError(path, ytyp)
+
+def is_array(val):
+    return isinstance(val, list) and val != [None]
+
+def is_scalar(val):
+    return not (is_array(val) or isinstance(val, dict))
+
+def check_driver(jtox):
+    """Raise ValueError if the driver `jtox` has an unknown format."""
+    version = jtox.get("version", 1)
+    if version not in (1, 2, DRIVER_VERSION):
+        raise ValueError("unsupported driver version %s" % version)
+
+def driver_tree(jtox):
+    """Return the schema tree of the driver `jtox`.
+
+    The node table of a compiled driver (produced by "pyang -f jtox
+    --jtox-compiled") is linked in place, giving the same structure
+    as the tree of a plain driver, in which equal type specifications
+    are shared, and in which each leaf and leaf-list also has the
+    conversion of its type, see `type_conversion`.  The tree is then
+    also stored in `jtox`.
+    """
+    if "tree" in jtox:
+        return jtox["tree"]
+    nodes = jtox["nodes"]
+    types = jtox["types"]
+    convs = jtox.get("conversions")
+    if convs is None:
+        # version 2
+        convs = [type_conversion(t) for t in types]
+    for node in nodes:
+        if node[0] in ("leaf", "leaf-list"):
+            node.append(convs[node[1]])
+            node[1] = types[node[1]]
+        elif len(node) > 1:
+            children = node[1]
+            for name in children:
+                children[name] = nodes[children[name]]
+    jtox["tree"] = nodes[0][1]
+    return jtox["tree"]
+
+def type_conversion(type_spec):
+    """Return the conversion of values of the type `type_spec`.
+
+    The conversion is a list of a CONV_* code and its parameter, if
+    any: the number of bits of an integer type, the fraction digits of
+    decimal64, or the conversions of the member types of a union.
+    """
+    t = type_spec[0] if isinstance(type_spec, list) else type_spec
+    if t.startswith("int"):
+        return [CONV_INT, int(t[3:])]
+    if t.startswith("uint"):
+        return [CONV_UINT, int(t[4:])]
+    if t == "decimal64":
+        return [CONV_DECIMAL64, type_spec[1]]
+    if t == "union":
+        return [CONV_UNION, [type_conversion(m) for m in type_spec[1]]]
+    return [_conversions.get(t, CONV_STRING)]
+
+_conversions = {
+    "boolean": CONV_BOOLEAN,
+    "empty": CONV_EMPTY,
+    "identityref": CONV_IDENTITYREF,
+    "instance-identifier": CONV_INSTANCE_ID,
+}
 
 class Translator (object):
     """Translate JSON to XML according to a YANG data model.
@@ -96,22 +496,39 @@ class Translator (object):
 
     - `self.qn_re`, self.num_re`, `self.bra_re`: compiled regular
       expressions.
+
+    - `self.nsmap`: dictionary mapping namespace URIs to prefixes,
+      used by the streaming translator
     """
 
     def __init__(self, jtox):
-        self.tree = jtox["tree"]
+        self.tree = driver_tree(jtox)
         self.annots = jtox["annotations"]
+        self.annot_convs = {}
         self.prefix = {}
         self.uri = {}
         self.node_modules = set()
+        self.nsmap = {NC_URI: "nc"}
+        self.xml_names = {}
         for m in jtox["modules"]:
             # The namespace urn:ietf:params:xml:ns:netconf:base:1.0 is added by the default.
             # Don't add it twice as this will cause the generated XML to be invalid
             prefix, uri = jtox["modules"][m]
-            if uri != "urn:ietf:params:xml:ns:netconf:base:1.0":
+            if uri != NC_URI:
                 self.prefix[m] = prefix
                 self.uri[m] = uri
+                self.nsmap[uri] = prefix
                 ET.register_namespace(self.prefix[m], self.uri[m])
+        ET.register_namespace("nc", NC_URI)
+        self.handlers = {
+            "container": self.translate_container,
+            "list": self.translate_list,
+            "leaf": self.translate_leaf,
+            "leaf-list": self.translate_leaf_list,
+            "anyxml": self.translate_anyxml,
+        }
+        self.tables = {}
+        self.keys = {}
         ident = "[a-zA-Z_][-_.a-zA-Z0-9]*"
         self.qn_re = re.compile(r"^\s*(%s(?::%s)?)\s*(.*)$" % ((ident,)*2))
         self.num_re = re.compile(r"^\s*([0-9]+)\s*\]\s*(.*)$")
@@ -123,6 +540,10 @@ class Translator (object):
 
     def translate(self, json_doc, xml_root):
         """Translate `json_doc` and attach the result under `xml_root`."""
+        # node_modules is collected by node_lookup, so the dispatch
+        # tables are filled anew for each document
+        self.node_modules = set()
+        self.tables = {}
         try:
             try:
                 json_doc.fileno                               # Is it a file?
@@ -134,7 +555,159 @@ class Translator (object):
             raise JSONError(e)
         return self.translate_obj(d, None, self.tree, xml_root, "/")
 
-    def translate_obj(self, json_obj, ns, node, xml_parent, path):
+    def translate_stream(self, json_doc, outfile, target="data"):
+        """Translate `json_doc` and write the XML document to `outfile`.
+
+        The JSON document is read in chunks, and the XML document is
+        written while it is translated.  Only the members on the
+        current path, and values small enough to be decoded at once,
+        are kept in memory.  Annotations of a member which follow a
+        large container or list in the same object are reported as
+        errors, since the member has then already been written.
+
+        `outfile` must be opened in binary mode.
+        """
+        def write(text):
+            outfile.write(text.encode("utf-8"))
+        write("<?xml version='1.0' encoding='utf-8'?>\n")
+        reader = JSONEventReader(json_doc)
+        root = StreamElement(self, write, "{%s}%s" % (NC_URI, target), "/")
+        for uri in sorted(self.nsmap, key=self.nsmap.get):
+            root.holder.attrib["xmlns:" + self.nsmap[uri]] = uri
+        try:
+            ev, val = reader.next_value()
+            if ev == "value":
+                if not isinstance(val, dict):
+                    raise NodeTypeError("/", "object")
+                self.translate_obj(val, None, self.tree, root.holder, "/")
+                root.add_children(None, None, "/")
+                root.close()
+            elif ev == "start_map":
+                self.stream_obj(reader, None, self.tree, root, "/")
+            else:
+                raise NodeTypeError("/", "object")
+            # check for trailing garbage
+            for ev in reader:
+                pass
+        except ValueError as e:
+            raise JSONError(e)
+
+    def stream_obj(self, reader, ns, node, elem, path):
+        """Translate the rest of an object from `reader`.
+
+        The translated members are added to the StreamElement `elem`,
+        which is closed at the end of the object.  The other arguments
+        are as for `translate_obj`.
+        """
+        for ev, key in reader:
+            if ev == "end_map":
+                elem.close()
+                return
+            if key[0] == "@":
+                aobj = reader.read_value()
+                if key == "@":
+                    if elem.started:
+                        raise StreamingError(
+                            path, "annotations must precede large data nodes")
+                    self.handle_annotations(aobj, elem.holder, ns, path)
+                else:
+                    self.stream_annotations(key[1:], aobj, elem, path)
+                continue
+            new_path = path + key
+            tag, mod_name, node_spec = self.node_lookup(key, ns, node, new_path)
+            ev, val = reader.next_value()
+            if node_spec[0] in ("container", "list") and ev != "value":
+                qn = self.et_qname(mod_name, tag)
+                if node_spec[0] == "container":
+                    check_val(ev == "start_map", new_path, "container")
+                    self.stream_obj(reader, mod_name, node_spec[1],
+                                    elem.child(qn, new_path), new_path + "/")
+                else:
+                    check_val(ev == "start_array", new_path, "list")
+                    self.stream_list(reader, mod_name, node_spec, qn, elem,
+                                     new_path)
+                continue
+            if ev != "value":
+                val = reader.read_value(ev)
+            obj = {key: val}
+            if key in elem.annots:
+                obj["@" + key] = elem.annots.pop(key)
+            self.translate_obj(obj, ns, node, elem.holder, path)
+            elem.add_children(key, mod_name, new_path)
+
+    def stream_list(self, reader, ns, node_spec, qn, elem, path):
+        """Translate the rest of a list from `reader`."""
+        scratch = ET.Element(qn)
+        i = 0
+        while True:
+            ev, val = reader.next_value()
+            if ev == "end_array":
+                return
+            ent_path = path + "/%d/" % i
+            if ev == "value":
+                if not isinstance(val, dict):
+                    raise NodeTypeError(path, "list entry")
+                el = self.translate_entry(val, ns, node_spec, qn, scratch,
+                                          ent_path)
+                scratch.remove(el)
+                elem.writer()(self.serialize(el))
+            elif ev == "start_map":
+                self.stream_obj(reader, ns, node_spec[1],
+                                elem.child(qn, ent_path, node_spec[2]),
+                                ent_path)
+            else:
+                raise NodeTypeError(path, "list entry")
+            i += 1
+
+    def stream_annotations(self, name, aobj, elem, path):
+        """Handle the annotations `aobj` of member `name` of `elem`."""
+        if name in elem.flushed:
+            raise StreamingError(path + "@" + name,
+                                 "annotations must precede large data nodes")
+        if name not in elem.children:
+            elem.annots[name] = aobj
+            return
+        mod_name, cpath, els = elem.children[name]
+        if isinstance(aobj, list):
+            for i in range(min(len(aobj), len(els))):
+                if aobj[i]:
+                    self.handle_annotations(aobj[i], els[i], mod_name,
+                                            cpath + "/%d" % i)
+        elif aobj:
+            self.handle_annotations(aobj, els[0], mod_name, cpath)
+
+    def xml_name(self, qn):
+        """Return the prefixed XML name for ElementTree name `qn`."""
+        try:
+            return self.xml_names[qn]
+        except KeyError:
+            pass
+        name = qn
+        if qn[0] == "{":
+            uri, local = qn[1:].split("}", 1)
+            name = self.nsmap[uri] + ":" + local
+        self.xml_names[qn] = name
+        return name
+
+    def start_tag(self, el, end=">"):
+        attrs = "".join(' %s="%s"' % (self.xml_name(a), escape_attrib(v))
+                        for a, v in el.attrib.items())
+        return "<%s%s%s" % (self.xml_name(el.tag), attrs, end)
+
+    def serialize(self, el):
+        """Return element `el` with all its descendants as XML text."""
+        if not el.text and len(el) == 0:
+            return self.start_tag(el, " />")
+        parts = [self.start_tag(el)]
+        if el.text:
+            parts.append(escape_cdata(el.text))
+        for ch in el:
+            parts.append(self.serialize(ch))
+        parts.append("</%s>" % self.xml_name(el.tag))
+        return "".join(parts)
+
+    def translate_obj(self, json_obj, ns, node, xml_parent, path,
+                      skip=()):
         """Translate object and attach it to the output XML tree.
 
         Arguments:
@@ -149,76 +722,140 @@ class Translator (object):
 
         - `path`: JSON pointer of `json_obj` (for error messages)
 
-        """
-        def check_val(cond, path, ytyp):
-            if not cond:
-                raise NodeTypeError(path, ytyp)
-
-        def is_array(val):
-            return isinstance(val, list) and val != [None]
-
-        def is_scalar(val):
-            return not (is_array(val) or isinstance(val, dict))
+        - `skip`: members of `json_obj` which are already translated
 
+        """
+        table = self.dispatch_table(ns, node)
         for key in json_obj:
             if key[0] == "@":
                 if key == "@":
                     self.handle_annotations(json_obj["@"], xml_parent, ns, path)
                 continue
-            job = json_obj[key]
-            new_path = path + key
-            tag, mod_name, node_spec = self.node_lookup(key, ns, node, new_path)
-            qn = self.et_qname(mod_name, tag)
-            if node_spec[0] == "container":
-                check_val(isinstance(job, dict), new_path, "container")
-                el = ET.SubElement(xml_parent, qn)
-                self.translate_obj(job, mod_name, node_spec[1], el,
-                                   new_path + "/")
-            elif node_spec[0] == "list":
-                check_val(is_array(job), new_path, "list")
-                i = 0
-                keys = node_spec[2][:]
-                keys.reverse()
-                for child in job:
-                    check_val(isinstance(child, dict), new_path, "list entry")
-                    el = ET.SubElement(xml_parent, qn)
-                    ent_path = new_path + "/%d/" % i
-                    self.translate_obj(child, mod_name, node_spec[1],
-                                       el, ent_path)
-                    # Rearrange the subtree so that keys come first and in order
-                    for k in keys:
-                        knode = el.find(self.et_qname(*k))
-                        try:
-                            el.remove(knode)
-                        except (ValueError, TypeError):
-                            raise MissingKeyError(ent_path, k)
-                        el.insert(0,knode)
-                    i += 1
-            elif node_spec[0] == "leaf":
-                check_val(is_scalar(job), new_path, "leaf")
-                aobj = json_obj.get("@" + key)
-                self.handle_leaf(job, node_spec[1], mod_name,
-                                 qn, xml_parent, new_path, aobj)
-            elif node_spec[0] == "leaf-list":
-                check_val(is_array(job), new_path, "leaf-list")
-                aarr = json_obj.get("@" + key, [])
-                la = len(aarr)
-                i = 0
-                for child in job:
-                    check_val(is_scalar(child), new_path, "leaf-list entry")
-                    aobj = aarr[i] if i < la else None
-                    self.handle_leaf(child, node_spec[1], mod_name, qn,
-                                     xml_parent, new_path + "/%d" % i, aobj)
-                    i += 1
-            elif node_spec[0] == "anyxml":
-                el = ET.SubElement(xml_parent, qn)
-                aobj = json_obj.get("@" + key)
-                if aobj:
-                    self.handle_annotations(aobj, el, mod_name, new_path)
-                if isinstance(job, dict):
-                    self.handle_anyxml(job, el)
-                else:
-                    el.text = str(job)
+            if key in skip:
+                continue
+            try:
+                handler, mod_name, node_spec, qn = table[key]
+            except KeyError:
+                handler, mod_name, node_spec, qn = table[key] = \
+                    self.dispatch_entry(key, ns, node, path + key)
+            handler(json_obj, key, mod_name, node_spec, qn, xml_parent,
+                    path + key)
+
+    def dispatch_table(self, ns, node):
+        """Return the dispatch table for the children of `node`.
+
+        The table maps JSON member names to tuples (handler, module
+        name, node specification, qualified name), and is filled in
+        as the member names are seen.
+        """
+        try:
+            return self.tables[(id(node), ns)]
+        except KeyError:
+            table = self.tables[(id(node), ns)] = {}
+            return table
+
+    def dispatch_entry(self, key, ns, node, path):
+        tag, mod_name, node_spec = self.node_lookup(key, ns, node, path)
+        return (self.handlers[node_spec[0]], mod_name, node_spec,
+                self.et_qname(mod_name, tag))
+
+    def translate_container(self, json_obj, key, mod_name, node_spec, qn,
+                            xml_parent, path):
+        job = json_obj[key]
+        check_val(isinstance(job, dict), path, "container")
+        el = ET.SubElement(xml_parent, qn)
+        self.translate_obj(job, mod_name, node_spec[1], el, path + "/")
+
+    def translate_list(self, json_obj, key, mod_name, node_spec, qn,
+                       xml_parent, path):
+        job = json_obj[key]
+        check_val(is_array(job), path, "list")
+        i = 0
+        for child in job:
+            check_val(isinstance(child, dict), path, "list entry")
+            self.translate_entry(child, mod_name, node_spec, qn,
+                                 xml_parent, path + "/%d/" % i)
+            i += 1
+
+    def translate_leaf(self, json_obj, key, mod_name, node_spec, qn,
+                       xml_parent, path):
+        job = json_obj[key]
+        check_val(is_scalar(job), path, "leaf")
+        aobj = json_obj.get("@" + key)
+        self.handle_leaf(job, node_spec, mod_name,
+                         qn, xml_parent, path, aobj)
+
+    def translate_leaf_list(self, json_obj, key, mod_name, node_spec, qn,
+                            xml_parent, path):
+        job = json_obj[key]
+        check_val(is_array(job), path, "leaf-list")
+        aarr = json_obj.get("@" + key, [])
+        la = len(aarr)
+        i = 0
+        for child in job:
+            check_val(is_scalar(child), path, "leaf-list entry")
+            aobj = aarr[i] if i < la else None
+            self.handle_leaf(child, node_spec, mod_name, qn,
+                             xml_parent, path + "/%d" % i, aobj)
+            i += 1
+
+    def translate_anyxml(self, json_obj, key, mod_name, node_spec, qn,
+                         xml_parent, path):
+        job = json_obj[key]
+        el = ET.SubElement(xml_parent, qn)
+        aobj = json_obj.get("@" + key)
+        if aobj:
+            self.handle_annotations(aobj, el, mod_name, path)
+        if isinstance(job, dict):
+            self.handle_anyxml(job, el)
+        else:
+            el.text = str(job)
+
+    def translate_entry(self, json_obj, ns, node_spec, qn, xml_parent, path):
+        """Translate a list entry, and return the new element.
+
+        The keys are translated first, in the order of the list's key
+        statement, and then the other members in JSON order.  The
+        arguments are as for `translate_obj`, except that `node_spec`
+        is the specification of the list and `qn` is its qualified
+        name.
+        """
+        el = ET.SubElement(xml_parent, qn)
+        node = node_spec[1]
+        table = self.dispatch_table(ns, node)
+        done = []
+        for k, names in self.key_members(ns, node_spec):
+            for key in names:
+                if key in json_obj:
+                    break
+            else:
+                raise MissingKeyError(path, k)
+            try:
+                handler, mod_name, kspec, kqn = table[key]
+            except KeyError:
+                handler, mod_name, kspec, kqn = table[key] = \
+                    self.dispatch_entry(key, ns, node, path + key)
+            handler(json_obj, key, mod_name, kspec, kqn, el, path + key)
+            done.append(key)
+        self.translate_obj(json_obj, ns, node, el, path, done)
+        return el
+
+    def key_members(self, ns, node_spec):
+        """Return the keys of a list, with their possible member names.
+
+        The result is a list of pairs (key, names), in the key order,
+        where key is the (module name, key name) pair from the driver.
+        """
+        try:
+            return self.keys[id(node_spec)]
+        except KeyError:
+            pass
+        res = []
+        for k in node_spec[2]:
+            qname = "%s:%s" % tuple(k)
+            res.append((k, (k[1], qname) if k[0] == ns else (qname,)))
+        self.keys[id(node_spec)] = res
+        return res
 
     def handle_annotations(self, annot_obj, elem, mod_name, path):
         if not isinstance(annot_obj, dict):
@@ -228,7 +865,11 @@ class Translator (object):
                 atyp = self.annots[ann]
             except KeyError:
                 raise InvalidAnnotationError(path, ann)
-            aval = self.text_value(annot_obj[ann], atyp, mod_name, path)
+            try:
+                conv = self.annot_convs[ann]
+            except KeyError:
+                conv = self.annot_convs[ann] = type_conversion(atyp)
+            aval = self.text_value(annot_obj[ann], conv, mod_name, path)
             if aval is None :
                 tsp = atyp[0] if isinstance(atyp, list) else atyp
                 raise DataTypeError(path + "/@" + ann, tsp, annot_obj[ann])
@@ -236,13 +877,17 @@ class Translator (object):
             self.node_modules.add(m)
             elem.attrib[self.et_qname(m, a)] = aval
 
-    def handle_leaf(self, value, ytyp, mod_name, leaf_name,
+    def handle_leaf(self, value, node_spec, mod_name, leaf_name,
                     xml_parent, path, annot_obj):
         """
         Install the transformed leaf with `value` under `xml_parent`.
         """
-        tval = self.text_value(value, ytyp, mod_name, path)
+        if len(node_spec) < 3:
+            # a plain driver; the conversion is found once for each node
+            node_spec.append(type_conversion(node_spec[1]))
+        tval = self.text_value(value, node_spec[2], mod_name, path)
         if tval is None :
+            ytyp = node_spec[1]
             tsp = ytyp[0] if isinstance(ytyp, list) else ytyp
             raise DataTypeError(path, tsp, value)
         el = ET.SubElement(xml_parent, leaf_name)
@@ -286,17 +931,17 @@ class Translator (object):
             return snd, fst, spec
         return fst, ns, spec
 
-    def text_value(self, value, type_spec, mod_name, path):
+    def text_value(self, value, conv, mod_name, path):
         """Return `value` translated to its XML form.
 
         Return `None` if `value` cannot be represented as an instance
-        of the datatype specified by `type_spec`.
+        of the datatype with the conversion `conv`.
 
         Arguments:
 
         - `value`: leaf value as found in JSON;
 
-        - `type_spec`: type specification produced by the "jtox" plugin;
+        - `conv`: conversion of the datatype, see `type_conversion`;
 
         - `mod_name`: module name of the containing leaf
 
@@ -321,14 +966,16 @@ class Translator (object):
                 lo = -hi
             return "%d" % val if lo <= val < hi else None
 
-        t = type_spec[0] if isinstance(type_spec, list) else type_spec
-        if t == 'empty':
+        code = conv[0]
+        if code == CONV_STRING:
+            return str(value)
+        if code == CONV_EMPTY:
             return "" if value == [None] else None
-        if t.startswith("int"):
-            return handle_int(value, int(t[3:]), False)
-        if t.startswith("uint"):
-            return handle_int(value, int(t[4:]), True)
-        if t == "decimal64":
+        if code == CONV_INT:
+            return handle_int(value, conv[1], False)
+        if code == CONV_UINT:
+            return handle_int(value, conv[1], True)
+        if code == CONV_DECIMAL64:
             if not isinstance(value, str):
                 return None
             ip, dp, fp = value.partition('.')
@@ -337,7 +984,7 @@ class Translator (object):
                     fp = fp.rstrip("0")
                     if len(fp) == 0:
                         fp = "0"
-                    if len(fp) > type_spec[1]:
+                    if len(fp) > conv[1]:
                         return None
                     ival = int(ip + fp)
                 else:
@@ -347,20 +994,20 @@ class Translator (object):
             hi = 2 ** 63
             lo = -hi
             return ip + dp + fp if lo <= ival < hi else None
-        if t == "boolean":
+        if code == CONV_BOOLEAN:
             if value is True:
                 return "true"
             elif value is False:
                 return "false"
             else:
                 return None
-        if t == "union":
-            for memb in type_spec[1]:
+        if code == CONV_UNION:
+            for memb in conv[1]:
                 tval = self.text_value(value, memb, mod_name, path)
                 if tval is not None:
                     return tval
             return None
-        if t == "identityref":
+        if code == CONV_IDENTITYREF:
             try:
                 fst, sep, snd = value.partition(":")
                 if sep:
@@ -372,7 +1019,7 @@ class Translator (object):
                 return "%s:%s" % (self.prefix[m], idv)
             except:
                 return None
-        if t == "instance-identifier":
+        if code == CONV_INSTANCE_ID:
             result = ""
             node = self.tree
             try:
@@ -404,6 +1051,86 @@ class Translator (object):
             return result
         return str(value)
 
+def translate_file(trans, jfile, outfile, target, stream=False):
+    """Translate the JSON document `jfile`, and write XML to `outfile`."""
+    if stream:
+        trans.translate_stream(jfile, outfile, target)
+        return
+    root_el = ET.Element("{%s}%s" % (NC_URI, target))
+    trans.translate(jfile, root_el)
+    for m in sorted(set(trans.prefix) - trans.node_modules):
+        root_el.attrib["xmlns:" + trans.prefix[m]] = trans.uri[m]
+    ET.ElementTree(root_el).write(outfile, encoding="utf-8", xml_declaration=True)
+
+def batch_jobs(paths, output_dir):
+    """Return (JSON file, XML file) pairs for the files in `paths`.
+
+    Directories in `paths` are replaced by the "*.json" files in them.
+    Raises ValueError if two JSON files would be written to the same
+    XML file.
+    """
+    jobs = []
+    sources = {}
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.path.join(path, f) for f in os.listdir(path)
+                           if f.endswith(".json"))
+        else:
+            names = [path]
+        for jname in names:
+            base = os.path.splitext(os.path.basename(jname))[0]
+            xname = os.path.join(output_dir, base + ".xml")
+            if xname in sources:
+                raise ValueError("both %s and %s would be written to %s" %
+                                 (sources[xname], jname, xname))
+            sources[xname] = jname
+            jobs.append((jname, xname))
+    return jobs
+
+_worker = None
+"""(translator, target, stream) in a batch worker process"""
+
+def init_worker(jtox, target, stream):
+    global _worker
+    _worker = (Translator(jtox), target, stream)
+
+def convert(job):
+    """Translate one file of a batch.
+
+    Return a tuple (JSON file, return value, error message).
+    """
+    jname, xname = job
+    trans, target, stream = _worker
+    try:
+        with codecs.open(jname, encoding="utf-8") as jfile:
+            with open(xname, "wb") as outfile:
+                translate_file(trans, jfile, outfile, target, stream)
+    except IOError as e:
+        return jname, 1, "%s: '%s'" % (e.strerror, e.filename)
+    except Error as e:
+        os.remove(xname)
+        return jname, e.return_value, str(e)
+    return jname, 0, None
+
+def run_batch(jtox, jobs, target, stream, workers):
+    """Translate all `jobs` with a pool of `workers` processes.
+
+    The translator is created once in each process.  Yields the
+    results of `convert`, in the order of `jobs`.
+    """
+    if workers == 1 or len(jobs) == 1:
+        init_worker(jtox, target, stream)
+        for job in jobs:
+            yield convert(job)
+        return
+    chunksize = max(1, min(64, len(jobs) // (4 * workers)))
+    pool = multiprocessing.Pool(workers, init_worker, (jtox, target, stream))
+    try:
+        for res in pool.imap(convert, jobs, chunksize):
+            yield res
+    finally:
+        pool.terminate()
+
 def main():
     """Parse arguments, open files, create and run the translator."""
     parser = argparse.ArgumentParser(
@@ -411,41 +1138,80 @@ def main():
     parser.add_argument("jtox", metavar="driver_file", action="store",
                         help="driver file produced by YANG plugin 'jtox'")
     parser.add_argument("json", metavar='json_file', action="store",
+                        nargs="+",
                         help="JSON instance document (or '-' for standard input)")
     parser.add_argument("-t", "--target", action="store", default="data",
                         help="type of the resulting XML document (default: data)")
     parser.add_argument("-o", "--output", action="store",
                         help="output file (default: standard output)")
+    parser.add_argument("-s", "--stream", action="store_true",
+                        help="read the JSON document in chunks and write "
+                        "the XML document while it is translated")
+    parser.add_argument("-d", "--output-dir", action="store",
+                        help="translate all JSON files (and '*.json' files "
+                        "in directories) given, and write the XML "
+                        "documents to this directory")
+    parser.add_argument("-j", "--jobs", action="store", type=int,
+                        help="number of worker processes for --output-dir "
+                        "(default: number of CPUs)")
     args = parser.parse_args()
     if args.target not in ["data", "config"]:
         sys.stderr.write("%s: error: unknown target '%s'\n" % (parser.prog, args.target))
         return 2
+    if args.output_dir is None and len(args.json) > 1:
+        sys.stderr.write("%s: error: more than one JSON file requires "
+                         "--output-dir\n" % parser.prog)
+        return 2
+    if args.output_dir is not None and (args.output is not None or
+                                        "-" in args.json):
+        sys.stderr.write("%s: error: --output-dir cannot be used with "
+                         "--output or standard input\n" % parser.prog)
+        return 2
     try:
-        dfile = codecs.open(args.jtox, encoding="utf-8")
-        jfile = sys.stdin \
-            if args.json == "-" else codecs.open(args.json, encoding="utf-8")
-        outfile = sys.stdout if args.output is None else open(args.output, "wb")
-        jtox = json.load(dfile)
+        with codecs.open(args.jtox, encoding="utf-8") as dfile:
+            jtox = json.load(dfile)
+        check_driver(jtox)
     except IOError as e:
         sys.stderr.write("%s: error: %s: '%s'\n" %
                          (parser.prog, e.strerror, e.filename))
         return 1
     except ValueError as e:
         sys.stderr.write("%s: error: %s\n" %
-                         (parser.prog, e.message))
+                         (parser.prog, e))
+        return 1
+    if args.output_dir is not None:
+        try:
+            os.makedirs(args.output_dir, exist_ok=True)
+            jobs = batch_jobs(args.json, args.output_dir)
+        except OSError as e:
+            sys.stderr.write("%s: error: %s: '%s'\n" %
+                             (parser.prog, e.strerror, e.filename))
+            return 1
+        except ValueError as e:
+            sys.stderr.write("%s: error: %s\n" % (parser.prog, e))
+            return 2
+        workers = args.jobs or os.cpu_count() or 1
+        ret = 0
+        for jname, res, msg in run_batch(jtox, jobs, args.target,
+                                         args.stream, workers):
+            if res != 0:
+                sys.stderr.write("%s: %s: %s\n" % (parser.prog, jname, msg))
+                ret = max(ret, res)
+        return ret
+    try:
+        jfile = sys.stdin \
+            if args.json[0] == "-" else codecs.open(args.json[0], encoding="utf-8")
+        outfile = sys.stdout.buffer if args.output is None else open(args.output, "wb")
+    except IOError as e:
+        sys.stderr.write("%s: error: %s: '%s'\n" %
+                         (parser.prog, e.strerror, e.filename))
         return 1
-    nc_uri = "urn:ietf:params:xml:ns:netconf:base:1.0"
-    ET.register_namespace("nc", nc_uri)
-    root_el = ET.Element("{%s}%s" % (nc_uri, args.target))
     trans = Translator(jtox)
     try:
-        trans.translate(jfile, root_el)
+        translate_file(trans, jfile, outfile, args.target, args.stream)
     except Error as e:
         sys.stderr.write("%s: %s\n" % (parser.prog, e))
         return e.return_value
-    for m in set(trans.prefix) - trans.node_modules:
-        root_el.attrib["xmlns:" + trans.prefix[m]] = trans.uri[m]
-    ET.ElementTree(root_el).write(outfile, encoding="utf-8", xml_declaration=True)
     return 0
 
 if __name__ == "__main__":
@@ -5,39 +5,68 @@ import os
 import optparse
 import io
 import shutil
+import time
 import codecs
 from pathlib import Path
 
 import pyang
-from pyang import plugin
-from pyang import error
-from pyang import util
-from pyang import hello
-from pyang import context
-from pyang import repository
-from pyang import statements
-from pyang import syntax
+from pyang import daemon
 
 
-def run():
-
-    usage = """%prog [options] [<filename>...]
-
-Validates the YANG module in <filename> (or stdin), and all its dependencies."""
+def run(init_plugins=True, server=None):
 
     plugindirs = []
-    # check for --plugindir
+    daemon_sock = None
+    client_sock = None
+    client_argv = sys.argv[:1]
+    # check for --plugindir, --daemon and --daemon-client
     args = iter(sys.argv[1:])
     for arg in args:
-        if arg.startswith('--plugindir'):
-            if arg == '--plugindir':
-                path = next(args)
-            elif arg.startswith('--plugindir='):
-                path = arg[arg.index('=')+1:]
-            else:
-                continue
-            plugindirs.append(path)
-    plugin.init(plugindirs)
+        for opt in ('--plugindir', '--daemon-client', '--daemon'):
+            if arg == opt:
+                val = next(args, None)
+                break
+            elif arg.startswith(opt + '='):
+                val = arg[arg.index('=')+1:]
+                break
+        else:
+            client_argv.append(arg)
+            continue
+        if opt == '--plugindir':
+            plugindirs.append(val)
+            client_argv.append(arg)
+            if arg == opt and val is not None:
+                client_argv.append(val)
+        elif opt == '--daemon':
+            daemon_sock = val
+        else:
+            client_sock = val
+
+    if client_sock is not None:
+        exit_code = daemon.request(client_sock, client_argv, plugindirs)
+        if exit_code is not None:
+            sys.exit(exit_code)
+        # the server is not available; run in-process
+        sys.argv = client_argv
+
+    # not imported at module level, in order to keep the client thin
+    from pyang import plugin
+    from pyang import error
+    from pyang import util
+    from pyang import hello
+    from pyang import context
+    from pyang import repository
+    from pyang import statements
+    from pyang import syntax
+
+    if daemon_sock is not None:
+        server_plugindirs = plugindirs[:]
+        plugin.init(plugindirs)
+        daemon.serve(daemon_sock, server_plugindirs)
+        sys.exit(0)
+
+    if init_plugins:
+        plugin.init(plugindirs)
 
     fmts = {}
     xforms = {}
@@ -45,181 +74,7 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
         p.add_output_format(fmts)
         p.add_transform(xforms)
 
-    optlist = [
-        # use capitalized versions of std options help and version
-        optparse.make_option("-h", "--help",
-                             action="help",
-                             help="Show this help message and exit"),
-        optparse.make_option("-v", "--version",
-                             action="version",
-                             help="Show version number and exit"),
-        optparse.make_option("-V", "--verbose",
-                             action="store_true"),
-        optparse.make_option("-e", "--list-errors",
-                             dest="list_errors",
-                             action="store_true",
-                             help="Print a listing of all error and warning " \
-                                 "codes and exit."),
-        optparse.make_option("--print-error-code",
-                             dest="print_error_code",
-                             action="store_true",
-                             help="On errors, print the error code instead " \
-                             "of the error message."),
-        optparse.make_option("--print-error-basename",
-                             dest="print_error_basename",
-                             action="store_true",
-                             help="On errors, print the basename of files " \
-                             "of the error message."),
-        optparse.make_option("--msg-template",
-                             dest="msg_template",
-                             type="string",
-                             help="Template used to display error messages. " \
-                             "This is a python new-style format string used " \
-                             "to format the message information with keys " \
-                             "file, line, code, type and msg. " \
-                             "Example: --msg-template='{file} || {line} || " \
-                             "{code} || {type} || {level} || {msg}'"),
-        optparse.make_option("-W",
-                             dest="warnings",
-                             action="append",
-                             default=[],
-                             metavar="WARNING",
-                             help="If WARNING is 'error', treat all warnings " \
-                                 "as errors, except any listed WARNING. " \
-                                 "If WARNING is 'none', do not report any " \
-                                 "warnings."),
-        optparse.make_option("-E",
-                             dest="errors",
-                             action="append",
-                             default=[],
-                             metavar="WARNING",
-                             help="Treat each WARNING as an error.  For a " \
-                                 "list of warnings, use --list-errors."),
-        optparse.make_option("--ignore-error",
-                             dest="ignore_error_tags",
-                             action="append",
-                             default=[],
-                             metavar="ERROR",
-                             help="Ignore ERROR.  Use with care.  For a " \
-                                 "list of errors, use --list-errors."),
-        optparse.make_option("--ignore-errors",
-                             dest="ignore_errors",
-                             action="store_true",
-                             help="Ignore all errors.  Use with care."),
-        optparse.make_option("--canonical",
-                             dest="canonical",
-                             action="store_true",
-                             help="Validate the module(s) according to the " \
-                             "canonical YANG order."),
-        optparse.make_option("--verify-revision-history",
-                             dest="verify_revision_history",
-                             action="store_true",
-                             help="Ensure that all old revisions in the " \
-                             "revision history can be found in the " \
-                             "module search path."),
-        optparse.make_option("--max-line-length",
-                             type="int",
-                             dest="max_line_len"),
-        optparse.make_option("--max-identifier-length",
-                             type="int",
-                             dest="max_identifier_len"),
-        optparse.make_option("-t", "--transform", dest="transforms",
-                             default=[], action="append",
-                             help="Apply transform TRANSFORM.  Supported " \
-                                  "transforms are: " + ', '.join(xforms)),
-        optparse.make_option("-f", "--format",
-                             dest="format",
-                             help="Convert to FORMAT.  Supported formats " \
-                             "are: " +  ', '.join(fmts)),
-        optparse.make_option("-o", "--output",
-                             dest="outfile",
-                             help="Write the output to OUTFILE instead " \
-                             "of stdout."),
-        optparse.make_option("-O", "--overwrite",
-                             dest="overwrite_output_file",
-                             action="store_true",
-                             default=False,
-                             help="Overwrite the output file, if it already exists."),
-        optparse.make_option("-F", "--features",
-                             metavar="FEATURES",
-                             dest="features",
-                             default=[],
-                             action="append",
-                             help="Features to support, default all. " \
-                             "<modname>:[<feature>,]*"),
-        optparse.make_option("-X", "--exclude-features",
-                             metavar="EXCLUDE_FEATURES",
-                             dest="exclude_features",
-                             default=[],
-                             action="append",
-                             help="Features not to support, default none. " \
-                                  "<modname>:[<feature>,]*"),
-        optparse.make_option("", "--max-status",
-                             metavar="MAXSTATUS",
-                             dest="max_status",
-                             help="Max status to support, one of: " \
-                             "current, deprecated, obsolete"),
-        optparse.make_option("", "--deviation-module",
-                             metavar="DEVIATION",
-                             dest="deviations",
-                             default=[],
-                             action="append",
-                             help="Deviation module"),
-        optparse.make_option("-p", "--path",
-                             dest="path",
-                             default=[],
-                             action="append",
-                             help=os.pathsep + "-separated search path for yin"
-                             " and yang modules"),
-        optparse.make_option("--plugindir",
-                             dest="plugindir",
-                             help="Load pyang plugins from PLUGINDIR"),
-        optparse.make_option("--strict",
-                             dest="strict",
-                             action="store_true",
-                             help="Force strict YANG compliance."),
-        optparse.make_option("--lax-quote-checks",
-                             dest="lax_quote_checks",
-                             action="store_true",
-                             help="Lax check of backslash in quoted strings."),
-        optparse.make_option("--lax-xpath-checks",
-                             dest="lax_xpath_checks",
-                             action="store_true",
-                             help="Lax check of XPath expressions."),
-        optparse.make_option("--trim-yin",
-                             dest="trim_yin",
-                             action="store_true",
-                             help="In YIN input modules, trim whitespace "
-                             "in textual arguments."),
-        optparse.make_option("-L", "--hello",
-                             dest="hello",
-                             action="store_true",
-                             help="Filename of a server's hello message is "
-                             "given instead of module filename(s)."),
-        optparse.make_option("--implicit-hello-deviations",
-                             dest="implicit_hello_deviations",
-                             action="store_true",
-                             help="Attempt to parse all deviations from hello "
-                             "message regardless of declaration."),
-        optparse.make_option("--keep-comments",
-                             dest="keep_comments",
-                             action="store_true",
-                             help="Pyang will not discard comments; \
-                                   has effect if the output plugin can \
-                                   handle comments."),
-        optparse.make_option("--no-path-recurse",
-                             dest="no_path_recurse",
-                             action="store_true",
-                             help="Do not recurse into directories in the \
-                                   yang path."),
-        ]
-
-    optparser = optparse.OptionParser(usage, add_help_option = False)
-    optparser.version = '%prog ' + pyang.__version__
-    optparser.add_options(optlist)
-
-    for p in plugin.plugins:
-        p.add_opts(optparser)
+    optparser = create_optparser()
 
     (o, args) = optparser.parse_args()
 
@@ -227,6 +82,10 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
         sys.stderr.write("no format specified\n")
         sys.exit(1)
 
+    if o.watch and (len(args) == 0 and not o.hello or o.transforms):
+        sys.stderr.write("--watch requires input files and no transforms\n")
+        sys.exit(1)
+
     filenames = args
 
     # Parse hello if present
@@ -335,6 +194,24 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
     for p in plugin.plugins:
         p.pre_load_modules(ctx)
 
+    def add_module_file(filename, text, primary_module):
+        m = syntax.re_filename.search(Path(filename).name)
+        ctx.yin_module_map = {}
+        if m is not None:
+            name, rev, in_format = m.groups()
+            name = os.path.basename(name)
+            return ctx.add_module(filename, text, in_format, name, rev,
+                                  expect_failure_error=False,
+                                  primary_module=primary_module)
+        else:
+            return ctx.add_module(filename, text,
+                                  primary_module=primary_module)
+
+    if server is not None:
+        # a warm server process; this returns in the process which
+        # serves a request, with the files of that request
+        filenames = server.serve(ctx, filenames)
+
     exit_code = 0
     modules = []
 
@@ -381,16 +258,7 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                 s = str(ex).replace('utf-8', 'utf8')
                 sys.stderr.write("%s: unicode error: %s\n" % (filename, s))
                 sys.exit(1)
-            m = syntax.re_filename.search(Path(filename).name)
-            ctx.yin_module_map = {}
-            if m is not None:
-                name, rev, in_format = m.groups()
-                name = os.path.basename(name)
-                module = ctx.add_module(filename, text, in_format, name, rev,
-                                        expect_failure_error=False,
-                                        primary_module=True)
-            else:
-                module = ctx.add_module(filename, text, primary_module=True)
+            module = add_module_file(filename, text, True)
             if module is None:
                 exit_code = 1
             else:
@@ -423,6 +291,9 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
             if m is not None:
                 ctx.deviation_modules.append(m)
 
+    if server is not None:
+        server.pre_validate(ctx)
+
     for p in plugin.plugins:
         p.pre_validate_ctx(ctx, modules)
 
@@ -475,6 +346,7 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
                 if e.msg != "":
                     sys.stderr.write(e.msg + '\n')
                 sys.exit(e.exit_code)
+            statements.invalidate_path_cache()
 
     if len(xform_and_emit_objs) > 0 and len(modules) > 0:
         for obj in xform_and_emit_objs:
@@ -483,91 +355,444 @@ Validates the YANG module in <filename> (or stdin), and all its dependencies."""
     for p in plugin.plugins:
         p.post_validate_ctx(ctx, modules)
 
-    def keyfun(e):
-        if e[0].ref == filenames[0]:
-            return 0
-        else:
-            return 1
+    def report_and_emit(exit_code):
+        def keyfun(e):
+            if e[0].ref == filenames[0]:
+                return 0
+            else:
+                return 1
 
-    ctx.errors.sort(key=lambda e: (e[0].ref, e[0].line))
-    if len(filenames) > 0:
-        # first print error for the first filename given
-        ctx.errors.sort(key=keyfun)
+        ctx.errors.sort(key=lambda e: (e[0].ref, e[0].line))
+        if len(filenames) > 0:
+            # first print error for the first filename given
+            ctx.errors.sort(key=keyfun)
 
-    if o.ignore_errors:
-        ctx.errors = []
+        if o.ignore_errors:
+            ctx.errors = []
 
-    for epos, etag, eargs in ctx.errors:
-        if etag in o.ignore_error_tags:
-            continue
-        if (ctx.implicit_errors is False and
-            epos.top is not None and
-            epos.top.arg not in modulenames and
-            (not hasattr(epos.top, 'i_modulename') or
-             epos.top.i_modulename not in modulenames) and
-            epos.ref not in filenames):
-            # this module was added implicitly (by import); skip this error
-            # the code includes submodules
-            continue
-        elevel = error.err_level(etag)
-        if error.is_warning(elevel) and etag not in o.errors:
-            kind = "warning"
-            if 'error' in o.warnings and etag not in o.warnings:
+        for epos, etag, eargs in ctx.errors:
+            if etag in o.ignore_error_tags:
+                continue
+            if (ctx.implicit_errors is False and
+                epos.top is not None and
+                epos.top.arg not in modulenames and
+                (not hasattr(epos.top, 'i_modulename') or
+                 epos.top.i_modulename not in modulenames) and
+                epos.ref not in filenames):
+                # this module was added implicitly (by import); skip this error
+                # the code includes submodules
+                continue
+            elevel = error.err_level(etag)
+            if error.is_warning(elevel) and etag not in o.errors:
+                kind = "warning"
+                if 'error' in o.warnings and etag not in o.warnings:
+                    kind = "error"
+                    exit_code = 1
+                elif 'none' in o.warnings:
+                    continue
+            else:
                 kind = "error"
                 exit_code = 1
-            elif 'none' in o.warnings:
+            emsg = etag if o.print_error_code else error.err_to_str(etag, eargs)
+
+            if o.msg_template is not None:
+                try:
+                    sys.stderr.write(str(o.msg_template).format(
+                        file=epos.ref, line=epos.line,
+                        code=etag, type=kind,
+                        msg=error.err_to_str(etag, eargs),
+                        level=elevel) + '\n')
+                except KeyError as error_msg:
+                    sys.stderr.write(
+                        "unsupported key %s in msg-template\n" % error_msg)
+                    sys.exit(1)
+            else:
+                sys.stderr.write('%s: %s: %s\n' %
+                                 (epos.label(o.print_error_basename),
+                                  kind, emsg))
+
+        if emit_obj is not None and len(modules) > 0:
+            tmpfile = None
+            if o.outfile is None:
+                fd = sys.stdout
+            else:
+                tmpfile = o.outfile + ".tmp"
+                fd = io.open(tmpfile, "w+", encoding="utf-8")
+            try:
+                emit_obj.emit(ctx, modules, fd)
+            except error.EmitError as e:
+                if e.msg != "":
+                    sys.stderr.write(e.msg + '\n')
+                if tmpfile is not None:
+                    fd.close()
+                    os.remove(tmpfile)
+                return e.exit_code
+            except:
+                if tmpfile is not None:
+                    fd.close()
+                    os.remove(tmpfile)
+                raise
+            if tmpfile is not None:
+                fd.close()
+                if not o.overwrite_output_file:
+                    os.rename(tmpfile, o.outfile)
+                else:
+                    shutil.copyfile(tmpfile, o.outfile)
+                    os.remove(tmpfile)
+        return exit_code
+
+    exit_code = report_and_emit(exit_code)
+
+    # the files checked in watch mode, with the role of each file.  A
+    # file stays in the set when it cannot be parsed, so that it is
+    # read again when it is fixed.
+    watched = {}
+    for filename in filenames:
+        watched[filename] = 'primary'
+    for filename in ctx.opts.deviations:
+        watched.setdefault(filename, 'deviation')
+
+    def get_mtimes():
+        for m_ in list(ctx.modules.values()) + ctx.deviation_modules:
+            if m_ is not None:
+                watched.setdefault(m_.pos.ref, 'import')
+        mtimes = {}
+        for ref in watched:
+            try:
+                st = os.stat(ref)
+            except OSError:
                 continue
-        else:
-            kind = "error"
-            exit_code = 1
-        emsg = etag if o.print_error_code else error.err_to_str(etag, eargs)
+            mtimes[ref] = (st.st_mtime_ns, st.st_size)
+        return mtimes
 
-        if o.msg_template is not None:
-            try:
-                sys.stderr.write(str(o.msg_template).format(
-                    file=epos.ref, line=epos.line,
-                    code=etag, type=kind,
-                    msg=error.err_to_str(etag, eargs),
-                    level=elevel) + '\n')
-            except KeyError as error_msg:
-                sys.stderr.write(
-                    "unsupported key %s in msg-template\n" % error_msg)
-                sys.exit(1)
-        else:
-            sys.stderr.write('%s: %s: %s\n' %
-                             (epos.label(o.print_error_basename), kind, emsg))
+    def read_file(ref):
+        try:
+            with io.open(ref, "r", encoding="utf-8") as fd:
+                text = fd.read()
+            if o.verbose:
+                util.report_file_read(ref, "(watch)")
+            return text
+        except IOError as ex:
+            sys.stderr.write("error %s: %s\n" % (ref, ex))
+        except UnicodeDecodeError as ex:
+            s = str(ex).replace('utf-8', 'utf8')
+            sys.stderr.write("%s: unicode error: %s\n" % (ref, s))
+        return None
 
-    if emit_obj is not None and len(modules) > 0:
-        tmpfile = None
-        if o.outfile is None:
-            fd = sys.stdout
-        else:
-            tmpfile = o.outfile + ".tmp"
-            fd = io.open(tmpfile, "w+", encoding="utf-8")
+    def file_order(refs):
+        order = dict((ref, i) for i, ref in enumerate(refs))
+        return lambda m_: order.get(m_.pos.ref, len(order))
+
+    # in watch mode, re-validate the changed modules and all modules
+    # affected by them whenever a watched file is changed
+    mtimes = get_mtimes()
+    while o.watch:
         try:
-            emit_obj.emit(ctx, modules, fd)
-        except error.EmitError as e:
-            if e.msg != "":
-                sys.stderr.write(e.msg + '\n')
-            if tmpfile is not None:
-                fd.close()
-                os.remove(tmpfile)
-            sys.exit(e.exit_code)
-        except:
-            if tmpfile is not None:
-                fd.close()
-                os.remove(tmpfile)
-            raise
-        if tmpfile is not None:
-            fd.close()
-            if not o.overwrite_output_file:
-                os.rename(tmpfile, o.outfile)
+            time.sleep(o.watch_interval)
+        except KeyboardInterrupt:
+            break
+        new_mtimes = get_mtimes()
+        changed = [ref for ref in watched
+                   if new_mtimes.get(ref) != mtimes.get(ref)]
+        if len(changed) == 0:
+            continue
+        loaded = {}
+        for m in list(ctx.modules.values()) + ctx.deviation_modules:
+            if m is not None:
+                loaded[m.pos.ref] = m
+        changed_modules = [loaded[ref] for ref in changed if ref in loaded]
+        # a file which could not be parsed before is added first, so
+        # that the modules which import it are re-validated as well
+        failed = [ref for ref in changed if ref not in loaded]
+        ctx.errors = [e for e in ctx.errors if e[0].ref not in failed]
+        texts = {}
+        # the file to read each module from, if it is not the file the
+        # module was loaded from, i.e., if the module was found in the
+        # search path while the watched file could not be parsed
+        refs = {}
+        for ref in failed:
+            texts[ref] = read_file(ref)
+            if texts[ref] is not None:
+                m = ctx.add_module(ref, texts[ref])
+                if m is not None:
+                    changed_modules.append(m)
+                    refs[m] = ref
+        reset, reread = ctx.get_affected_modules(changed_modules)
+        ctx.reset_modules(reset, reread)
+        exit_code = 0
+        replaced = {}
+        for m in reread:
+            ref = refs.get(m, m.pos.ref)
+            text = texts.get(ref)
+            if text is None:
+                text = read_file(ref)
+            if text is None:
+                replaced[m] = None
+            elif (m in ctx.deviation_modules or
+                  watched.get(ref) == 'deviation'):
+                replaced[m] = ctx.add_module(ref, text)
             else:
-                shutil.copyfile(tmpfile, o.outfile)
-                os.remove(tmpfile)
+                primary = m in modules or watched.get(ref) == 'primary'
+                replaced[m] = add_module_file(ref, text, primary)
+        ctx.deviation_modules = [replaced.get(m, m)
+                                 for m in ctx.deviation_modules
+                                 if replaced.get(m, m) is not None]
+        new_modules = []
+        for m in modules:
+            m = replaced.get(m, m)
+            if m is None:
+                exit_code = 1
+            else:
+                new_modules.append(m)
+        # add the given modules which could not be parsed before
+        for m in replaced.values():
+            if m is None:
+                continue
+            role = watched.get(m.pos.ref)
+            if role == 'deviation' and m not in ctx.deviation_modules:
+                ctx.deviation_modules.append(m)
+            elif role == 'primary' and m not in new_modules:
+                new_modules.append(m)
+        ctx.deviation_modules.sort(key=file_order(ctx.opts.deviations))
+        new_modules.sort(key=file_order(filenames))
+        modules = new_modules
+        loaded_refs = set(m.pos.ref for m in modules)
+        if any(watched[ref] == 'primary' and ref not in loaded_refs
+               for ref in watched):
+            exit_code = 1
+        modulenames = []
+        for m in modules:
+            modulenames.append(m.arg)
+            for s in m.search('include'):
+                modulenames.append(s.arg)
+
+        ctx_validate_and_prune()
+
+        if emit_obj is not None and len(modules) > 0:
+            emit_obj.post_validate(ctx, modules)
 
+        for p in plugin.plugins:
+            p.post_validate_ctx(ctx, modules)
+
+        exit_code = report_and_emit(exit_code)
+        sys.stdout.flush()
+        mtimes = get_mtimes()
     sys.exit(exit_code)
 
+def create_optparser():
+    """Return the option parser of pyang, with the options of all
+    initialized plugins."""
+    from pyang import plugin
+
+    usage = """%prog [options] [<filename>...]
+
+Validates the YANG module in <filename> (or stdin), and all its dependencies."""
+
+    fmts = {}
+    xforms = {}
+    for p in plugin.plugins:
+        p.add_output_format(fmts)
+        p.add_transform(xforms)
+
+    optlist = [
+        # use capitalized versions of std options help and version
+        optparse.make_option("-h", "--help",
+                             action="help",
+                             help="Show this help message and exit"),
+        optparse.make_option("-v", "--version",
+                             action="version",
+                             help="Show version number and exit"),
+        optparse.make_option("-V", "--verbose",
+                             action="store_true"),
+        optparse.make_option("-e", "--list-errors",
+                             dest="list_errors",
+                             action="store_true",
+                             help="Print a listing of all error and warning " \
+                                 "codes and exit."),
+        optparse.make_option("--print-error-code",
+                             dest="print_error_code",
+                             action="store_true",
+                             help="On errors, print the error code instead " \
+                             "of the error message."),
+        optparse.make_option("--print-error-basename",
+                             dest="print_error_basename",
+                             action="store_true",
+                             help="On errors, print the basename of files " \
+                             "of the error message."),
+        optparse.make_option("--msg-template",
+                             dest="msg_template",
+                             type="string",
+                             help="Template used to display error messages. " \
+                             "This is a python new-style format string used " \
+                             "to format the message information with keys " \
+                             "file, line, code, type and msg. " \
+                             "Example: --msg-template='{file} || {line} || " \
+                             "{code} || {type} || {level} || {msg}'"),
+        optparse.make_option("-W",
+                             dest="warnings",
+                             action="append",
+                             default=[],
+                             metavar="WARNING",
+                             help="If WARNING is 'error', treat all warnings " \
+                                 "as errors, except any listed WARNING. " \
+                                 "If WARNING is 'none', do not report any " \
+                                 "warnings."),
+        optparse.make_option("-E",
+                             dest="errors",
+                             action="append",
+                             default=[],
+                             metavar="WARNING",
+                             help="Treat each WARNING as an error.  For a " \
+                                 "list of warnings, use --list-errors."),
+        optparse.make_option("--ignore-error",
+                             dest="ignore_error_tags",
+                             action="append",
+                             default=[],
+                             metavar="ERROR",
+                             help="Ignore ERROR.  Use with care.  For a " \
+                                 "list of errors, use --list-errors."),
+        optparse.make_option("--ignore-errors",
+                             dest="ignore_errors",
+                             action="store_true",
+                             help="Ignore all errors.  Use with care."),
+        optparse.make_option("--canonical",
+                             dest="canonical",
+                             action="store_true",
+                             help="Validate the module(s) according to the " \
+                             "canonical YANG order."),
+        optparse.make_option("--verify-revision-history",
+                             dest="verify_revision_history",
+                             action="store_true",
+                             help="Ensure that all old revisions in the " \
+                             "revision history can be found in the " \
+                             "module search path."),
+        optparse.make_option("--max-line-length",
+                             type="int",
+                             dest="max_line_len"),
+        optparse.make_option("--max-identifier-length",
+                             type="int",
+                             dest="max_identifier_len"),
+        optparse.make_option("-t", "--transform", dest="transforms",
+                             default=[], action="append",
+                             help="Apply transform TRANSFORM.  Supported " \
+                                  "transforms are: " + ', '.join(xforms)),
+        optparse.make_option("-f", "--format",
+                             dest="format",
+                             help="Convert to FORMAT.  Supported formats " \
+                             "are: " +  ', '.join(fmts)),
+        optparse.make_option("-o", "--output",
+                             dest="outfile",
+                             help="Write the output to OUTFILE instead " \
+                             "of stdout."),
+        optparse.make_option("-O", "--overwrite",
+                             dest="overwrite_output_file",
+                             action="store_true",
+                             default=False,
+                             help="Overwrite the output file, if it already exists."),
+        optparse.make_option("-F", "--features",
+                             metavar="FEATURES",
+                             dest="features",
+                             default=[],
+                             action="append",
+                             help="Features to support, default all. " \
+                             "<modname>:[<feature>,]*"),
+        optparse.make_option("-X", "--exclude-features",
+                             metavar="EXCLUDE_FEATURES",
+                             dest="exclude_features",
+                             default=[],
+                             action="append",
+                             help="Features not to support, default none. " \
+                                  "<modname>:[<feature>,]*"),
+        optparse.make_option("", "--max-status",
+                             metavar="MAXSTATUS",
+                             dest="max_status",
+                             help="Max status to support, one of: " \
+                             "current, deprecated, obsolete"),
+        optparse.make_option("", "--deviation-module",
+                             metavar="DEVIATION",
+                             dest="deviations",
+                             default=[],
+                             action="append",
+                             help="Deviation module"),
+        optparse.make_option("-p", "--path",
+                             dest="path",
+                             default=[],
+                             action="append",
+                             help=os.pathsep + "-separated search path for yin"
+                             " and yang modules"),
+        optparse.make_option("--plugindir",
+                             dest="plugindir",
+                             help="Load pyang plugins from PLUGINDIR"),
+        optparse.make_option("--watch",
+                             dest="watch",
+                             action="store_true",
+                             help="Keep running, and re-validate the "
+                             "modules when a file is changed."),
+        optparse.make_option("--watch-interval",
+                             dest="watch_interval",
+                             type="float",
+                             default=1.0,
+                             metavar="SECONDS",
+                             help="How often to check the files in "
+                             "watch mode."),
+        optparse.make_option("--daemon",
+                             dest="daemon",
+                             metavar="SOCKET",
+                             help="Run as a resident server, which serves "
+                             "pyang requests on the Unix socket SOCKET."),
+        optparse.make_option("--daemon-client",
+                             dest="daemon_client",
+                             metavar="SOCKET",
+                             help="Let the server listening on SOCKET "
+                             "perform the request."),
+        optparse.make_option("--strict",
+                             dest="strict",
+                             action="store_true",
+                             help="Force strict YANG compliance."),
+        optparse.make_option("--lax-quote-checks",
+                             dest="lax_quote_checks",
+                             action="store_true",
+                             help="Lax check of backslash in quoted strings."),
+        optparse.make_option("--lax-xpath-checks",
+                             dest="lax_xpath_checks",
+                             action="store_true",
+                             help="Lax check of XPath expressions."),
+        optparse.make_option("--trim-yin",
+                             dest="trim_yin",
+                             action="store_true",
+                             help="In YIN input modules, trim whitespace "
+                             "in textual arguments."),
+        optparse.make_option("-L", "--hello",
+                             dest="hello",
+                             action="store_true",
+                             help="Filename of a server's hello message is "
+                             "given instead of module filename(s)."),
+        optparse.make_option("--implicit-hello-deviations",
+                             dest="implicit_hello_deviations",
+                             action="store_true",
+                             help="Attempt to parse all deviations from hello "
+                             "message regardless of declaration."),
+        optparse.make_option("--keep-comments",
+                             dest="keep_comments",
+                             action="store_true",
+                             help="Pyang will not discard comments; \
+                                   has effect if the output plugin can \
+                                   handle comments."),
+        optparse.make_option("--no-path-recurse",
+                             dest="no_path_recurse",
+                             action="store_true",
+                             help="Do not recurse into directories in the \
+                                   yang path."),
+        ]
+
+    optparser = optparse.OptionParser(usage, add_help_option = False)
+    optparser.version = '%prog ' + pyang.__version__
+    optparser.add_options(optlist)
+
+    for p in plugin.plugins:
+        p.add_opts(optparser)
+    return optparser
+
 def parse_features_string(s):
     if s.find(':') == -1:
         return s, []
@@ -0,0 +1,501 @@
+#! /usr/bin/env python
+"""XML to JSON conversion driven by a YANG data model.
+
+This is the counterpart of json2xml: it uses the same driver file,
+produced by the 'jtox' plugin, and translates an XML instance document
+to JSON, as specified in RFC 7951.
+
+The input is parsed incrementally with expat, and the JSON document is
+written while the input is read, so only the current path in the
+document is kept in memory.
+"""
+
+import argparse
+import codecs
+import json
+import re
+import sys
+import xml.parsers.expat
+
+from pyang.scripts.json2xml import (
+    Error, DataTypeError, InvalidNodeError, InvalidAnnotationError,
+    check_driver, driver_tree)
+
+NC_URI = "urn:ietf:params:xml:ns:netconf:base:1.0"
+
+class XMLError(Error):
+    """Exception raised for broken XML input."""
+
+    def __str__(self):
+        return "%s" % self.path
+
+class NotContiguousError(Error):
+    """Exception raised for list or leaf-list entries which are not adjacent."""
+
+    def __str__(self):
+        return Error.__str__(self) + " - entries are not contiguous"
+
+class UnexpectedElementError(Error):
+    """Exception raised for an element inside a leaf or leaf-list entry."""
+
+    def __str__(self):
+        return Error.__str__(self) + " - unexpected element"
+
+
+class Frame(object):
+    """An open XML element.
+
+    Instance variables:
+
+    - `self.kind`: "root", "bare" (the root of a document with a single
+      top-level node), "container", "entry", "leaf", "leaf-list",
+      "anyxml", "wrapper" (the <rpc-reply> around <data>) or "skip"
+
+    - `self.node`: children in the jtox driver (for "root", "bare",
+      "container" and "entry"), or the node specification (for leaves)
+
+    - `self.mod`: module name of the element
+
+    - `self.member`: JSON member name of the element
+
+    - `self.path`: path of the element (for error messages)
+    """
+
+    def __init__(self, kind, node, mod, member, path):
+        self.kind = kind
+        self.node = node
+        self.mod = mod
+        self.member = member
+        self.path = path
+        self.text = []
+        self.annots = None
+        """annotations (XML attributes), as a dict"""
+        # state of an object being written
+        self.count = 0
+        self.open = None
+        """member name of the array being written"""
+        self.seen = set()
+        self.ll_annots = []
+        """annotations of the entries of the open leaf-list"""
+        self.children = []
+        """children of an anyxml element"""
+
+
+class Converter(object):
+    """Translate XML to JSON according to a YANG data model.
+
+    Instance variables:
+
+    - `self.tree`, `self.annots`: the "tree" and "annotations" parts of
+      the jtox driver
+
+    - `self.modules`: dictionary mapping namespace URIs to module names
+
+    - `self.lookups`: cache of child lookups, mapping (children, tag)
+      to (member name, module name, node specification)
+    """
+
+    chunk_size = 65536
+
+    ident_re = re.compile(r"^\s*([a-zA-Z_][-_.a-zA-Z0-9]*):")
+    iid_re = re.compile(r"""('[^']*'|"[^"]*")|([/\[]\s*)"""
+                        r"""([a-zA-Z_][-_.a-zA-Z0-9]*):""")
+    int_re = re.compile(r"^[-+]?[0-9]+$")
+    dec_re = re.compile(r"^[-+]?[0-9]+\.([0-9]+)$")
+
+    def __init__(self, jtox):
+        self.tree = driver_tree(jtox)
+        self.annots = jtox["annotations"]
+        self.modules = {}
+        for m in jtox["modules"]:
+            self.modules[jtox["modules"][m][1]] = m
+        self.lookups = {}
+
+    def convert(self, infile, outfile):
+        """Translate XML from `infile` and write JSON to `outfile`.
+
+        `infile` and `outfile` must be opened in binary mode.
+        """
+        self.out = []
+        self.write = self.out.append
+        self.outfile = outfile
+        self.stack = []
+        self.nsmap = {}
+        """prefix -> list of namespace URIs in scope"""
+        parser = xml.parsers.expat.ParserCreate(namespace_separator=" ")
+        parser.buffer_text = True
+        parser.StartElementHandler = self.start_element
+        parser.EndElementHandler = self.end_element
+        parser.CharacterDataHandler = self.char_data
+        parser.StartNamespaceDeclHandler = self.start_ns
+        parser.EndNamespaceDeclHandler = self.end_ns
+        try:
+            while True:
+                chunk = infile.read(self.chunk_size)
+                parser.Parse(chunk, not chunk)
+                if not chunk:
+                    break
+                self.flush()
+        except xml.parsers.expat.ExpatError as e:
+            raise XMLError(e)
+        self.write("\n")
+        self.flush()
+
+    def flush(self):
+        self.outfile.write("".join(self.out).encode("utf-8"))
+        del self.out[:]
+
+    def start_ns(self, prefix, uri):
+        self.nsmap.setdefault(prefix, []).append(uri)
+
+    def end_ns(self, prefix):
+        self.nsmap[prefix].pop()
+
+    def char_data(self, data):
+        if self.stack and self.stack[-1].kind in ("leaf", "leaf-list",
+                                                  "anyxml"):
+            self.stack[-1].text.append(data)
+
+    def start_element(self, name, attrs):
+        uri, _sep, tag = name.rpartition(" ")
+        if not self.stack:
+            if uri == NC_URI:
+                self.start_root("wrapper" if tag == "rpc-reply" else "root")
+                return
+            # a single data tree without <data> or <config> around it
+            self.start_root("bare")
+        parent = self.stack[-1]
+        if parent.kind == "wrapper":
+            if uri == NC_URI and tag == "data":
+                self.start_root("root")
+            else:
+                self.stack.append(Frame("skip", None, None, None, None))
+            return
+        if parent.kind == "skip":
+            self.stack.append(parent)
+            return
+        if parent.kind == "anyxml":
+            child = Frame("anyxml", None, None, tag, parent.path + "/" + tag)
+            parent.children.append(child)
+            self.stack.append(child)
+            return
+        if parent.kind in ("leaf", "leaf-list"):
+            raise UnexpectedElementError(parent.path + "/" + tag)
+        member, mod, spec = self.lookup(parent, uri, tag)
+        path = parent.path + "/" + member
+        kind = spec[0]
+        if kind == "container":
+            self.begin_member(parent, member, False, path)
+            self.write("{")
+            frame = Frame("container", spec[1], mod, member, path)
+            self.stack.append(frame)
+            self.write_annotations(frame, attrs, mod)
+        elif kind == "list":
+            self.begin_member(parent, member, True, path)
+            self.write("{")
+            frame = Frame("entry", spec[1], mod, member, path)
+            self.stack.append(frame)
+            self.write_annotations(frame, attrs, mod)
+        elif kind == "leaf-list":
+            self.begin_member(parent, member, True, path)
+            frame = Frame("leaf-list", spec, mod, member, path)
+            frame.annots = self.annotations(attrs, mod, path)
+            self.stack.append(frame)
+        else:
+            self.begin_member(parent, member, False, path)
+            frame = Frame("leaf" if kind == "leaf" else "anyxml",
+                          spec, mod, member, path)
+            frame.annots = self.annotations(attrs, mod, path)
+            self.stack.append(frame)
+
+    def end_element(self, name):
+        frame = self.stack.pop()
+        if frame.kind in ("root", "bare", "container", "entry"):
+            self.end_members(frame)
+            self.write("}")
+        elif frame.kind == "leaf":
+            self.write(self.json_value("".join(frame.text), frame.node[1],
+                                       frame.mod, frame.path))
+            if frame.annots:
+                self.write(',"@%s":%s' % (frame.member,
+                                          self.dump(frame.annots)))
+        elif frame.kind == "leaf-list":
+            self.write(self.json_value("".join(frame.text), frame.node[1],
+                                       frame.mod, frame.path))
+            self.stack[-1].ll_annots.append(frame.annots or None)
+        elif frame.kind == "anyxml" and frame.node is not None:
+            # the anyxml node itself, not its content
+            self.write(self.dump(self.anyxml_value(frame)))
+            if frame.annots:
+                self.write(',"@%s":%s' % (frame.member,
+                                          self.dump(frame.annots)))
+        if len(self.stack) == 1 and self.stack[0].kind == "bare":
+            self.end_element(None)
+
+    def start_root(self, kind):
+        frame = Frame(kind, self.tree, None, None, "")
+        self.stack.append(frame)
+        if kind != "wrapper":
+            self.write("{")
+
+    def lookup(self, parent, uri, tag):
+        """Return member name, module name and node spec for a child."""
+        try:
+            return self.lookups[(id(parent.node), parent.mod, uri, tag)]
+        except KeyError:
+            pass
+        mod = self.modules.get(uri)
+        if mod is None:
+            raise InvalidNodeError(parent.path + "/" + tag)
+        member = tag if mod == parent.mod else mod + ":" + tag
+        try:
+            spec = parent.node[member]
+        except KeyError:
+            raise InvalidNodeError(parent.path + "/" + member)
+        res = self.lookups[(id(parent.node), parent.mod, uri, tag)] = \
+            (member, mod, spec)
+        return res
+
+    def begin_member(self, frame, member, array, path):
+        """Write the start of `member` in the object of `frame`.
+
+        If `array` is True, the member is a list or leaf-list, and
+        consecutive entries are written to the same array.
+        """
+        if frame.open is not None:
+            if array and frame.open == member:
+                self.write(",")
+                return
+            self.end_array(frame)
+        if member in frame.seen:
+            if array:
+                raise NotContiguousError(path)
+            raise Error(path + " - duplicate element")
+        frame.seen.add(member)
+        if frame.count:
+            self.write(",")
+        frame.count += 1
+        self.write(self.dump(member) + ":")
+        if array:
+            self.write("[")
+            frame.open = member
+
+    def end_array(self, frame):
+        self.write("]")
+        if any(frame.ll_annots):
+            self.write(',"@%s":%s' % (frame.open, self.dump(frame.ll_annots)))
+        frame.ll_annots = []
+        frame.open = None
+
+    def end_members(self, frame):
+        if frame.open is not None:
+            self.end_array(frame)
+
+    def write_annotations(self, frame, attrs, mod):
+        annots = self.annotations(attrs, mod, frame.path)
+        if annots:
+            self.write('"@":' + self.dump(annots))
+            frame.count += 1
+
+    def annotations(self, attrs, mod, path):
+        """Return XML attributes `attrs` as a metadata object, or None."""
+        if not attrs:
+            return None
+        res = {}
+        for name in attrs:
+            uri, _sep, tag = name.rpartition(" ")
+            amod = self.modules.get(uri)
+            if amod is None or amod + ":" + tag not in self.annots:
+                raise InvalidAnnotationError(path, name.replace(" ", ":"))
+            ann = amod + ":" + tag
+            res[ann] = json.loads(self.json_value(
+                attrs[name], self.annots[ann], amod, path + "/@" + ann))
+        return res
+
+    def anyxml_value(self, frame):
+        """Return the content of an anyxml element as a JSON value."""
+        if not frame.children:
+            return "".join(frame.text)
+        res = {}
+        for ch in frame.children:
+            val = self.anyxml_value(ch)
+            if ch.member in res:
+                if not isinstance(res[ch.member], list):
+                    res[ch.member] = [res[ch.member]]
+                res[ch.member].append(val)
+            else:
+                res[ch.member] = val
+        return res
+
+    dump = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    """Return `value` as compact JSON text."""
+
+    def json_value(self, text, type_spec, mod, path):
+        """Return `text` translated to its JSON form, as JSON text.
+
+        Arguments:
+
+        - `text`: the text content of the leaf
+
+        - `type_spec`: type specification produced by the "jtox" plugin
+
+        - `mod`: module name of the leaf
+
+        - `path`: path of the leaf (for error messages)
+        """
+        t = type_spec[0] if isinstance(type_spec, list) else type_spec
+        if t in ("int8", "int16", "int32", "uint8", "uint16", "uint32"):
+            val = self.int_value(text, t)
+            if val is None:
+                raise DataTypeError(path, t, text)
+            return str(val)
+        if t in ("int64", "uint64"):
+            if self.int_value(text, t) is None:
+                raise DataTypeError(path, t, text)
+            return '"%s"' % text.strip()
+        if t == "decimal64":
+            mo = self.dec_re.match(text.strip())
+            if (mo is None and self.int_re.match(text.strip()) is None
+                or mo is not None and len(mo.group(1)) > type_spec[1]):
+                raise DataTypeError(path, t, text)
+            return '"%s"' % text.strip()
+        if t == "boolean":
+            val = text.strip()
+            if val not in ("true", "false"):
+                raise DataTypeError(path, t, text)
+            return val
+        if t == "empty":
+            if text.strip():
+                raise DataTypeError(path, t, text)
+            return "[null]"
+        if t == "identityref":
+            val = text.strip()
+            mo = self.ident_re.match(val)
+            if mo is not None:
+                val = (self.prefix_module(mo.group(1), path) + ":" +
+                       val[mo.end():])
+            return self.dump(val)
+        if t == "instance-identifier":
+            return self.dump(self.translate_iid(text.strip(), path))
+        if t == "union":
+            return self.union_value(text, type_spec[1], mod, path)
+        return self.dump(text)
+
+    def int_value(self, text, t):
+        """Return `text` as an integer of type `t`, or None."""
+        text = text.strip()
+        if self.int_re.match(text) is None:
+            return None
+        val = int(text)
+        if t.startswith("u"):
+            bits = int(t[4:])
+            lo, hi = 0, 2 ** bits
+        else:
+            bits = int(t[3:])
+            lo, hi = -2 ** (bits - 1), 2 ** (bits - 1)
+        return val if lo <= val < hi else None
+
+    def union_value(self, text, members, mod, path):
+        """Return `text` translated according to the first matching member.
+
+        The members are tried in order.  A string member without
+        restrictions matches any value, so the value is a string.  The
+        other members which are encoded as JSON strings, e.g.,
+        enumerations, are skipped, since the driver does not have the
+        values they match.  An identityref or instance-identifier
+        member matches if all prefixes in the value are declared.  The
+        value is a string if no member matches.
+        """
+        res = self.member_value(text, members, mod, path)
+        return self.dump(text) if res is None else res
+
+    def member_value(self, text, members, mod, path):
+        """Return `text` translated according to the first matching
+        member of a union, or None if no member matches."""
+        for memb in members:
+            t = memb[0] if isinstance(memb, list) else memb
+            if t == "union":
+                res = self.member_value(text, memb[1], mod, path)
+                if res is not None:
+                    return res
+                continue
+            if t == "string":
+                if isinstance(memb, list):
+                    # restricted
+                    continue
+                return self.dump(text)
+            if t == "identityref":
+                if self.ident_re.match(text) is None:
+                    continue
+            elif t == "instance-identifier":
+                if not text.strip().startswith("/"):
+                    continue
+            elif t not in ("int8", "int16", "int32", "uint8", "uint16",
+                           "uint32", "int64", "uint64", "decimal64",
+                           "boolean", "empty"):
+                continue
+            try:
+                return self.json_value(text, memb, mod, path)
+            except Error:
+                continue
+        return None
+
+    def prefix_module(self, prefix, path):
+        """Return the module name for namespace prefix `prefix`."""
+        uris = self.nsmap.get(prefix)
+        if not uris or uris[-1] not in self.modules:
+            raise Error(path + " - undefined namespace prefix " + prefix)
+        return self.modules[uris[-1]]
+
+    def translate_iid(self, text, path):
+        """Translate the prefixes in an instance-identifier to modules."""
+        last = [None]
+        def repl(mo):
+            if mo.group(1):
+                return mo.group(1)
+            mod = self.prefix_module(mo.group(3), path)
+            if mod == last[0]:
+                return mo.group(2)
+            last[0] = mod
+            return mo.group(2) + mod + ":"
+        return self.iid_re.sub(repl, text)
+
+def main():
+    """Parse arguments, open files, create and run the converter."""
+    parser = argparse.ArgumentParser(
+        description="XML to JSON conversion driven by a YANG data model.")
+    parser.add_argument("jtox", metavar="driver_file", action="store",
+                        help="driver file produced by YANG plugin 'jtox'")
+    parser.add_argument("xml", metavar='xml_file', action="store",
+                        help="XML instance document (or '-' for standard input)")
+    parser.add_argument("-o", "--output", action="store",
+                        help="output file (default: standard output)")
+    args = parser.parse_args()
+    try:
+        with codecs.open(args.jtox, encoding="utf-8") as dfile:
+            jtox = json.load(dfile)
+        check_driver(jtox)
+    except IOError as e:
+        sys.stderr.write("%s: error: %s: '%s'\n" %
+                         (parser.prog, e.strerror, e.filename))
+        return 1
+    except ValueError as e:
+        sys.stderr.write("%s: error: %s\n" %
+                         (parser.prog, e))
+        return 1
+    try:
+        xfile = sys.stdin.buffer if args.xml == "-" else open(args.xml, "rb")
+        outfile = sys.stdout.buffer if args.output is None else open(args.output, "wb")
+    except IOError as e:
+        sys.stderr.write("%s: error: %s: '%s'\n" %
+                         (parser.prog, e.strerror, e.filename))
+        return 1
+    try:
+        Converter(jtox).convert(xfile, outfile)
+    except Error as e:
+        sys.stderr.write("%s: %s\n" % (parser.prog, e))
+        return e.return_value
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
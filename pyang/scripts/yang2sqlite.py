@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+"""Import YANG modules into an SQLite module repository"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+from pyang import context
+from pyang import error
+from pyang import repository
+from pyang import util
+from pyang import yang_parser
+from pyang import yin_parser
+
+
+def main():
+    """Parse arguments, and import all modules found into the database."""
+    parser = argparse.ArgumentParser(
+        description="Import YANG modules into an SQLite database, which "
+        "can be used as a module repository with 'pyang -p'.")
+    parser.add_argument("db", metavar="db_file", action="store",
+                        help="SQLite database file, created if needed")
+    parser.add_argument("path", metavar="path", action="store", nargs="+",
+                        help="directory, zip or tar file with modules")
+    parser.add_argument("--no-compress", action="store_true",
+                        help="store the module texts uncompressed")
+    parser.add_argument("--no-path-recurse", action="store_true",
+                        help="do not recurse into subdirectories")
+    parser.add_argument("-V", "--verbose", action="store_true",
+                        help="print each imported module")
+    args = parser.parse_args()
+
+    src = repository.FileRepository(os.pathsep.join(args.path),
+                                    use_env=False,
+                                    no_path_recurse=args.no_path_recurse)
+    db = repository.SQLiteRepository(args.db, create=True)
+    ctx = context.Context(repository.FileRepository("", use_env=False))
+    ret = 0
+    count = 0
+    try:
+        for _name, _rev, handle in src.get_modules_and_revisions(ctx):
+            try:
+                ref, in_format, text = src.get_module_from_handle(handle)
+            except src.ReadError as ex:
+                sys.stderr.write("%s: error: %s\n" % (parser.prog, ex))
+                ret = 1
+                continue
+            if in_format == 'yin':
+                p = yin_parser.YinParser({'no_include': True,
+                                          'no_extensions': True})
+            else:
+                p = yang_parser.YangParser()
+            ctx.errors = []
+            module = p.parse(ctx, ref, text)
+            if module is None:
+                for epos, etag, eargs in ctx.errors:
+                    if error.is_error(error.err_level(etag)):
+                        sys.stderr.write("%s: error: %s\n" %
+                                         (epos, error.err_to_str(etag, eargs)))
+                sys.stderr.write("%s: error: %s: not imported\n" %
+                                 (parser.prog, ref))
+                ret = 1
+                continue
+            if db.add_module(module, text, in_format,
+                             compress=not args.no_compress):
+                count += 1
+                if args.verbose:
+                    rev = util.get_latest_revision(module)
+                    if rev != 'unknown':
+                        name = module.arg + '@' + rev
+                    else:
+                        name = module.arg
+                    sys.stderr.write("# imported %s from %s\n" % (name, ref))
+        db.commit()
+    except (repository.Repository.ReadError, sqlite3.Error) as ex:
+        sys.stderr.write("%s: error: %s\n" % (parser.prog, ex))
+        return 1
+    if args.verbose:
+        sys.stderr.write("# %d modules imported\n" % count)
+    return ret
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+"""Check the update of a set of YANG modules
+
+Compares an old and a new set of modules, given as directories, zip
+or tar files, or SQLite databases, and checks that each module in the
+new set is a valid update of the module with the same name in the old
+set, according to the rules in Section 10 of RFC 6020 and Section 11
+of RFC 7950.
+
+Each set is loaded and validated once, in one Context, so modules
+imported by many modules are only read once.  The pairs of modules
+can be compared in several worker processes.
+
+The old set can also be a snapshot of a validated set, saved with
+--save-snapshot, so that it does not have to be loaded again for each
+check against the same release.
+"""
+
+import sys
+import os
+import optparse
+import multiprocessing
+
+import pyang
+from pyang import plugin
+from pyang import error
+from pyang import context
+from pyang import repository
+from pyang import snapshot
+from pyang.plugins import check_update
+
+
+_not_validation_opts = ('path', 'old_path', 'jobs', 'save_snapshot', 'tag',
+                        'snapshot_dir', 'print_error_code')
+"""the options which do not affect the validation of a module set; the
+modules in the search paths are part of the digest of the set"""
+
+def load_set(path, search_path, opts, snapshot_dir=None):
+    """Load and validate all modules in the module set `path`.
+
+    Imported modules which are not in the set are searched for in
+    `search_path`.  Returns (ctx, modules), where `modules` maps the
+    name of each module (not submodule) in the set to the module, or
+    to None if the module could not be loaded.
+
+    `path` can also be a snapshot file.  If `snapshot_dir` is given,
+    the validated set is kept there, keyed by the hash of the modules,
+    and loaded from there the next time.
+    """
+    if snapshot.is_snapshot(path):
+        return load_snapshot(path, opts)
+    setrepo = repository.FileRepository(path, use_env=False)
+    repos = repository.FileRepository(
+        os.pathsep.join([path] + search_path), use_env=False)
+    ctx = context.Context(repos)
+    ctx.opts = opts
+    for p in plugin.plugins:
+        p.setup_ctx(ctx)
+    if snapshot_dir is not None:
+        key = snapshot.digest(ctx, repos, _not_validation_opts)
+        filename = os.path.join(snapshot_dir, key + '.snapshot')
+        if os.path.exists(filename):
+            return load_snapshot(filename, opts)
+
+    names = sorted(set(name for name, _rev, _handle
+                       in setrepo.get_modules_and_revisions(ctx)))
+    pos = error.Position(path)
+    modules = {}
+    for name in names:
+        module = ctx.search_module(pos, name, primary_module=True)
+        if module is None or module.keyword == 'module':
+            modules[name] = module
+    ctx.validate()
+    if snapshot_dir is not None:
+        save_snapshot(ctx, modules, filename, key)
+    return ctx, modules
+
+def load_snapshot(filename, opts):
+    """Load a module set saved by `save_snapshot`.
+
+    Returns (ctx, modules) as `load_set`.
+    """
+    ctx, members, _key = snapshot.load(filename, opts)
+    modules = dict((name, ctx.get_module(name)) for name in members)
+    return ctx, modules
+
+def save_snapshot(ctx, modules, filename, key):
+    """Save the module set loaded by `load_set` to `filename`."""
+    tmpname = '%s.%d' % (filename, os.getpid())
+    snapshot.save(ctx, tmpname, list(modules), key)
+    os.rename(tmpname, filename)
+
+def format_errors(errors, opts, errors_only=False):
+    """Return the messages for `errors`, sorted by position."""
+    msgs = []
+    for epos, etag, eargs in sorted(errors, key=lambda e: (e[0].ref,
+                                                           e[0].line)):
+        level = error.err_level(etag)
+        if errors_only and not error.is_error(level):
+            continue
+        kind = 'warning' if error.is_warning(level) else 'error'
+        if opts.print_error_code:
+            msg = etag
+        else:
+            msg = error.err_to_str(etag, eargs)
+        msgs.append('%s: %s: %s' % (epos, kind, msg))
+    return msgs
+
+def bad_refs(ctx):
+    """Return the files where errors were found in `ctx`.errors."""
+    return set(epos.ref for epos, etag, _eargs in ctx.errors
+               if error.is_error(error.err_level(etag)))
+
+def bad_modules(ctx):
+    """Return the files of the modules which cannot be compared.
+
+    These are the files with errors, and the modules which import a
+    module that could not be loaded, since that error is only
+    reported for the first module which imports it.
+    """
+    refs = bad_refs(ctx)
+    for (name, _rev), m in ctx.modules.items():
+        for modname, modrev in m.i_prefixes.values():
+            if modname != name and ctx.get_module(modname, modrev) is None:
+                refs.add(m.pos.ref)
+                if m.keyword == 'submodule':
+                    mod = ctx.get_module(m.i_including_modulename)
+                    if mod is not None:
+                        refs.add(mod.pos.ref)
+    return refs
+
+_sets = None
+"""the loaded (old, new) module sets of a process"""
+
+def init_worker(old, new, opts):
+    global _sets
+    if _sets is not None:
+        # inherited from the parent process
+        return
+    oldctx, oldmods = load_set(old, opts.old_path, opts, opts.snapshot_dir)
+    newctx, newmods = load_set(new, opts.path, opts)
+    _sets = (oldctx, oldmods, bad_modules(oldctx),
+             new, newctx, newmods, bad_modules(newctx))
+
+def check_module(name):
+    """Compare the old and new module `name`.
+
+    Returns (return code, messages).
+    """
+    _oldctx, oldmods, oldbad, _new, newctx, newmods, newbad = _sets
+    oldmod = oldmods[name]
+    report = check_update.Report(newctx.opts)
+    if name not in newmods:
+        error.err_add(report.errors, oldmod.pos,
+                      'CHK_DEF_REMOVED', ('module', name, oldmod.pos))
+    elif (newmods[name] is None or oldmod.pos.ref in oldbad or
+          newmods[name].pos.ref in newbad):
+        # the errors in the modules are reported instead
+        return 0, []
+    else:
+        check_update.chk_module(report, oldmod, newmods[name])
+    ret = 1 if bad_refs(report) else 0
+    return ret, format_errors(report.errors, newctx.opts)
+
+def run_checks(old, new, opts, names):
+    """Compare the modules `names` in `opts.jobs` worker processes.
+
+    Yields the results of `check_module`, in the order of `names`.
+    """
+    if opts.jobs == 1 or len(names) <= 1:
+        for name in names:
+            yield check_module(name)
+        return
+    chunksize = max(1, min(16, len(names) // (4 * opts.jobs)))
+    pool = multiprocessing.Pool(opts.jobs, init_worker, (old, new, opts))
+    try:
+        for res in pool.imap(check_module, names, chunksize):
+            yield res
+    finally:
+        pool.terminate()
+
+def save_set(path, opts):
+    """Validate the module set `path` and save it as a snapshot."""
+    ctx, modules = load_set(path, opts.path, opts)
+    msgs = format_errors(ctx.errors, opts, errors_only=True)
+    for msg in msgs:
+        sys.stderr.write("%s\n" % msg)
+    key = opts.tag
+    if key is None:
+        key = snapshot.digest(ctx, ctx.repository, _not_validation_opts)
+    save_snapshot(ctx, modules, opts.save_snapshot, key)
+    print(key)
+    return 1 if msgs else 0
+
+def run():
+    usage = """%prog [options] OLDSET NEWSET
+       %prog [options] --save-snapshot FILE SET
+
+Check that the modules in NEWSET are valid updates of the modules with
+the same names in OLDSET.  A module set is a directory, a zip or tar
+file, or an SQLite database created by yang2sqlite.  OLDSET can also
+be a snapshot saved with --save-snapshot."""
+
+    plugindirs = []
+    plugin.init(plugindirs)
+
+    optparser = optparse.OptionParser(usage, add_help_option=False)
+    optparser.version = '%prog ' + pyang.__version__
+    optparser.add_options([
+        optparse.make_option("-h", "--help",
+                             action="help",
+                             help="Show this help message and exit"),
+        optparse.make_option("-v", "--version",
+                             action="version",
+                             help="Show version number and exit"),
+        optparse.make_option("-p", "--path",
+                             dest="path",
+                             default=[],
+                             action="append",
+                             help=os.pathsep + "-separated search path for"
+                             " modules imported by NEWSET"),
+        optparse.make_option("-j", "--jobs",
+                             dest="jobs",
+                             type="int",
+                             default=1,
+                             help="Number of worker processes (default: 1)"),
+        optparse.make_option("--save-snapshot",
+                             dest="save_snapshot",
+                             metavar="FILE",
+                             help="Validate SET and save it to FILE, to be"
+                             " used as OLDSET"),
+        optparse.make_option("--tag",
+                             dest="tag",
+                             help="Key of the snapshot, e.g., a release tag"
+                             " (default: hash of the modules)"),
+        optparse.make_option("--snapshot-dir",
+                             dest="snapshot_dir",
+                             metavar="DIR",
+                             help="Keep validated OLDSETs in DIR, keyed by"
+                             " the hash of their modules and options"),
+        optparse.make_option("--print-error-code",
+                             dest="print_error_code",
+                             action="store_true",
+                             default=False,
+                             help="On errors, print the error code instead"
+                             " of the error message."),
+        ])
+    for p in plugin.plugins:
+        p.add_opts(optparser)
+    (o, args) = optparser.parse_args()
+    if o.save_snapshot is not None:
+        if len(args) != 1:
+            optparser.error("expected SET")
+    elif len(args) != 2:
+        optparser.error("expected OLDSET and NEWSET")
+    for path in args:
+        if not os.path.exists(path):
+            sys.stderr.write("%s: error: no such module set: %s\n" %
+                             (optparser.get_prog_name(), path))
+            return 1
+    if o.snapshot_dir is not None and not os.path.isdir(o.snapshot_dir):
+        sys.stderr.write("%s: error: no such directory: %s\n" %
+                         (optparser.get_prog_name(), o.snapshot_dir))
+        return 1
+    o.old_path = [d for p in o.old_path for d in p.split(os.pathsep)]
+    o.path = [d for p in o.path for d in p.split(os.pathsep)]
+    o.jobs = max(1, o.jobs)
+
+    try:
+        if o.save_snapshot is not None:
+            return save_set(args[0], o)
+        old, new = args
+        init_worker(old, new, o)
+    except snapshot.SnapshotError as ex:
+        sys.stderr.write("%s: error: %s\n" % (optparser.get_prog_name(), ex))
+        return 1
+    oldctx, oldmods, _oldbad, _new, newctx, _newmods, _newbad = _sets
+
+    # report the errors in the sets first
+    msgs = format_errors(oldctx.errors, o, errors_only=True)
+    msgs.extend(format_errors(newctx.errors, o, errors_only=True))
+    ret = 1 if msgs else 0
+    for msg in msgs:
+        sys.stderr.write("%s\n" % msg)
+    names = sorted(name for name in oldmods if oldmods[name] is not None)
+    for res, msgs in run_checks(old, new, o, names):
+        for msg in msgs:
+            sys.stderr.write("%s\n" % msg)
+        ret = max(ret, res)
+    return ret
+
+if __name__ == '__main__':
+    sys.exit(run())
@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+"""YANG language server
+
+A Language Server Protocol (LSP) front end to pyang.  The server talks
+JSON-RPC on stdin/stdout, and provides:
+
+  - diagnostics, from the errors and warnings found by pyang
+  - go-to-definition for `uses`, `type` and leafref paths
+  - hover information
+
+The server keeps one Context for the whole session.  Open documents
+are given to the Context from memory.  When a document is changed,
+only the module in that document and the modules affected by the
+change are re-validated; all other modules are reused.
+"""
+
+import sys
+import os
+import io
+import json
+import optparse
+import traceback
+from urllib.parse import urlparse, unquote
+from pathlib import Path
+
+import pyang
+from pyang import plugin
+from pyang import error
+from pyang import context
+from pyang import repository
+from pyang import statements
+from pyang import util
+
+
+class Server(object):
+    """A YANG language server, serving one client"""
+
+    def __init__(self, ctx, infd, outfd):
+        self.ctx = ctx
+        self.infd = infd
+        self.outfd = outfd
+        self.docs = {}
+        """dict of path:text, for all open documents"""
+        self.published = set()
+        """set of paths with published diagnostics"""
+        self.index = None
+        """dict of (path, line):[(depth, stmt)], built when needed after
+        each validation"""
+        self.shutdown = False
+        self.requests = {
+            'initialize': self.initialize,
+            'shutdown': self.handle_shutdown,
+            'textDocument/definition': self.definition,
+            'textDocument/hover': self.hover,
+        }
+        self.notifications = {
+            'initialized': lambda params: None,
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didSave': lambda params: None,
+            'textDocument/didClose': self.did_close,
+        }
+
+    def serve(self):
+        """Serve requests until the client exits.
+
+        An exception in a handler is printed on stderr, and reported to
+        the client if the message is a request.
+
+        Returns the exit code."""
+        while True:
+            msg = self.read_message()
+            if msg is None:
+                return 1
+            method = msg.get('method')
+            if method == 'exit':
+                return 0 if self.shutdown else 1
+            params = msg.get('params')
+            if 'id' not in msg:
+                if method in self.notifications:
+                    try:
+                        self.notifications[method](params)
+                    except Exception:
+                        # there is no reply to a notification
+                        traceback.print_exc()
+            elif method in self.requests:
+                try:
+                    result = self.requests[method](params)
+                except Exception as ex:
+                    traceback.print_exc()
+                    self.send({'jsonrpc': '2.0', 'id': msg['id'],
+                               'error': {'code': -32603,
+                                         'message': 'internal error: %s'
+                                         % ex}})
+                    continue
+                self.send({'jsonrpc': '2.0', 'id': msg['id'],
+                           'result': result})
+            else:
+                self.send({'jsonrpc': '2.0', 'id': msg['id'],
+                           'error': {'code': -32601,
+                                     'message': 'unknown method %s'
+                                     % method}})
+
+    def read_message(self):
+        length = None
+        while True:
+            line = self.infd.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _sep, value = line.decode('ascii').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        if length is None:
+            return None
+        return json.loads(self.infd.read(length).decode('utf-8'))
+
+    def send(self, msg):
+        body = json.dumps(msg).encode('utf-8')
+        self.outfd.write(b'Content-Length: %d\r\n\r\n' % len(body))
+        self.outfd.write(body)
+        self.outfd.flush()
+
+    def notify(self, method, params):
+        self.send({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+    ## requests
+
+    def initialize(self, params):
+        return {'capabilities': {'textDocumentSync': 1,
+                                 'definitionProvider': True,
+                                 'hoverProvider': True},
+                'serverInfo': {'name': 'yanglsp',
+                               'version': pyang.__version__}}
+
+    def handle_shutdown(self, params):
+        self.shutdown = True
+        return None
+
+    def definition(self, params):
+        path = uri_to_path(params['textDocument']['uri'])
+        line = params['position']['line'] + 1
+        character = params['position']['character']
+        for stmt in self.find_stmts(path, line, character):
+            target = get_definition(stmt)
+            if target is not None:
+                return self.location(target.pos)
+        return None
+
+    def hover(self, params):
+        path = uri_to_path(params['textDocument']['uri'])
+        line = params['position']['line'] + 1
+        character = params['position']['character']
+        for stmt in self.find_stmts(path, line, character):
+            text = get_hover_text(stmt)
+            if text is not None:
+                return {'contents': {'kind': 'markdown', 'value': text}}
+        return None
+
+    ## notifications
+
+    def did_open(self, params):
+        doc = params['textDocument']
+        path = uri_to_path(doc['uri'])
+        self.docs[path] = doc['text']
+        self.update(path)
+
+    def did_change(self, params):
+        path = uri_to_path(params['textDocument']['uri'])
+        changes = params['contentChanges']
+        if len(changes) == 0:
+            return
+        # we only announce full document sync
+        self.docs[path] = changes[-1]['text']
+        self.update(path)
+
+    def did_close(self, params):
+        path = uri_to_path(params['textDocument']['uri'])
+        if path in self.docs:
+            del self.docs[path]
+            self.update(path)
+
+    ## validation
+
+    def update(self, path):
+        """Re-validate the module in `path`, and all affected modules"""
+        ctx = self.ctx
+        self.index = None
+        loaded = {}
+        for m in ctx.modules.values():
+            if m is not None:
+                loaded[os.path.abspath(m.pos.ref)] = m
+        texts = {}
+        # the file to read each module from, if it is not the file the
+        # module was loaded from, i.e., if the module was found in the
+        # search path while the document could not be parsed
+        files = {}
+        if path in loaded:
+            changed = [loaded[path]]
+        else:
+            # the document could not be parsed before, or is new; it is
+            # added first, so that the modules which import it are
+            # re-validated as well
+            changed = []
+            ctx.errors = [e for e in ctx.errors
+                          if os.path.abspath(e[0].ref) != path]
+            texts[path] = self.get_text(path)
+            if texts[path] is not None:
+                m = ctx.add_module(path, texts[path],
+                                   primary_module=(path in self.docs))
+                if m is not None:
+                    changed.append(m)
+                    files[m] = path
+        reset, reread = ctx.get_affected_modules(changed)
+        ctx.reset_modules(reset, reread)
+        refs = set()
+        for m in reread:
+            refs.add(files.get(m, os.path.abspath(m.pos.ref)))
+        # remove errors from earlier versions which could not be parsed
+        ctx.errors = [e for e in ctx.errors
+                      if os.path.abspath(e[0].ref) not in refs]
+        for ref in sorted(refs):
+            text = texts.get(ref)
+            if text is None:
+                text = self.get_text(ref)
+            if text is not None:
+                ctx.add_module(ref, text, primary_module=(ref in self.docs))
+        ctx.validate()
+        self.publish_diagnostics()
+
+    def get_text(self, path):
+        if path in self.docs:
+            return self.docs[path]
+        try:
+            with io.open(path, "r", encoding="utf-8") as fd:
+                return fd.read()
+        except (IOError, UnicodeDecodeError):
+            return None
+
+    def publish_diagnostics(self):
+        diags = {}
+        for path in self.docs:
+            diags[path] = []
+        for epos, etag, eargs in self.ctx.errors:
+            path = os.path.abspath(epos.ref)
+            if path not in diags:
+                continue
+            if error.is_warning(error.err_level(etag)):
+                severity = 2
+            else:
+                severity = 1
+            diags[path].append({'range': self.line_range(path, epos.line),
+                                'severity': severity,
+                                'code': etag,
+                                'source': 'pyang',
+                                'message': error.err_to_str(etag, eargs)})
+        for path in self.published - set(diags):
+            diags[path] = []
+        for path in sorted(diags):
+            self.notify('textDocument/publishDiagnostics',
+                        {'uri': path_to_uri(path),
+                         'diagnostics': diags[path]})
+        self.published = set(self.docs)
+
+    def line_range(self, path, line):
+        line = max(line - 1, 0)
+        length = 0
+        lines = self.docs.get(path, '').splitlines()
+        if line < len(lines):
+            length = len(lines[line])
+        return {'start': {'line': line, 'character': 0},
+                'end': {'line': line, 'character': length}}
+
+    def location(self, pos):
+        path = os.path.abspath(pos.ref)
+        return {'uri': path_to_uri(path),
+                'range': self.line_range(path, pos.line)}
+
+    def find_stmts(self, path, line, character):
+        """Return all statements defined at `line` in `path`.
+
+        Both the statements in the modules and their expanded copies
+        are returned.  The statements which start at or before
+        `character` come first, the closest first, and then the
+        innermost first.
+        """
+        if self.index is None:
+            self.index = self.build_index()
+        stmts = self.index.get((path, line), [])
+        text = self.get_text(path) or ''
+        lines = text.splitlines()
+        text = lines[line - 1] if line <= len(lines) else ''
+        # the statements are found in source order, and the expanded
+        # copies after the statements in the modules
+        cols = {}
+        col = 0
+        found = []
+        for i, (depth, stmt) in enumerate(stmts):
+            key = (stmt.raw_keyword, stmt.arg)
+            if key not in cols:
+                c = text.find(util.keyword_to_str(stmt.raw_keyword), col)
+                if c >= 0:
+                    col = c
+                cols[key] = col
+            c = cols[key]
+            if c <= character:
+                found.append(((0, -c, -depth, i), stmt))
+            else:
+                found.append(((1, c, -depth, i), stmt))
+        found.sort(key=lambda x: x[0])
+        return [stmt for (_key, stmt) in found]
+
+    def build_index(self):
+        """Return a dict of (path, line):[(depth, stmt)], for all
+        statements in the modules and their expanded copies"""
+        index = {}
+        visited = set()
+        abspaths = {}
+        def walk(stmt, depth):
+            if id(stmt) in visited:
+                return
+            visited.add(id(stmt))
+            ref = stmt.pos.ref
+            if ref not in abspaths:
+                abspaths[ref] = os.path.abspath(ref)
+            key = (abspaths[ref], stmt.pos.line)
+            index.setdefault(key, []).append((depth, stmt))
+            for s in stmt.substmts:
+                walk(s, depth + 1)
+            for s in getattr(stmt, 'i_children', []):
+                walk(s, depth + 1)
+        for m in self.ctx.modules.values():
+            if m is not None:
+                walk(m, 0)
+        return index
+
+def get_definition(stmt):
+    """Return the statement that `stmt` refers to, or None"""
+    if stmt.keyword == 'uses':
+        return getattr(stmt, 'i_grouping', None)
+    if stmt.keyword == 'path' and stmt.parent.keyword == 'type':
+        stmt = stmt.parent
+    if stmt.keyword == 'type':
+        typedef = getattr(stmt, 'i_typedef', None)
+        if typedef is not None:
+            return typedef
+        stmt = stmt.parent
+    ptr = getattr(stmt, 'i_leafref_ptr', None)
+    if ptr is not None:
+        return ptr[0]
+    return None
+
+def get_hover_text(stmt):
+    """Return a markdown description of `stmt`"""
+    if stmt.keyword in ('type', 'uses', 'path'):
+        target = get_definition(stmt)
+        if target is None:
+            return None
+        stmt = target
+    if stmt.arg is None or stmt.keyword in ('description', 'reference'):
+        return None
+    lines = ['**%s** `%s`' % (stmt.keyword, stmt.arg)]
+    module = getattr(stmt, 'i_module', None)
+    if module is not None:
+        lines.append('module: `%s`' % module.i_modulename)
+    t = stmt.search_one('type')
+    if t is not None:
+        lines.append('type: `%s`' % t.arg)
+    if is_data_node(stmt):
+        path = statements.mk_path_str(stmt, with_prefixes=True)
+        lines.append('path: `%s`' % path)
+    descr = stmt.search_one('description')
+    if descr is not None:
+        lines.append(descr.arg)
+    return '\n\n'.join(lines)
+
+def is_data_node(stmt):
+    if stmt.keyword not in _data_node_keywords:
+        return False
+    while stmt.parent is not None:
+        stmt = stmt.parent
+        if stmt.keyword in ('grouping', 'typedef'):
+            return False
+    return True
+
+_data_node_keywords = ('container', 'leaf', 'leaf-list', 'list', 'choice',
+                       'case', 'anyxml', 'anydata')
+
+def uri_to_path(uri):
+    return os.path.abspath(unquote(urlparse(uri).path))
+
+def path_to_uri(path):
+    return Path(path).as_uri()
+
+def run():
+    usage = """%prog [options]
+
+YANG language server, talking LSP on stdin and stdout."""
+
+    plugindirs = []
+    plugin.init(plugindirs)
+
+    optparser = optparse.OptionParser(usage, add_help_option=False)
+    optparser.version = '%prog ' + pyang.__version__
+    optparser.add_options([
+        optparse.make_option("-h", "--help",
+                             action="help",
+                             help="Show this help message and exit"),
+        optparse.make_option("-v", "--version",
+                             action="version",
+                             help="Show version number and exit"),
+        optparse.make_option("-p", "--path",
+                             dest="path",
+                             default=[],
+                             action="append",
+                             help=os.pathsep + "-separated search path for yin"
+                             " and yang modules"),
+        optparse.make_option("--stdio",
+                             action="store_true",
+                             help="Talk LSP on stdin and stdout (default)"),
+        ])
+    for p in plugin.plugins:
+        p.add_opts(optparser)
+    (o, args) = optparser.parse_args()
+
+    path = os.pathsep.join(o.path + ["."])
+    repos = repository.FileRepository(path)
+    ctx = context.Context(repos)
+    ctx.opts = o
+    for p in plugin.plugins:
+        p.setup_ctx(ctx)
+
+    server = Server(ctx, sys.stdin.buffer, sys.stdout.buffer)
+    return server.serve()
+
+if __name__ == '__main__':
+    sys.exit(run())
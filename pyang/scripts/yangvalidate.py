@@ -0,0 +1,157 @@
+#! /usr/bin/env python
+"""Validate XML or JSON instance documents against YANG modules"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+
+from pyang import context
+from pyang import error
+from pyang import instance
+from pyang import repository
+
+
+def load_modules(path, filenames):
+    """Return a context with the modules in `filenames` validated.
+
+    Returns (ctx, modules, errors), where errors are the messages for
+    all errors found in the modules.
+    """
+    repos = repository.FileRepository(os.pathsep.join(path + ["."]))
+    ctx = context.Context(repos)
+    modules = []
+    msgs = []
+    for filename in filenames:
+        try:
+            with io.open(filename, "r", encoding="utf-8") as fd:
+                text = fd.read()
+        except (IOError, UnicodeDecodeError) as ex:
+            msgs.append("%s: %s" % (filename, ex))
+            continue
+        module = ctx.add_module(filename, text, primary_module=True)
+        if module is not None:
+            modules.append(module)
+    ctx.validate()
+    for epos, etag, eargs in ctx.errors:
+        if error.is_error(error.err_level(etag)):
+            msgs.append("%s: error: %s" % (epos, error.err_to_str(etag, eargs)))
+    return ctx, modules, msgs
+
+def instance_jobs(paths, fmt):
+    """Return (file name, format) pairs for the documents in `paths`.
+
+    Directories in `paths` are replaced by the "*.xml" and "*.json"
+    files in them.
+    """
+    jobs = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.path.join(path, f) for f in os.listdir(path)
+                           if f.endswith(".xml") or f.endswith(".json"))
+        else:
+            names = [path]
+        for name in names:
+            jobs.append((name, fmt or
+                         ("json" if name.endswith(".json") else "xml")))
+    return jobs
+
+_validator = None
+"""the Validator of a worker process"""
+
+def init_worker(path, filenames, target):
+    global _validator
+    ctx, modules, _msgs = load_modules(path, filenames)
+    _validator = instance.Validator(ctx, modules, target)
+
+def validate(job):
+    """Validate one document.  Returns (return code, messages)."""
+    name, fmt = job
+    try:
+        if name == "-":
+            errors = _validator.validate(sys.stdin.buffer, "<stdin>", fmt)
+        else:
+            with open(name, "rb") as fd:
+                errors = _validator.validate(fd, name, fmt)
+    except IOError as ex:
+        return 1, ["%s: %s" % (name, ex.strerror)]
+    errors.sort(key=lambda e: e[0].line)
+    return (3 if errors else 0), [
+        "%s: error: %s" % (epos, error.err_to_str(etag, eargs))
+        for epos, etag, eargs in errors]
+
+def run_jobs(ctx, modules, path, filenames, target, jobs, workers):
+    """Validate all `jobs` with a pool of `workers` processes.
+
+    `modules` are the modules in `filenames`, loaded into `ctx`.  They
+    are used in this process and inherited by forked workers; where
+    fork is not available, the modules are loaded once in each worker.
+    Yields the results of `validate`, in the order of `jobs`.
+    """
+    global _validator
+    _validator = instance.Validator(ctx, modules, target)
+    if workers == 1 or len(jobs) == 1:
+        for job in jobs:
+            yield validate(job)
+        return
+    chunksize = max(1, min(64, len(jobs) // (4 * workers)))
+    if 'fork' in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context('fork').Pool(workers)
+    else:
+        pool = multiprocessing.Pool(workers, init_worker,
+                                    (path, filenames, target))
+    try:
+        for res in pool.imap(validate, jobs, chunksize):
+            yield res
+    finally:
+        pool.terminate()
+
+def main():
+    """Parse arguments, load the modules, and validate the documents."""
+    parser = argparse.ArgumentParser(
+        description="Validate XML or JSON instance documents against "
+        "YANG modules.")
+    parser.add_argument("instance", metavar="instance", action="store",
+                        nargs="+",
+                        help="instance document, or directory with "
+                        "documents (or '-' for standard input)")
+    parser.add_argument("-m", "--module", action="append", required=True,
+                        help="YANG module defining the data model "
+                        "(may be given more than once)")
+    parser.add_argument("-p", "--path", action="append", default=[],
+                        help=os.pathsep + "-separated search path for "
+                        "imported modules")
+    parser.add_argument("-t", "--target", action="store", default="data",
+                        choices=["data", "config"],
+                        help="type of the documents (default: data)")
+    parser.add_argument("-f", "--format", action="store",
+                        choices=["xml", "json"],
+                        help="format of the documents (default: JSON for "
+                        "'*.json' files, XML otherwise)")
+    parser.add_argument("-j", "--jobs", action="store", type=int,
+                        default=1,
+                        help="number of worker processes (default: 1)")
+    args = parser.parse_args()
+
+    ctx, modules, msgs = load_modules(args.path, args.module)
+    if msgs:
+        for msg in msgs:
+            sys.stderr.write("%s\n" % msg)
+        return 1
+    try:
+        jobs = instance_jobs(args.instance, args.format)
+    except OSError as e:
+        sys.stderr.write("%s: error: %s: '%s'\n" %
+                         (parser.prog, e.strerror, e.filename))
+        return 1
+    ret = 0
+    for res, msgs in run_jobs(ctx, modules, args.path, args.module,
+                              args.target, jobs, max(1, args.jobs)):
+        for msg in msgs:
+            sys.stderr.write("%s\n" % msg)
+        ret = max(ret, res)
+    return ret
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Snapshots of validated module sets
+
+A snapshot holds the modules of a Context after validation, and the
+errors found, so that they can be used again without parsing and
+validating the modules.  It is meant for module sets which do not
+change, such as the modules of a released version, which are used as
+the old modules when the update of a module is checked.
+
+A snapshot is tied to the pyang version which made it, since it
+holds pyang's internal representation of the modules.
+"""
+
+import hashlib
+import io
+import pickle
+import sys
+
+import pyang
+from . import context
+from . import plugin
+from . import repository
+
+MAGIC = b'pyang-snapshot\n'
+"""the first bytes of a snapshot file"""
+
+VERSION = 1
+"""version of the snapshot format"""
+
+class SnapshotError(Exception):
+    pass
+
+def is_snapshot(filename):
+    """Return True if `filename` is a snapshot file"""
+    try:
+        with open(filename, 'rb') as fd:
+            return fd.read(len(MAGIC)) == MAGIC
+    except IOError:
+        return False
+
+_settings = ('strict', 'canonical', 'verify_revision_history',
+             'max_line_len', 'max_identifier_len', 'lax_quote_checks',
+             'lax_xpath_checks', 'features', 'exclude_features',
+             'max_status', 'keep_comments')
+"""the attributes of a Context which affect validation"""
+
+def digest(ctx, repos, ignore=()):
+    """Return a hash of the contents of all modules in `repos`, and of
+    the settings of `ctx` which affect validation.
+
+    The settings are the validation attributes of `ctx`, the options
+    in `ctx.opts`, except the options named in `ignore`, and the
+    contents of the deviation modules given in the options.
+
+    Can be used as the key of a snapshot of the modules.
+    """
+    h = hashlib.sha256()
+    for name, rev, handle in sorted(repos.get_modules_and_revisions(ctx),
+                                    key=lambda m: (m[0], m[1] or '')):
+        try:
+            _ref, _in_format, text = repos.get_module_from_handle(handle)
+        except repos.ReadError:
+            continue
+        h.update(('%s@%s\n%d\n' % (name, rev, len(text))).encode('utf-8'))
+        h.update(text.encode('utf-8'))
+    settings = [(attr, repr(getattr(ctx, attr))) for attr in _settings]
+    opts = getattr(ctx, 'opts', None)
+    if opts is not None:
+        settings.extend(sorted((name, repr(val))
+                               for name, val in vars(opts).items()
+                               if name not in ignore))
+    h.update(repr(settings).encode('utf-8'))
+    for filename in getattr(opts, 'deviations', None) or []:
+        try:
+            with open(filename, 'rb') as fd:
+                h.update(fd.read())
+        except IOError:
+            continue
+    return h.hexdigest()
+
+class _Pickler(pickle.Pickler):
+    # the Context and its repository are not saved; the modules refer
+    # to the Context which loads the snapshot instead
+    def __init__(self, fd, ctx):
+        pickle.Pickler.__init__(self, fd, pickle.HIGHEST_PROTOCOL)
+        self.ctx = ctx
+
+    def persistent_id(self, obj):
+        if obj is self.ctx:
+            return 'ctx'
+        if obj is self.ctx.repository:
+            return 'repository'
+        return None
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, fd, ctx):
+        pickle.Unpickler.__init__(self, fd)
+        self.ctx = ctx
+
+    def persistent_load(self, pid):
+        if pid == 'ctx':
+            return self.ctx
+        if pid == 'repository':
+            return self.ctx.repository
+        raise pickle.UnpicklingError("unknown object %r" % pid)
+
+def save(ctx, filename, members, key):
+    """Save the validated modules in `ctx` to the file `filename`.
+
+    `members` is a list of the names of the modules which are part of
+    the module set, as opposed to modules which are only imported, and
+    `key` identifies the set, e.g., a release tag or a `digest`.
+    """
+    fd = io.BytesIO()
+    fd.write(MAGIC)
+    with _deep_recursion():
+        _Pickler(fd, ctx).dump({
+            'version': VERSION,
+            'pyang': pyang.__version__,
+            'key': key,
+            'members': sorted(members),
+            'modules': ctx.modules,
+            'errors': ctx.errors,
+        })
+    with open(filename, 'wb') as out:
+        out.write(fd.getvalue())
+
+def load(filename, opts=None):
+    """Load a snapshot saved by `save`.
+
+    Returns (ctx, members, key), where `ctx` is a new Context with the
+    modules and errors of the snapshot.  If `opts` is given, it is set
+    as `ctx.opts`, and the plugins set up `ctx`, as for a Context which
+    validates modules.  Raises SnapshotError if the file cannot be
+    read, or is not a snapshot made by this version of pyang.
+    """
+    ctx = context.Context(repository.FileRepository('', use_env=False))
+    if opts is not None:
+        ctx.opts = opts
+        for p in plugin.plugins:
+            p.setup_ctx(ctx)
+    try:
+        with open(filename, 'rb') as fd:
+            if fd.read(len(MAGIC)) != MAGIC:
+                raise SnapshotError("%s: not a snapshot" % filename)
+            with _deep_recursion():
+                snap = _Unpickler(fd, ctx).load()
+    except IOError as ex:
+        raise SnapshotError("%s: %s" % (filename, ex.strerror))
+    except (pickle.UnpicklingError, EOFError, AttributeError,
+            ImportError) as ex:
+        raise SnapshotError("%s: bad snapshot: %s" % (filename, ex))
+    if snap.get('version') != VERSION or snap.get('pyang') != pyang.__version__:
+        raise SnapshotError("%s: snapshot made by another pyang version (%s)"
+                            % (filename, snap.get('pyang')))
+    ctx.modules = snap['modules']
+    ctx.errors = snap['errors']
+    for (name, rev), module in ctx.modules.items():
+        handle = ('parsed', module, module.pos.ref, None)
+        ctx.revs.setdefault(name, []).append((rev, handle))
+    return ctx, snap['members'], snap['key']
+
+class _deep_recursion(object):
+    # pickle recurses once per level of nested objects, and the
+    # statements of a module are deeply linked
+    def __enter__(self):
+        self.limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(self.limit, 100000))
+
+    def __exit__(self, *exc):
+        sys.setrecursionlimit(self.limit)
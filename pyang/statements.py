@@ -2528,7 +2528,9 @@ def search_data_node(children, modulename, identifier, last_skipped = None):
 
 def search_typedef(stmt, name):
     """Search for a typedef in scope
-    First search the hierarchy, then the module and its submodules."""
+    First search the hierarchy, then the module and its submodules.
+    The result is kept in the type statement's i_typedef, which is
+    shared by its expanded copies, so each reference is searched once."""
     orig_stmt = stmt
     mod = stmt.i_orig_module
     while stmt is not None:
@@ -2550,7 +2552,9 @@ def search_typedef(stmt, name):
 
 def search_grouping(stmt, name):
     """Search for a grouping in scope
-    First search the hierarchy, then the module and its submodules."""
+    First search the hierarchy, then the module and its submodules.
+    The result is kept in the uses statement's i_grouping, so each
+    reference is searched once."""
     orig_stmt = stmt
     mod = stmt.i_orig_module
     while stmt is not None:
@@ -2999,6 +3003,9 @@ class Statement(object):
         'i_groupings',
         'i_uniques',
 
+        # see mk_path_list()
+        'i_path',
+
         # Only on copied Statements - see copy()
         'i_uses',
         'i_uses_pos',
@@ -3369,32 +3376,54 @@ def print_tree(stmt, substmts=True, i_children=True, indent=0):
         for s in stmt.i_children:
             print_tree(s, substmts, i_children, indent+1)
 
+_path_generation = object()
+"""the generation of the paths cached by _path_entry()"""
+
+def invalidate_path_cache():
+    """Invalidates the paths cached by mk_path_list() and mk_path_str().
+
+    Must be called when the schema tree is changed after validation,
+    e.g., by a transform.
+    """
+    global _path_generation
+    _path_generation = object()
+
+def _path_entry(stmt):
+    """Returns the cached path of `stmt`.
+
+    The path is a list [generation, parent, parent path, (module name,
+    prefix, name, keys), paths by mk_path_str() arguments], computed
+    from the cached path of the parent.  It is recomputed if the cache
+    has been invalidated, or if `stmt` has been moved or copied to
+    another parent.
+    """
+    if stmt.keyword in ('case', 'input', 'output'):
+        return _path_entry(stmt.parent)
+    entry = getattr(stmt, 'i_path', None)
+    if (entry is None or entry[0] is not _path_generation
+        or entry[1] is not stmt.parent):
+        if stmt.parent.keyword in ('module', 'submodule'):
+            parent_entry = None
+        else:
+            parent_entry = _path_entry(stmt.parent)
+        entry = [_path_generation, stmt.parent, parent_entry,
+                 (stmt.i_module.arg, stmt.i_module.i_prefix, stmt.arg,
+                  get_keys(stmt)),
+                 {}]
+        stmt.i_path = entry
+    return entry
+
 def mk_path_list(stmt):
     """Derives a list of tuples containing
     (module name, prefix, xpath, keys)
     per node in the statement.
     """
     resolved_names = []
-    def resolve_stmt(stmt, resolved_names):
-        if stmt.keyword in ['case', 'input', 'output']:
-            resolve_stmt(stmt.parent, resolved_names)
-            return
-        def qualified_name_elements(stmt):
-            """(module name, prefix, name, keys)"""
-            return (
-                stmt.i_module.arg,
-                stmt.i_module.i_prefix,
-                stmt.arg,
-                get_keys(stmt)
-            )
-        if stmt.parent.keyword in ['module', 'submodule']:
-            resolved_names.append(qualified_name_elements(stmt))
-            return
-        else:
-            resolve_stmt(stmt.parent, resolved_names)
-            resolved_names.append(qualified_name_elements(stmt))
-            return
-    resolve_stmt(stmt, resolved_names)
+    entry = _path_entry(stmt)
+    while entry is not None:
+        resolved_names.append(entry[3])
+        entry = entry[2]
+    resolved_names.reverse()
     return resolved_names
 
 def mk_path_str(stmt,
@@ -3418,24 +3447,34 @@ def mk_path_str(stmt,
 
     Prefixes may be included in the path if the prefix changes mid-path.
     """
-    resolved_names = mk_path_list(stmt)
-    xpath_elements = []
-    last_prefix = None
-    for index, resolved_name in enumerate(resolved_names):
-        module_name, prefix, node_name, node_keys = resolved_name
+    variant = (with_prefixes, prefix_onchange, prefix_to_module,
+               resolve_top_prefix_to_module, with_keys)
+    return _mk_path_str(_path_entry(stmt), variant)[0]
+
+def _mk_path_str(entry, variant):
+    # returns (path, last prefix), from the path of the parent
+    res = entry[4].get(variant)
+    if res is None:
+        (with_prefixes, prefix_onchange, prefix_to_module,
+         resolve_top_prefix_to_module, with_keys) = variant
+        module_name, prefix, node_name, node_keys = entry[3]
+        if entry[2] is None:
+            path, last_prefix = '', None
+        else:
+            path, last_prefix = _mk_path_str(entry[2], variant)
         xpath_element = node_name
         if with_prefixes or (prefix_onchange and prefix != last_prefix):
             new_prefix = prefix
             if (prefix_to_module or
-                (index == 0 and resolve_top_prefix_to_module)):
+                (entry[2] is None and resolve_top_prefix_to_module)):
                 new_prefix = module_name
             xpath_element = '%s:%s' % (new_prefix, node_name)
         if with_keys and node_keys:
             for node_key in node_keys:
                 xpath_element = '%s[%s]' % (xpath_element, node_key)
-        xpath_elements.append(xpath_element)
-        last_prefix = prefix
-    return '/%s' % '/'.join(xpath_elements)
+        res = ('%s/%s' % (path, xpath_element), prefix)
+        entry[4][variant] = res
+    return res
 
 def get_xpath(stmt, qualified=False, prefix_to_module=False, with_keys=False):
     """Gets the XPath path of the data node `stmt`.
@@ -1,6 +1,8 @@
 """YANG built-in types"""
 
 import base64
+import bisect
+import re
 import lxml.etree
 
 from . import util
@@ -25,6 +27,46 @@ class TypeSpec(object):
     def restrictions(self):
         return []
 
+    def __getstate__(self):
+        # the cached checkers are closures, which cannot be pickled
+        state = self.__dict__.copy()
+        state.pop('i_checkers', None)
+        return state
+
+    def value_checker(self, module=None):
+        """Return a function which parses and validates a string.
+
+        The function returns the value of the string, as `str_to_val`
+        does, or INVALID if the string is not a valid value of the type.
+        The restrictions of the type are compiled once, and the function
+        is cached per name of `module`, which is used to resolve
+        prefixes.  The built-in type specs are shared by all modules,
+        so a module which is read again replaces the cached function of
+        the old module, instead of keeping the old module alive.
+
+        See also `validate_values`.
+        """
+        checkers = self.__dict__.setdefault('i_checkers', {})
+        name = None if module is None else module.arg
+        cached = checkers.get(name)
+        if cached is not None and cached[0] is module:
+            return cached[1]
+        check = self.make_checker(module)
+        checkers[name] = (module, check)
+        return check
+
+    def make_checker(self, module):
+        # the generic checker, used for types without a faster one
+        def check(string):
+            errors = []
+            val = self.str_to_val(errors, None, string, module)
+            if val is None or errors:
+                return INVALID
+            if self.validate(errors, None, val, module) is False:
+                return INVALID
+            return val
+        return check
+
 class IntTypeSpec(TypeSpec):
     def __init__(self, name, minimum, maximum):
         TypeSpec.__init__(self, name)
@@ -63,6 +105,21 @@ class IntTypeSpec(TypeSpec):
     def restrictions(self):
         return ['range']
 
+    def make_checker(self, module):
+        slow = TypeSpec.make_checker(self, module)
+        lo, hi = self.min, self.max
+        match = _re_plain_int.match
+
+        def check(string):
+            if match(string) is None:
+                # hexadecimal, octal, or not an integer
+                return slow(string)
+            val = int(string)
+            if lo <= val <= hi:
+                return val
+            return INVALID
+        return check
+
 class Decimal64Value(object):
     def __init__(self, value, s=None, fd=None):
         # must set s (string repr) OR fd (fraction-digits)
@@ -178,6 +235,31 @@ class Decimal64TypeSpec(TypeSpec):
     def restrictions(self):
         return ['range']
 
+    def make_checker(self, module):
+        slow = TypeSpec.make_checker(self, module)
+        fd = self.fraction_digits
+        scale = 10 ** fd
+        lo, hi = self.min.value, self.max.value
+        match = _re_plain_decimal.match
+
+        def check(string):
+            m = match(string)
+            if m is None:
+                return slow(string)
+            sign, ipart, fpart = m.groups()
+            if fpart is None:
+                v = int(ipart) * scale
+            elif len(fpart) > fd:
+                return INVALID
+            else:
+                v = int(ipart) * scale + int(fpart) * 10 ** (fd - len(fpart))
+            if sign:
+                v = -v
+            if lo <= v <= hi:
+                return Decimal64Value(v, s=string)
+            return INVALID
+        return check
+
 class BooleanTypeSpec(TypeSpec):
     def __init__(self):
         TypeSpec.__init__(self, 'boolean')
@@ -192,6 +274,10 @@ class BooleanTypeSpec(TypeSpec):
                     (string, self.definition, 'not a boolean'))
             return None
 
+    def make_checker(self, module):
+        values = {'true': True, 'false': False}
+        return lambda string: values.get(string, INVALID)
+
 class StringTypeSpec(TypeSpec):
     def __init__(self):
         TypeSpec.__init__(self, 'string')
@@ -210,6 +296,9 @@ class StringTypeSpec(TypeSpec):
     def restrictions(self):
         return ['pattern', 'length']
 
+    def make_checker(self, module):
+        return lambda string: string
+
 class BinaryTypeSpec(TypeSpec):
     def __init__(self):
         TypeSpec.__init__(self, 'binary')
@@ -243,6 +332,10 @@ class EmptyTypeSpec(TypeSpec):
         err_add(errors, pos, 'BAD_DEFAULT_VALUE', 'empty')
         return None
 
+    def make_checker(self, module):
+        # an empty leaf has the value ""
+        return lambda string: string if string == "" else INVALID
+
 class IdentityrefTypeSpec(TypeSpec):
     def __init__(self, idbases):
         TypeSpec.__init__(self, 'identityref')
@@ -298,6 +391,111 @@ def is_derived_from_or_self(a, b, visited):
 
 ## type restrictions
 
+class IntervalSet(object):
+    """A set of integers, kept as a sorted list of disjoint intervals.
+
+    Overlapping intervals are merged, but adjacent intervals are not,
+    so that each part of a range or length restriction is one
+    interval.  A part of a derived restriction must be within one part
+    of its base, e.g., "3..8" is not a valid restriction of
+    "1..5 | 6..10".  Membership is tested with bisect, and subset tests
+    and intersections are done in one pass over both lists.  Decimal64
+    values are represented by their `value`.
+    """
+
+    def __init__(self, intervals=()):
+        ivs = []
+        for lo, hi in sorted(intervals):
+            if lo > hi:
+                continue
+            if ivs and lo <= ivs[-1][1]:
+                if hi > ivs[-1][1]:
+                    ivs[-1] = (ivs[-1][0], hi)
+            else:
+                ivs.append((lo, hi))
+        self.intervals = ivs
+        self._los = [lo for lo, _hi in ivs]
+
+    @classmethod
+    def from_ranges(cls, ranges, minimum, maximum):
+        """Return the set of the (lo, hi) pairs from a range or length.
+
+        'min' and 'max' stand for `minimum` and `maximum`, and a hi
+        of None means a single value.
+        """
+        ivs = []
+        for lo, hi in ranges:
+            if lo is None:
+                # bad value, already reported
+                continue
+            if hi is None:
+                hi = lo
+            lo = _range_bound(lo, minimum, maximum)
+            hi = _range_bound(hi, minimum, maximum)
+            ivs.append((lo, hi))
+        return cls(ivs)
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __eq__(self, other):
+        return self.intervals == other.intervals
+
+    def __ne__(self, other):
+        return self.intervals != other.intervals
+
+    def __repr__(self):
+        return 'IntervalSet(%r)' % self.intervals
+
+    def find(self, value):
+        """Return the interval which contains `value`, or None."""
+        i = bisect.bisect_right(self._los, value) - 1
+        if i >= 0 and value <= self.intervals[i][1]:
+            return self.intervals[i]
+        return None
+
+    def __contains__(self, value):
+        return self.find(value) is not None
+
+    def issubset(self, other):
+        ivs = other.intervals
+        j = 0
+        for lo, hi in self.intervals:
+            while j < len(ivs) and ivs[j][1] < lo:
+                j += 1
+            if j == len(ivs) or ivs[j][0] > lo or ivs[j][1] < hi:
+                return False
+        return True
+
+    def intersection(self, other):
+        a = self.intervals
+        b = other.intervals
+        res = []
+        i = j = 0
+        while i < len(a) and j < len(b):
+            lo = max(a[i][0], b[j][0])
+            hi = min(a[i][1], b[j][1])
+            if lo <= hi:
+                res.append((lo, hi))
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return IntervalSet(res)
+
+def _range_key(val):
+    return val.value if isinstance(val, Decimal64Value) else val
+
+def _range_bound(val, minimum, maximum):
+    if val == 'min':
+        val = minimum
+    elif val == 'max':
+        val = maximum
+    return _range_key(val)
+
 def validate_range_expr(errors, stmt, type_):
 
     is_int = hasattr(type_.i_type_spec, 'is_int')
@@ -378,6 +576,7 @@ class RangeTypeSpec(TypeSpec):
             self.max = base.max
         if hasattr(base, 'fraction_digits'):
             self.fraction_digits = base.fraction_digits
+        self.intervals = IntervalSet.from_ranges(ranges, self.min, self.max)
 
     def str_to_val(self, errors, pos, string, module):
         return self.base.str_to_val(errors, pos, string, module)
@@ -386,18 +585,9 @@ class RangeTypeSpec(TypeSpec):
         def inner_validate(errors, pos, val, module, errstr):
             if self.base.validate(errors, pos, val, module, errstr) is False:
                 return False, None
-            for lo, hi in self.ranges:
-                cur_hi = self.max if hi == 'max' else hi
-                if lo == 'min':
-                    cur_lo = self.min
-                elif lo == 'max':
-                    cur_lo = self.max
-                else:
-                    cur_lo = lo
-                if ((lo == 'min' or lo == 'max' or val >= cur_lo) and
-                        ((hi is None and val == cur_lo) or hi == 'max' or
-                         (hi is not None and val <= cur_hi))):
-                    return True, (lo, hi)
+            interval = self.intervals.find(_range_key(val))
+            if interval is not None:
+                return True, interval
             err_add(errors, pos, 'TYPE_VALUE',
                     (str(val), self.definition, 'range error' + errstr +
                      ' for range defined at ' + str(self.ranges_pos)))
@@ -413,6 +603,16 @@ class RangeTypeSpec(TypeSpec):
     def restrictions(self):
         return self.base.restrictions()
 
+    def make_checker(self, module):
+        # the ranges of all derived types are merged into one set
+        ivs = self.intervals
+        ts = self.base
+        while isinstance(ts, RangeTypeSpec):
+            ivs = ivs.intersection(ts.intervals)
+            ts = ts.base
+        key = _range_key if isinstance(ts, Decimal64TypeSpec) else None
+        return _interval_checker(ts.value_checker(module), ivs, key)
+
 def common_restriction(errors, pos, val, module, obj, type_name, handler, errstr):
     res = True
     lowRange = None
@@ -443,12 +643,8 @@ def common_restriction(errors, pos, val, module, obj, type_name, handler, errstr
         return False
 
     if res is True and lowRange is not None:
-        check = False
-        if lowRange[1] is None:
-            check = high != lowRange[0]
-        elif lowRange[1] != 'max':
-            check = high > lowRange[1]
-        if check:
+        # lowRange is the interval which contains low
+        if _range_key(high) > lowRange[1]:
             err_add(errors, pos, 'TYPE_VALUE',
                     (str(val[1]), obj.definition, type_name + ' error' + errstr +
                      ' for ' + type_name + ' defined at ' + str(ranges_pos)))
@@ -541,6 +737,7 @@ class LengthTypeSpec(TypeSpec):
         else:
             self.min = length_base.min
             self.max = length_base.max
+        self.intervals = IntervalSet.from_ranges(lengths, self.min, self.max)
 
     def str_to_val(self, errors, pos, string, module):
         return self.base.str_to_val(errors, pos, string, module)
@@ -562,18 +759,9 @@ class LengthTypeSpec(TypeSpec):
                                       module, errstr) is False:
                     return False, None
                 vallen = len(val)
-            for lo, hi in self.lengths:
-                cur_hi = self.max if hi == 'max' else hi
-                if lo == 'min':
-                    cur_lo = self.min
-                elif lo == 'max':
-                    cur_lo = self.max
-                else:
-                    cur_lo = lo
-                if ((lo == 'min' or lo == 'max' or vallen >= cur_lo) and
-                    ((hi is None and vallen == cur_lo) or hi == 'max' or
-                     (hi is not None and vallen <= cur_hi))):
-                    return True, (lo, hi)
+            interval = self.intervals.find(vallen)
+            if interval is not None:
+                return True, interval
             err_add(errors, pos, 'TYPE_VALUE',
                     (val, self.definition, 'length error' + errstr +
                      ' for length defined at ' + str(self.length_pos)))
@@ -589,6 +777,9 @@ class LengthTypeSpec(TypeSpec):
     def restrictions(self):
         return self.base.restrictions()
 
+    def make_checker(self, module):
+        return _string_checker(self, module)
+
 
 class XSDPattern(object):
 
@@ -632,12 +823,42 @@ class XSDPattern(object):
         else:
             self.error = None
 
+    def __getstate__(self):
+        # the compiled schema cannot be pickled; it is compiled again
+        # when it is used
+        state = self.__dict__.copy()
+        del state['schema']
+        del state['error']
+        return state
+
+    def __getattr__(self, name):
+        if name in ('schema', 'error') and 'spec' in self.__dict__:
+            self.__init__(self.spec, self.pos, self.invert_match)
+            return self.__dict__[name]
+        raise AttributeError(name)
+
     def __call__(self, value):
         if self.schema is None:
             return None
         self._avalue.text = value
         return self.schema.validate(self._avalue) is not self.invert_match
 
+    def matcher(self):
+        """Return a function which works like calling the pattern.
+
+        If possible, the pattern is translated to a Python regular
+        expression, which is much faster than validating with lxml.
+        """
+        if self.schema is None:
+            return lambda value: None
+        regex = xsd_to_python_regex(self.spec)
+        if regex is None:
+            return self
+        match = re.compile("(?:%s)\\Z" % regex).match
+        if self.invert_match:
+            return lambda value: match(value) is None
+        return lambda value: match(value) is not None
+
     def __str__(self):
         return self.spec
 
@@ -682,6 +903,9 @@ class PatternTypeSpec(TypeSpec):
     def restrictions(self):
         return self.base.restrictions()
 
+    def make_checker(self, module):
+        return _string_checker(self, module)
+
 def validate_enums(errors, enums, stmt):
     # make sure all names and values given are unique
     names = {}
@@ -736,6 +960,9 @@ class EnumerationTypeSpec(TypeSpec):
     def get_value(self, val):
         return None
 
+    def get_name(self, value):
+        return None
+
     def restrictions(self):
         return ['enum']
 
@@ -744,9 +971,20 @@ class EnumTypeSpec(TypeSpec):
         TypeSpec.__init__(self, base.name)
         self.base = base
         self.enums = [(e.arg, e.i_value) for e in enums]
+        if (isinstance(base, EnumTypeSpec) and
+                len(base.enums) == len(self.enums) and
+                all(base.enum_values.get(name) == value
+                    for name, value in self.enums)):
+            # all enums are kept, share the maps with the base
+            self.enum_values = base.enum_values
+            self.enum_names = base.enum_names
+        else:
+            # name -> value, and value -> name
+            self.enum_values = dict(self.enums)
+            self.enum_names = dict((v, name) for name, v in self.enums)
 
     def validate(self, errors, pos, val, _module, errstr=''):
-        if util.keysearch(val, 0, self.enums) is None:
+        if val not in self.enum_values:
             err_add(errors, pos, 'TYPE_VALUE',
                     (val, self.definition, 'enum not defined' + errstr))
             return False
@@ -754,15 +992,19 @@ class EnumTypeSpec(TypeSpec):
             return True
 
     def get_value(self, val):
-        r  = util.keysearch(val, 0, self.enums)
-        if r is not None:
-            return r[1]
-        else:
-            return None
+        return self.enum_values.get(val)
+
+    def get_name(self, value):
+        """Return the name of the enum with the value `value`, or None."""
+        return self.enum_names.get(value)
 
     def restrictions(self):
         return self.base.restrictions()
 
+    def make_checker(self, module):
+        names = self.enum_values
+        return lambda string: string if string in names else INVALID
+
 def validate_bits(errors, bits, stmt):
     # make sure all names and positions given are unique
     names = {}
@@ -815,6 +1057,9 @@ class BitsTypeSpec(TypeSpec):
     def get_position(self, bit):
         return None
 
+    def get_name(self, position):
+        return None
+
     def restrictions(self):
         return ['bit']
 
@@ -826,28 +1071,50 @@ class BitTypeSpec(TypeSpec):
         for b in bits:
             if hasattr(b, "i_position"):
                 self.bits.append((b.arg, b.i_position))
+        if (isinstance(base, BitTypeSpec) and
+                len(base.bits) == len(self.bits) and
+                all(base.bit_positions.get(name) == position
+                    for name, position in self.bits)):
+            # all bits are kept, share the maps with the base
+            self.bit_positions = base.bit_positions
+            self.bit_names = base.bit_names
+        else:
+            # name -> position, and position -> name
+            self.bit_positions = dict(self.bits)
+            self.bit_names = dict((p, name) for name, p in self.bits)
 
     def str_to_val(self, errors, pos, string, _module):
         return string.split()
 
     def validate(self, errors, pos, val, _module, errstr=''):
+        positions = self.bit_positions
         for v in val:
-            if util.keysearch(v, 0, self.bits) is None:
+            if v not in positions:
                 err_add(errors, pos, 'TYPE_VALUE',
                         (v, self.definition, 'bit not defined' + errstr))
                 return False
         return True
 
     def get_position(self, bit):
-        r  = util.keysearch(bit, 0, self.bits)
-        if r is not None:
-            return r[1]
-        else:
-            return None
+        return self.bit_positions.get(bit)
+
+    def get_name(self, position):
+        """Return the name of the bit at `position`, or None."""
+        return self.bit_names.get(position)
 
     def restrictions(self):
         return self.base.restrictions()
 
+    def make_checker(self, module):
+        names = self.bit_positions.keys()
+
+        def check(string):
+            val = string.split()
+            if names >= set(val):
+                return val
+            return INVALID
+        return check
+
 def validate_path_expr(errors, path):
 
     # FIXME: rewrite using the new xpath tokenizer
@@ -1025,6 +1292,14 @@ class PathTypeSpec(TypeSpec):
             # if a default value is verified
             return True
 
+    def value_checker(self, module=None):
+        # not cached, since the target node is set after the type spec
+        # is created
+        if hasattr(self, 'i_target_node'):
+            return self.i_target_node.search_one('type').\
+                i_type_spec.value_checker(module)
+        return lambda string: string
+
     def restrictions(self):
         return ['require-instance']
 
@@ -1049,6 +1324,20 @@ class UnionTypeSpec(TypeSpec):
                 (val, self.definition, 'no member type matched' + errstr))
         return False
 
+    def make_checker(self, module):
+        # unlike str_to_val, return the value of the first matching
+        # member type
+        checkers = [t.i_type_spec.value_checker(module) for t in self.types
+                    if t.i_type_spec is not None]
+
+        def check(string):
+            for c in checkers:
+                val = c(string)
+                if val is not INVALID:
+                    return val
+            return INVALID
+        return check
+
 yang_type_specs = {
    'int8': IntTypeSpec('int8', -128, 127),
    'int16': IntTypeSpec('int16', -32768, 32767),
@@ -1088,3 +1377,185 @@ def is_smaller(lo, hi):
     if hi == 'max':
         return True
     return lo < hi
+
+## bulk validation
+
+class _Invalid(object):
+    def __repr__(self):
+        return 'INVALID'
+
+INVALID = _Invalid()
+"""returned by the functions from `TypeSpec.value_checker` for bad values"""
+
+_re_plain_int = re.compile(r"-?(0|[1-9][0-9]*)\Z")
+_re_plain_decimal = re.compile(r"(-?)(0|[1-9][0-9]*)(?:\.([0-9]+))?\Z")
+
+def validate_values(type_spec, strings, module=None):
+    """Parse and validate a sequence of string values of one type.
+
+    Returns (values, mask), where `values` is a list with the value of
+    each string, or None for bad values, and `mask` is a bytearray
+    with 1 for each bad value and 0 for the others.  The values are
+    the same as from `TypeSpec.str_to_val`, except that the value of a
+    union is the value of its first matching member type.
+
+    Use `str_to_val` and `validate` on the bad values to get the error
+    messages.
+    """
+    values = list(map(type_spec.value_checker(module), strings))
+    mask = bytearray(len(values))
+    if values.count(INVALID):
+        for i, val in enumerate(values):
+            if val is INVALID:
+                values[i] = None
+                mask[i] = 1
+    return values, mask
+
+def _interval_checker(base, ivs, key):
+    """Return a checker for the values from `base` in the IntervalSet `ivs`.
+
+    `key` returns the number to look up for a value (None for the
+    value itself).
+    """
+    if ivs is None:
+        return base
+    if not ivs:
+        return lambda string: INVALID
+    if len(ivs) == 1:
+        lo, hi = ivs.intervals[0]
+
+        def check(string):
+            val = base(string)
+            if val is INVALID:
+                return val
+            k = val if key is None else key(val)
+            return val if lo <= k <= hi else INVALID
+        return check
+    find = ivs.find
+
+    def check(string):
+        val = base(string)
+        if val is INVALID:
+            return val
+        k = val if key is None else key(val)
+        return val if find(k) is not None else INVALID
+    return check
+
+def _string_checker(ts, module):
+    """Return a checker for a chain of length and pattern restrictions."""
+    ivs = None
+    patterns = []
+    while isinstance(ts, (LengthTypeSpec, PatternTypeSpec)):
+        if isinstance(ts, LengthTypeSpec):
+            ivs = ts.intervals if ivs is None else \
+                ivs.intersection(ts.intervals)
+        else:
+            patterns.extend(p.matcher() for p in ts.res)
+        ts = ts.base
+    check = _interval_checker(ts.value_checker(module), ivs, len)
+    if not patterns:
+        return check
+
+    def check_patterns(string):
+        val = check(string)
+        if val is INVALID:
+            return val
+        for match in patterns:
+            if match(val) is False:
+                return INVALID
+        return val
+    return check_patterns
+
+_xsd_escapes = frozenset('nrt\\|.-^?*+{}()[]')
+"""the single character escapes in XSD regular expressions"""
+
+def xsd_to_python_regex(spec):
+    """Translate the XSD regular expression `spec` to Python syntax.
+
+    The result is not anchored.  Returns None if `spec` uses constructs
+    which are not translated: character class subtraction, the
+    categories \\p{} and \\P{}, and the escapes \\i, \\c and \\w with
+    their complements.
+    """
+    res = []
+    i = 0
+    n = len(spec)
+    while i < n:
+        c = spec[i]
+        if c == '\\':
+            e = spec[i + 1:i + 2]
+            if e in ('d', 'D') or (e and e in _xsd_escapes):
+                res.append('\\' + e)
+            elif e == 's':
+                res.append('[ \\t\\n\\r]')
+            elif e == 'S':
+                res.append('[^ \\t\\n\\r]')
+            else:
+                return None
+            i += 2
+        elif c == '[':
+            i = _xsd_char_class(spec, i, res)
+            if i is None:
+                return None
+        elif c == '.':
+            res.append('[^\\n\\r]')
+            i += 1
+        elif c in '^$':
+            res.append('\\' + c)
+            i += 1
+        else:
+            res.append(c)
+            i += 1
+    regex = "".join(res)
+    try:
+        re.compile(regex)
+    except re.error:
+        return None
+    return regex
+
+def _xsd_char_class(spec, i, res):
+    """Translate the character class at `spec[i]`, and add it to `res`.
+
+    Returns the index after the class, or None.
+    """
+    n = len(spec)
+    i += 1
+    res.append('[')
+    if spec[i:i + 1] == '^':
+        res.append('^')
+        i += 1
+    first = True
+    # 0: after a single character, 1: after "-", 2: after a range
+    state = 0
+    while i < n:
+        c = spec[i]
+        if c == ']' and not first:
+            res.append(']')
+            return i + 1
+        if c == '[':
+            # nested class, i.e., subtraction
+            return None
+        if c == '\\':
+            e = spec[i + 1:i + 2]
+            if e in ('d', 'D') or (e and e in _xsd_escapes):
+                res.append('\\' + e)
+            elif e == 's':
+                res.append(' \\t\\n\\r')
+            else:
+                return None
+            i += 2
+        elif c == '-' and not first and spec[i + 1:i + 2] != ']':
+            if state != 0 or spec[i + 1:i + 2] == '[':
+                # as in "[a-c-e]", or subtraction
+                return None
+            res.append('-')
+            state = 1
+            i += 1
+            first = False
+            continue
+        else:
+            res.append('\\' + c if c in '\\]^&~|-' else c)
+            i += 1
+        first = False
+        state = 2 if state == 1 else 0
+    return None
@@ -0,0 +1,1022 @@
+"""XPath 1.0 evaluation over instance data
+
+Expressions parsed by `xpath_parser` are compiled once into Python
+closures, which are then evaluated over a tree of `instance.Node`
+objects.  The core function library and the YANG functions from
+RFC 7950, section 10, are supported.
+
+The XPath data model is mapped onto the instance tree as follows.  The
+root node is the root of the tree; containers, list entries, leafs
+and leaf-list entries are element nodes.  The string value of a leaf
+or leaf-list entry is the canonical form of its value; identities are
+written with the prefix of the module defining them.  There are no
+attribute, namespace or text nodes, so the attribute and namespace
+axes and the text() node test select nothing.
+
+Name tests are resolved to schema nodes once per parent schema node,
+so a child step is a dict lookup in `Node.children`.  A predicate on
+a list which compares a child leaf with an expression which does not
+depend on the context node, as in
+
+  /if:interfaces/if:interface[if:name = current()/../if:name]
+
+is evaluated with an index from leaf value to list entries, built
+once per instance tree.
+"""
+
+import base64
+import math
+import operator
+import re
+
+from . import types
+from . import util
+
+
+class XPathEvalError(Exception):
+    """Raised for expressions that cannot be compiled or evaluated."""
+
+    def __init__(self, msg):
+        Exception.__init__(self, msg)
+        self.msg = msg
+
+
+class Environment(object):
+    """The state for evaluating expressions over one instance tree.
+
+    The tree must not be modified while the environment is in use,
+    since node orders and indexes are computed from it on demand.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.current = None
+        """the initial context node, returned by current()"""
+        self.indexes = {}
+        """(id(entries), leaf schema) -> (entries, {value: [entry]})"""
+        self.instances = {}
+        """schema node -> {string value: [instance]}, for deref()"""
+        self._order = None
+
+    def evaluate(self, expr, node):
+        """Evaluate the compiled expression `expr` with context `node`."""
+        self.current = node
+        return expr(node, 1, 1, self)
+
+    def sort(self, nodes):
+        """Return `nodes` in document order, without duplicates."""
+        if len(nodes) < 2:
+            return nodes
+        if self._order is None:
+            order = self._order = {self.root: 0}
+            for i, n in enumerate(descendants(self.root), 1):
+                order[n] = i
+        return sorted(dict.fromkeys(nodes), key=self._order.get)
+
+    def leaf_instances(self, schema):
+        try:
+            return self.instances[schema]
+        except KeyError:
+            pass
+        insts = self.instances[schema] = {}
+        for n in descendants(self.root):
+            if n.schema is schema:
+                insts.setdefault(string_value(n), []).append(n)
+        return insts
+
+
+def compile_expr(q, mod, node):
+    """Compile the XPath AST `q` into a function.
+
+    `mod` is the (sub)module where the expression is defined, which is
+    used to resolve prefixes.  `node` is the schema node of the
+    initial context node, or a module for the root; unprefixed names
+    belong to its module, as in `xpath.chk_xpath_expr`.
+
+    The returned function is evaluated with `Environment.evaluate`.
+    Raises XPathEvalError if the expression uses unknown functions or
+    prefixes, or variables.
+    """
+    if node is None:
+        modname = mod.i_modulename
+    elif node.keyword in ('module', 'submodule'):
+        modname = node.i_modulename
+    else:
+        modname = node.i_module.i_modulename
+    return _Compiler(mod, modname).expr(q)
+
+## conversions
+
+def string_value(node):
+    if node.children:
+        return "".join(string_value(n) for n in descendants(node)
+                       if not n.children)
+    val = node.value
+    if val is None or node.schema is None:
+        return ""
+    cls = val.__class__
+    if cls is str:
+        return val
+    if cls is bool:
+        return "true" if val else "false"
+    if cls is list:
+        return " ".join(val)
+    if cls is bytes:
+        return base64.b64encode(val).decode('ascii')
+    if hasattr(val, 'i_module'):
+        # identity
+        return val.i_module.i_prefix + ":" + val.arg
+    return str(val)
+
+def node_number(node):
+    val = node.value
+    if val.__class__ is int:
+        return float(val)
+    return _str_to_number(string_value(node))
+
+_re_number = re.compile(r"^[ \t\r\n]*(-?([0-9]+(\.[0-9]*)?|\.[0-9]+))"
+                        r"[ \t\r\n]*$")
+
+def _str_to_number(s):
+    m = _re_number.match(s)
+    if m is None:
+        return float('nan')
+    return float(m.group(1))
+
+def to_string(val):
+    cls = val.__class__
+    if cls is str:
+        return val
+    if cls is list:
+        return string_value(val[0]) if val else ""
+    if cls is bool:
+        return "true" if val else "false"
+    return _number_to_str(val)
+
+def _number_to_str(x):
+    if x != x:
+        return "NaN"
+    if x in (float('inf'), float('-inf')):
+        return "Infinity" if x > 0 else "-Infinity"
+    if x == int(x):
+        return str(int(x))
+    s = repr(x)
+    if 'e' in s:
+        s = ("%.20f" % x).rstrip("0")
+    return s
+
+def to_number(val):
+    cls = val.__class__
+    if cls is float:
+        return val
+    if cls is bool:
+        return 1.0 if val else 0.0
+    if cls is list:
+        return node_number(val[0]) if val else float('nan')
+    return _str_to_number(val)
+
+def to_boolean(val):
+    cls = val.__class__
+    if cls is bool:
+        return val
+    if cls is float:
+        return val == val and val != 0
+    return len(val) > 0
+
+def descendants(node):
+    """Return the descendants of `node`, in document order."""
+    res = []
+    _add_descendants(node, res)
+    return res
+
+def _add_descendants(node, res):
+    for insts in node.children.values():
+        for n in insts:
+            res.append(n)
+            if n.children:
+                _add_descendants(n, res)
+
+## comparisons
+
+_ops = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+_swapped = {'=': '=', '!=': '!=', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+def compare(op, a, b):
+    """Return the result of the XPath comparison `a` `op` `b`."""
+    fn = _ops[op]
+    if a.__class__ is list:
+        if b.__class__ is list:
+            return _compare_sets(op, fn, a, b)
+        return _compare_set(op, fn, a, b)
+    if b.__class__ is list:
+        op = _swapped[op]
+        return _compare_set(op, _ops[op], b, a)
+    if op in ('=', '!='):
+        if a.__class__ is bool or b.__class__ is bool:
+            return fn(to_boolean(a), to_boolean(b))
+        if a.__class__ is float or b.__class__ is float:
+            return fn(to_number(a), to_number(b))
+        return fn(to_string(a), to_string(b))
+    return fn(to_number(a), to_number(b))
+
+def _compare_set(op, fn, nodes, val):
+    cls = val.__class__
+    if cls is bool:
+        return fn(len(nodes) > 0, val)
+    if cls is float:
+        return any(fn(node_number(n), val) for n in nodes)
+    if op in ('=', '!='):
+        return any(fn(string_value(n), val) for n in nodes)
+    val = _str_to_number(val)
+    return any(fn(node_number(n), val) for n in nodes)
+
+def _compare_sets(op, fn, a, b):
+    if not a or not b:
+        return False
+    if op == '=':
+        bs = set(string_value(n) for n in b)
+        return any(string_value(n) in bs for n in a)
+    if op == '!=':
+        return len(set(string_value(n) for n in a + b)) > 1
+    xs = [x for x in (node_number(n) for n in a) if x == x]
+    ys = [y for y in (node_number(n) for n in b) if y == y]
+    if not xs or not ys:
+        return False
+    if op in ('<', '<='):
+        return fn(min(xs), max(ys))
+    return fn(max(xs), min(ys))
+
+def _arith(op, x, y):
+    if op == '+':
+        return x + y
+    if op == '-':
+        return x - y
+    if op == '*':
+        return x * y
+    if y == 0 or y != y:
+        if op == 'mod' or x == 0 or x != x or y != y:
+            return float('nan')
+        return math.copysign(float('inf'), x) * math.copysign(1.0, y)
+    if op == 'div':
+        return x / y
+    return math.fmod(x, y)
+
+## axes
+
+def _child(node):
+    return [n for insts in node.children.values() for n in insts]
+
+def _descendant_or_self(node):
+    res = [node]
+    _add_descendants(node, res)
+    return res
+
+def _parent(node):
+    return [node.parent] if node.parent is not None else []
+
+def _ancestor(node):
+    res = []
+    node = node.parent
+    while node is not None:
+        res.append(node)
+        node = node.parent
+    return res
+
+def _ancestor_or_self(node):
+    return [node] + _ancestor(node)
+
+def _siblings(node):
+    if node.parent is None:
+        return [], 0
+    sibs = _child(node.parent)
+    for i, n in enumerate(sibs):
+        if n is node:
+            return sibs, i
+    # a dummy node, see `instance.Validator.check_xpath`
+    return sibs, len(sibs)
+
+def _following_sibling(node):
+    sibs, i = _siblings(node)
+    return sibs[i + 1:]
+
+def _preceding_sibling(node):
+    sibs, i = _siblings(node)
+    return sibs[:i][::-1]
+
+def _following(node):
+    res = []
+    for n in _ancestor_or_self(node):
+        for s in _following_sibling(n):
+            res.extend(_descendant_or_self(s))
+    return res
+
+def _preceding(node):
+    res = []
+    for n in _ancestor_or_self(node):
+        for s in _preceding_sibling(n):
+            res.extend(_descendant_or_self(s)[::-1])
+    return res
+
+def _nothing(node):
+    return []
+
+_axes = {
+    'child': _child,
+    'descendant': descendants,
+    'descendant-or-self': _descendant_or_self,
+    'parent': _parent,
+    'ancestor': _ancestor,
+    'ancestor-or-self': _ancestor_or_self,
+    'following-sibling': _following_sibling,
+    'preceding-sibling': _preceding_sibling,
+    'following': _following,
+    'preceding': _preceding,
+    'self': lambda node: [node],
+    'attribute': _nothing,
+    'namespace': _nothing,
+}
+
+_reverse_axes = ('parent', 'ancestor', 'ancestor-or-self',
+                 'preceding-sibling', 'preceding')
+
+_context_functions = ('last', 'position', 'lang')
+"""functions that depend on the context node or position"""
+
+_context_default = ('local-name', 'namespace-uri', 'name', 'string',
+                    'string-length', 'normalize-space', 'number')
+"""functions that use the context node when called without arguments"""
+
+
+class _Compiler(object):
+    """Compiles the ASTs of one expression into closures.
+
+    All compiled expressions are functions of (node, pos, size, env),
+    where `node` is the context node, `pos` and `size` the context
+    position and size, and `env` an `Environment`.
+    """
+
+    def __init__(self, mod, modname):
+        self.mod = mod
+        self.modname = modname
+
+    def expr(self, q):
+        if isinstance(q, list):
+            return self.path(q)
+        kind = q[0]
+        if kind == 'absolute':
+            return self.location(q[1], None, True)
+        if kind == 'relative':
+            return self.location(q[1], None, False)
+        if kind == 'path_expr':
+            return self.expr(q[1])
+        if kind == 'literal':
+            s = q[1][1:-1]
+            return lambda node, pos, size, env: s
+        if kind == 'number':
+            x = float(q[1])
+            return lambda node, pos, size, env: x
+        if kind == 'union':
+            return self.union(q[1])
+        if kind == 'comp':
+            return self.comp(q[1], q[2], q[3])
+        if kind == 'arith':
+            return self.arith(q[1], q[2], q[3])
+        if kind == 'bool':
+            return self.bool(q[1], q[2], q[3])
+        if kind == 'negative':
+            f = self.expr(q[1])
+            return lambda node, pos, size, env: -to_number(
+                f(node, pos, size, env))
+        if kind == 'function_call':
+            return self.function(q[1], q[2])
+        if kind == 'path':
+            # q[1] == 'filter'
+            return self.filter(q[2], q[3])
+        if kind in ('variable', 'var'):
+            raise XPathEvalError("unknown variable $%s" % q[1])
+        raise XPathEvalError("unsupported expression %s" % kind)
+
+    ## paths
+
+    def path(self, q):
+        """Compile a list of steps, possibly after a filter expression."""
+        if q and q[0][0] != 'step':
+            return self.location(q[1:], self.expr(q[0]), False)
+        return self.location(q, None, False)
+
+    def location(self, steps, head, absolute):
+        # `flat` is True if the node-set has nodes on the same level
+        # only, in document order
+        flat = head is None
+        fns = []
+        for s in steps:
+            fn, flat = self.step(s, flat)
+            fns.append(fn)
+
+        def evaluate(node, pos, size, env):
+            if head is not None:
+                nodes = head(node, pos, size, env)
+                if nodes.__class__ is not list:
+                    raise XPathEvalError("expression in path does not "
+                                         "evaluate to a node-set")
+            elif absolute:
+                nodes = [env.root]
+            else:
+                nodes = [node]
+            for fn in fns:
+                if not nodes:
+                    break
+                nodes = fn(nodes, env)
+            return nodes
+        return evaluate
+
+    def step(self, q, flat):
+        """Compile a step.  Returns (function, flat)."""
+        _step, axis, test, preds = q
+        if axis not in _axes:
+            raise XPathEvalError("unknown axis %s" % axis)
+        preds = list(preds)
+        if axis == 'child' and test[0] == 'name':
+            select, preds = self.child_select(test, preds)
+        else:
+            axisfn = _axes[axis]
+            match = (self.node_test(test) if axis != 'attribute'
+                     else None)
+            if match is None:
+                def select(node, env):
+                    return axisfn(node)
+            else:
+                def select(node, env):
+                    return [n for n in axisfn(node) if match(n)]
+        filters = [self.predicate(p) for p in preds]
+        reverse = axis in _reverse_axes
+
+        if not filters and not reverse:
+            apply = select
+        else:
+            def apply(node, env):
+                nodes = select(node, env)
+                for f in filters:
+                    if not nodes:
+                        break
+                    nodes = f(nodes, env)
+                if reverse:
+                    nodes.reverse()
+                return nodes
+
+        if flat and axis in ('child', 'self'):
+            def fn(nodes, env):
+                if len(nodes) == 1:
+                    return apply(nodes[0], env)
+                res = []
+                for n in nodes:
+                    res.extend(apply(n, env))
+                return res
+            return fn, True
+
+        if flat and axis == 'parent':
+            def fn(nodes, env):
+                res = []
+                for n in nodes:
+                    for p in apply(n, env):
+                        if not res or res[-1] is not p:
+                            res.append(p)
+                return res
+            return fn, True
+
+        def fn(nodes, env):
+            if len(nodes) == 1:
+                return apply(nodes[0], env)
+            res = []
+            for n in nodes:
+                res.extend(apply(n, env))
+            return env.sort(res)
+        return fn, False
+
+    def child_select(self, test, preds):
+        """Compile a child step with a name test.
+
+        Returns (select, preds), where `preds` are the predicates which
+        are not handled by `select`.
+        """
+        modname, name = self.qname(test[1], test[2])
+        resolve = _Resolver(modname, name)
+        keyed = self.key_predicate(preds[0]) if preds else None
+        if keyed is None:
+            def select(node, env):
+                schema = resolve(node)
+                if schema is None:
+                    return []
+                return node.children.get(schema, [])
+            return select, preds
+
+        key_resolve, valfn = keyed
+        rest = self.predicate(preds[0])
+
+        def select(node, env):
+            schema = resolve(node)
+            if schema is None:
+                return []
+            entries = node.children.get(schema)
+            if not entries:
+                return []
+            key = key_resolve(entries[0])
+            if len(entries) == 1 or schema.keyword != 'list' or key is None:
+                return rest(entries, env)
+            return _index_lookup(env, entries, key,
+                                 valfn(node, 1, 1, env), rest)
+        return select, preds[1:]
+
+    def key_predicate(self, q):
+        """Check if predicate `q` can be evaluated with an index.
+
+        This is the case if `q` is "child = expr" or "expr = child",
+        where "child" is a name and "expr" does not depend on the
+        context.  Returns (resolver for child, compiled expr) or None.
+        """
+        if q[0] != 'comp' or q[1] != '=':
+            return None
+        for a, b in ((q[2], q[3]), (q[3], q[2])):
+            if (a[0] == 'relative' and len(a[1]) == 1 and
+                a[1][0][1] == 'child' and a[1][0][2][0] == 'name' and
+                not a[1][0][3] and _context_free(b)):
+                test = a[1][0][2]
+                return (_Resolver(*self.qname(test[1], test[2])),
+                        self.expr(b))
+        return None
+
+    def node_test(self, test):
+        """Return a function matching nodes, or None to match all."""
+        if test == 'wildcard':
+            return lambda n: n.schema is not None
+        kind = test[0]
+        if kind == 'name':
+            modname, name = self.qname(test[1], test[2])
+            return lambda n: (n.schema is not None and
+                              n.schema.arg == name and
+                              n.schema.i_module.i_modulename == modname)
+        if kind == 'has_namespace':
+            modname = self.module_name(test[1][:-2])
+            return lambda n: (n.schema is not None and
+                              n.schema.i_module.i_modulename == modname)
+        if kind == 'node_type' and test[1] == 'node':
+            return None
+        # text(), comment(), processing-instruction()
+        return lambda n: False
+
+    def predicate(self, q):
+        """Compile a predicate into a filter of node lists."""
+        if q[0] == 'path_expr' and q[1][0] == 'number':
+            i = float(q[1][1])
+            if i != int(i) or i < 1:
+                return lambda nodes, env: []
+            i = int(i)
+            return lambda nodes, env: nodes[i - 1:i]
+        f = self.expr(q)
+
+        def filter_nodes(nodes, env):
+            size = len(nodes)
+            res = []
+            for pos, n in enumerate(nodes, 1):
+                v = f(n, pos, size, env)
+                if v.__class__ is float:
+                    if v == pos:
+                        res.append(n)
+                elif to_boolean(v):
+                    res.append(n)
+            return res
+        return filter_nodes
+
+    def filter(self, q, pred):
+        f = self.expr(q)
+        p = self.predicate(pred)
+
+        def evaluate(node, pos, size, env):
+            nodes = f(node, pos, size, env)
+            if nodes.__class__ is not list:
+                raise XPathEvalError("predicate on an expression which "
+                                     "does not evaluate to a node-set")
+            return p(nodes, env)
+        return evaluate
+
+    def union(self, qs):
+        fs = [self.expr(q) for q in qs]
+
+        def evaluate(node, pos, size, env):
+            res = []
+            for f in fs:
+                nodes = f(node, pos, size, env)
+                if nodes.__class__ is not list:
+                    raise XPathEvalError("union of an expression which "
+                                         "does not evaluate to a node-set")
+                res.extend(nodes)
+            return env.sort(res)
+        return evaluate
+
+    ## operators
+
+    def comp(self, op, qa, qb):
+        fa = self.expr(qa)
+        fb = self.expr(qb)
+        return lambda node, pos, size, env: compare(
+            op, fa(node, pos, size, env), fb(node, pos, size, env))
+
+    def arith(self, op, qa, qb):
+        fa = self.expr(qa)
+        fb = self.expr(qb)
+        return lambda node, pos, size, env: _arith(
+            op, to_number(fa(node, pos, size, env)),
+            to_number(fb(node, pos, size, env)))
+
+    def bool(self, op, qa, qb):
+        fa = self.expr(qa)
+        fb = self.expr(qb)
+        if op == 'and':
+            return lambda node, pos, size, env: (
+                to_boolean(fa(node, pos, size, env)) and
+                to_boolean(fb(node, pos, size, env)))
+        return lambda node, pos, size, env: (
+            to_boolean(fa(node, pos, size, env)) or
+            to_boolean(fb(node, pos, size, env)))
+
+    ## functions
+
+    def function(self, name, args):
+        argfs = [self.expr(a) for a in args]
+        if name in ('derived-from', 'derived-from-or-self'):
+            impl = self.derived_from(name == 'derived-from-or-self')
+        else:
+            try:
+                impl = _functions[name]
+            except KeyError:
+                raise XPathEvalError("unknown function %s()" % name)
+        if not argfs:
+            return lambda node, pos, size, env: impl(node, pos, size, env)
+        if len(argfs) == 1:
+            fa = argfs[0]
+            return lambda node, pos, size, env: impl(
+                node, pos, size, env, fa(node, pos, size, env))
+
+        def call(node, pos, size, env):
+            return impl(node, pos, size, env,
+                        *[f(node, pos, size, env) for f in argfs])
+        return call
+
+    def derived_from(self, or_self):
+        cache = {}
+
+        def impl(node, pos, size, env, nodes, qstring):
+            qstring = to_string(qstring)
+            try:
+                identity = cache[qstring]
+            except KeyError:
+                identity = cache[qstring] = self.identity(qstring)
+            if identity is None:
+                return False
+            for n in _nodeset(nodes, 'derived-from'):
+                val = n.value
+                if getattr(val, 'keyword', None) != 'identity':
+                    continue
+                if val is identity:
+                    if or_self:
+                        return True
+                elif types.is_derived_from(val, identity):
+                    return True
+            return False
+        return impl
+
+    def identity(self, qstring):
+        prefix, sep, name = qstring.partition(":")
+        if not sep:
+            prefix, name = self.mod.i_prefix, qstring
+        module = util.prefix_to_module(self.mod, prefix, None, [])
+        if module is None:
+            return None
+        return module.i_identities.get(name)
+
+    ## names
+
+    def module_name(self, prefix):
+        module = util.prefix_to_module(self.mod, prefix, None, [])
+        if module is None:
+            raise XPathEvalError("prefix %s is not defined" % prefix)
+        return module.i_modulename
+
+    def qname(self, prefix, name):
+        if prefix is None:
+            return self.modname, name
+        return self.module_name(prefix), name
+
+
+class _Resolver(object):
+    """Finds the schema node for a name among the children of a node.
+
+    The result is cached per schema node of the parent.
+    """
+
+    __slots__ = ('modname', 'name', 'cache')
+
+    def __init__(self, modname, name):
+        self.modname = modname
+        self.name = name
+        self.cache = {}
+
+    def __call__(self, node):
+        schema = node.schema
+        if schema is None:
+            # the root; its children are the top-level nodes of all
+            # modules
+            for s in node.children:
+                if (s.arg == self.name and
+                    s.i_module.i_modulename == self.modname):
+                    return s
+            return None
+        try:
+            return self.cache[schema]
+        except KeyError:
+            pass
+        child = util.search_data_node(getattr(schema, 'i_children', []),
+                                      self.modname, self.name)
+        self.cache[schema] = child
+        return child
+
+
+def _context_free(q):
+    """Return True if the value of `q` does not depend on the context."""
+    if isinstance(q, list):
+        return bool(q) and q[0][0] != 'step' and _context_free(q[0])
+    kind = q[0]
+    if kind in ('literal', 'number', 'absolute'):
+        return True
+    if kind in ('path_expr', 'negative'):
+        return _context_free(q[1])
+    if kind in ('comp', 'arith', 'bool'):
+        return _context_free(q[2]) and _context_free(q[3])
+    if kind == 'path':
+        return _context_free(q[2])
+    if kind == 'union':
+        return all(_context_free(a) for a in q[1])
+    if kind == 'function_call':
+        if q[1] in _context_functions:
+            return False
+        if not q[2] and q[1] in _context_default:
+            return False
+        return all(_context_free(a) for a in q[2])
+    return False
+
+def _index_lookup(env, entries, key, val, rest):
+    """Return the entries whose leaf `key` is equal to `val`.
+
+    `rest` is the full predicate, used if `val` is not a string or a
+    node-set.
+    """
+    if val.__class__ is float or val.__class__ is bool:
+        return rest(entries, env)
+    ikey = (id(entries), key)
+    try:
+        index = env.indexes[ikey][1]
+    except KeyError:
+        index = {}
+        for e in entries:
+            for n in e.children.get(key, ()):
+                lst = index.setdefault(string_value(n), [])
+                if not lst or lst[-1] is not e:
+                    lst.append(e)
+        env.indexes[ikey] = (entries, index)
+    if val.__class__ is str:
+        return index.get(val, [])
+    if len(val) == 1:
+        return index.get(string_value(val[0]), [])
+    found = set()
+    for n in val:
+        found.update(index.get(string_value(n), ()))
+    return [e for e in entries if e in found]
+
+def _nodeset(val, fname):
+    if val.__class__ is not list:
+        raise XPathEvalError("the argument of %s() is not a node-set" % fname)
+    return val
+
+def _leaf_type_spec(node):
+    type_ = node.schema.search_one('type')
+    if type_ is None:
+        return None
+    return type_.i_type_spec
+
+## function library
+
+def _f_last(node, pos, size, env):
+    return float(size)
+
+def _f_position(node, pos, size, env):
+    return float(pos)
+
+def _f_count(node, pos, size, env, nodes):
+    return float(len(_nodeset(nodes, 'count')))
+
+def _f_id(node, pos, size, env, val):
+    return []
+
+def _f_local_name(node, pos, size, env, nodes=None):
+    nodes = [node] if nodes is None else _nodeset(nodes, 'local-name')
+    if not nodes or nodes[0].schema is None:
+        return ""
+    return nodes[0].schema.arg
+
+def _f_namespace_uri(node, pos, size, env, nodes=None):
+    nodes = [node] if nodes is None else _nodeset(nodes, 'namespace-uri')
+    if not nodes or nodes[0].schema is None:
+        return ""
+    module = nodes[0].schema.i_module
+    if module.keyword == 'submodule':
+        module = module.i_ctx.get_module(module.i_modulename)
+    ns = module.search_one('namespace') if module is not None else None
+    return ns.arg if ns is not None else ""
+
+def _f_name(node, pos, size, env, nodes=None):
+    nodes = [node] if nodes is None else _nodeset(nodes, 'name')
+    if not nodes or nodes[0].schema is None:
+        return ""
+    schema = nodes[0].schema
+    return schema.i_module.i_prefix + ":" + schema.arg
+
+def _f_string(node, pos, size, env, val=None):
+    return string_value(node) if val is None else to_string(val)
+
+def _f_concat(node, pos, size, env, *args):
+    return "".join(to_string(a) for a in args)
+
+def _f_starts_with(node, pos, size, env, a, b):
+    return to_string(a).startswith(to_string(b))
+
+def _f_contains(node, pos, size, env, a, b):
+    return to_string(b) in to_string(a)
+
+def _f_substring_before(node, pos, size, env, a, b):
+    a, b = to_string(a), to_string(b)
+    i = a.find(b)
+    return a[:i] if i >= 0 else ""
+
+def _f_substring_after(node, pos, size, env, a, b):
+    a, b = to_string(a), to_string(b)
+    i = a.find(b)
+    return a[i + len(b):] if i >= 0 else ""
+
+def _f_substring(node, pos, size, env, s, start, length=None):
+    s = to_string(s)
+    start = _round(to_number(start))
+    if length is None:
+        end = float('inf')
+    else:
+        end = start + _round(to_number(length))
+    return "".join(c for i, c in enumerate(s, 1) if start <= i < end)
+
+def _f_string_length(node, pos, size, env, s=None):
+    s = string_value(node) if s is None else to_string(s)
+    return float(len(s))
+
+_re_space = re.compile(r"[ \t\r\n]+")
+
+def _f_normalize_space(node, pos, size, env, s=None):
+    s = string_value(node) if s is None else to_string(s)
+    return _re_space.sub(" ", s).strip(" \t\r\n")
+
+def _f_translate(node, pos, size, env, s, a, b):
+    s, a, b = to_string(s), to_string(a), to_string(b)
+    table = {}
+    for i, c in enumerate(a):
+        if ord(c) not in table:
+            table[ord(c)] = b[i] if i < len(b) else None
+    return s.translate(table)
+
+def _f_boolean(node, pos, size, env, val):
+    return to_boolean(val)
+
+def _f_not(node, pos, size, env, val):
+    return not to_boolean(val)
+
+def _f_true(node, pos, size, env):
+    return True
+
+def _f_false(node, pos, size, env):
+    return False
+
+def _f_lang(node, pos, size, env, val):
+    return False
+
+def _f_number(node, pos, size, env, val=None):
+    return node_number(node) if val is None else to_number(val)
+
+def _f_sum(node, pos, size, env, nodes):
+    return float(sum(node_number(n) for n in _nodeset(nodes, 'sum')))
+
+def _f_floor(node, pos, size, env, val):
+    x = to_number(val)
+    if x != x or x in (float('inf'), float('-inf')):
+        return x
+    return float(math.floor(x))
+
+def _f_ceiling(node, pos, size, env, val):
+    x = to_number(val)
+    if x != x or x in (float('inf'), float('-inf')):
+        return x
+    return float(math.ceil(x))
+
+def _round(x):
+    if x != x or x in (float('inf'), float('-inf')) or x == 0:
+        return x
+    return float(math.floor(x + 0.5))
+
+def _f_round(node, pos, size, env, val):
+    return _round(to_number(val))
+
+def _f_current(node, pos, size, env):
+    return [env.current]
+
+_patterns = {}
+
+def _f_re_match(node, pos, size, env, s, pattern):
+    pattern = to_string(pattern)
+    try:
+        regex = _patterns[pattern]
+    except KeyError:
+        regex = _patterns[pattern] = \
+            types.XSDPattern(pattern, None, False).matcher()
+    return regex(to_string(s)) is True
+
+def _f_deref(node, pos, size, env, nodes):
+    nodes = _nodeset(nodes, 'deref')
+    if not nodes or nodes[0].schema is None:
+        return []
+    n = nodes[0]
+    ptr = getattr(n.schema, 'i_leafref_ptr', None)
+    if ptr is None:
+        # instance-identifier values are not resolved
+        return []
+    return list(env.leaf_instances(ptr[0]).get(string_value(n), []))
+
+def _f_enum_value(node, pos, size, env, nodes):
+    nodes = _nodeset(nodes, 'enum-value')
+    if not nodes or nodes[0].schema is None:
+        return float('nan')
+    n = nodes[0]
+    ts = _leaf_type_spec(n)
+    if ts is not None and ts.name == 'union':
+        specs = [t.i_type_spec for t in ts.types]
+    else:
+        specs = [ts]
+    for t in specs:
+        val = getattr(t, 'get_value', lambda v: None)(n.value)
+        if val is not None:
+            return float(val)
+    return float('nan')
+
+def _f_bit_is_set(node, pos, size, env, nodes, bit):
+    nodes = _nodeset(nodes, 'bit-is-set')
+    if not nodes:
+        return False
+    val = nodes[0].value
+    return val.__class__ is list and to_string(bit) in val
+
+_functions = {
+    'last': _f_last,
+    'position': _f_position,
+    'count': _f_count,
+    'id': _f_id,
+    'local-name': _f_local_name,
+    'namespace-uri': _f_namespace_uri,
+    'name': _f_name,
+    'string': _f_string,
+    'concat': _f_concat,
+    'starts-with': _f_starts_with,
+    'contains': _f_contains,
+    'substring-before': _f_substring_before,
+    'substring-after': _f_substring_after,
+    'substring': _f_substring,
+    'string-length': _f_string_length,
+    'normalize-space': _f_normalize_space,
+    'translate': _f_translate,
+    'boolean': _f_boolean,
+    'not': _f_not,
+    'true': _f_true,
+    'false': _f_false,
+    'lang': _f_lang,
+    'number': _f_number,
+    'sum': _f_sum,
+    'floor': _f_floor,
+    'ceiling': _f_ceiling,
+    'round': _f_round,
+    'current': _f_current,
+    're-match': _f_re_match,
+    'deref': _f_deref,
+    'enum-value': _f_enum_value,
+    'bit-is-set': _f_bit_is_set,
+}
@@ -80,6 +80,11 @@ setup(name='pyang',
               'pyang = pyang.scripts.pyang_tool:run',
               'yang2html = pyang.scripts.yang2html:run',
               'json2xml = pyang.scripts.json2xml:main',
+              'xml2json = pyang.scripts.xml2json:main',
+              'yangvalidate = pyang.scripts.yangvalidate:main',
+              'yanglsp = pyang.scripts.yanglsp:run',
+              'yangcheckupdate = pyang.scripts.yangcheckupdate:run',
+              'yang2sqlite = pyang.scripts.yang2sqlite:main',
           ]
       },
       packages=['pyang', 'pyang.plugins', 'pyang.scripts', 'pyang.translators', 'pyang.transforms'],
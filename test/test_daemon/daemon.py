@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# start a pyang server, run some requests through the thin client,
+# check that they give the same result as a direct run, and shut the
+# server down
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from pyang import daemon
+
+SOCK = 'work/pyang.sock'
+
+requests = [
+    ['-f', 'tree', 'a.yang'],
+    ['-f', 'tree'],                     # the module is read from stdin
+    ['bad.yang'],
+    # the imported module is loaded in a warm process, and its errors
+    # are reported for each request
+    ['-p', 'work', 'c.yang'],
+    ['-p', 'work', 'd.yang'],
+    ['-p', 'work', 'c.yang', 'd.yang'],
+    ['-p', 'work', '-f', 'tree', 'c.yang'],
+    ['-p', 'work', '-f', 'tree', 'd.yang'],
+    # other imports
+    ['-p', 'work', '-f', 'tree', 'e.yang'],
+    # the imported module is one of the input files
+    ['-p', 'work', '-f', 'tree', 'c.yang', 'work/imp.yang'],
+    # the imported module is changed
+    'edit',
+    ['-p', 'work', 'c.yang'],
+    ['-p', 'work', '-f', 'tree', 'c.yang'],
+]
+
+def run(cmd, args):
+    with open('a.yang') as stdin:
+        p = subprocess.run(cmd + args, stdin=stdin,
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                           universal_newlines=True)
+    return p.returncode, p.stdout, p.stderr
+
+def main():
+    pyang = sys.argv[1:]
+    if os.path.exists('work'):
+        shutil.rmtree('work')
+    os.mkdir('work')
+    shutil.copy('imp.yang.in', 'work/imp.yang')
+    server = subprocess.Popen(pyang + ['--daemon', SOCK])
+    ok = True
+    try:
+        for _i in range(100):
+            if os.path.exists(SOCK):
+                break
+            time.sleep(0.1)
+        else:
+            print('the server did not start')
+            return 1
+        # check that the server serves the request, since the client
+        # falls back to an in-process run otherwise
+        code = daemon.request(SOCK, ['pyang', '-f', 'tree',
+                                     '-o', 'work/a.tree', 'a.yang'], [])
+        print('served: %s' % code)
+        with open('work/a.tree') as f:
+            sys.stdout.write(f.read())
+        for args in requests:
+            if args == 'edit':
+                with open('imp.yang.in') as f:
+                    text = f.read()
+                with open('work/imp.yang', 'w') as f:
+                    f.write(text.replace('leaf z', 'leaf w')
+                            .replace('import a', 'import e'))
+                continue
+            print('== %s' % ' '.join(args))
+            res = run(pyang + ['--daemon-client', SOCK], args)
+            code, out, err = res
+            print('exit code: %s' % code)
+            sys.stdout.write(out)
+            sys.stdout.write(err)
+            if res != run(pyang, args):
+                print('differs from a direct run')
+                ok = False
+    finally:
+        server.terminate()
+        server.wait()
+    if os.path.exists(SOCK):
+        print('the socket was not removed')
+        ok = False
+    shutil.rmtree('work')
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
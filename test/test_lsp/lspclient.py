@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+# run a scripted session against the language server, and print
+# all messages from the server
+
+import json
+import os
+import subprocess
+import sys
+
+def main():
+    cwd = os.getcwd()
+    p = subprocess.Popen(sys.argv[1:], stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE)
+
+    def send(msg):
+        msg['jsonrpc'] = '2.0'
+        body = json.dumps(msg).encode('utf-8')
+        p.stdin.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        p.stdin.flush()
+
+    def recv():
+        length = None
+        while True:
+            line = p.stdout.readline().strip()
+            if not line:
+                break
+            length = int(line.split(b':')[1])
+        s = p.stdout.read(length).decode('utf-8')
+        s = s.replace('file://' + cwd + '/', '')
+        print(json.dumps(json.loads(s), sort_keys=True))
+
+    def pos(i, line):
+        send({'id': i, 'method': 'textDocument/definition',
+              'params': {'textDocument': {'uri': uri},
+                         'position': {'line': line, 'character': 0}}})
+        recv()
+
+    uri = 'file://' + os.path.join(cwd, 'a.yang')
+    with open('a.yang') as f:
+        text = f.read()
+    send({'id': 1, 'method': 'initialize', 'params': {}})
+    recv()
+    send({'method': 'textDocument/didOpen',
+          'params': {'textDocument': {'uri': uri, 'text': text}}})
+    recv()
+    # type b:t
+    pos(2, 10)
+    # uses b:g
+    pos(3, 15)
+    # leafref path
+    pos(4, 18)
+    send({'id': 5, 'method': 'textDocument/hover',
+          'params': {'textDocument': {'uri': uri},
+                     'position': {'line': 10, 'character': 0}}})
+    recv()
+    send({'method': 'textDocument/didChange',
+          'params': {'textDocument': {'uri': uri},
+                     'contentChanges': [{'text':
+                                         text.replace('b:g', 'b:h')}]}})
+    recv()
+    send({'method': 'textDocument/didChange',
+          'params': {'textDocument': {'uri': uri},
+                     'contentChanges': [{'text': text}]}})
+    recv()
+    # change b, which is both imported and augmented by a
+    buri = 'file://' + os.path.join(cwd, 'b.yang')
+    with open('b.yang') as f:
+        btext = f.read()
+    send({'method': 'textDocument/didOpen',
+          'params': {'textDocument': {'uri': buri, 'text': btext}}})
+    recv()
+    recv()
+    send({'method': 'textDocument/didChange',
+          'params': {'textDocument': {'uri': buri},
+                     'contentChanges': [{'text':
+                                         btext.replace('small',
+                                                       'tiny')}]}})
+    recv()
+    recv()
+    # type at, in the augment
+    pos(7, 29)
+    # leaf l, and type at, on the same line
+    for i, character in ((8, 2), (9, 11)):
+        send({'id': i, 'method': 'textDocument/hover',
+              'params': {'textDocument': {'uri': uri},
+                         'position': {'line': 33, 'character': character}}})
+        recv()
+    # open a new module which cannot be parsed, and a module which
+    # imports it, and then fix the new module
+    nuri = 'file://' + os.path.join(cwd, 'n.yang')
+    ntext = 'module n {\n  namespace "urn:n";\n  prefix n;\n}\n'
+    send({'method': 'textDocument/didOpen',
+          'params': {'textDocument': {'uri': nuri,
+                                      'text': ntext.replace(';', '')}}})
+    recv()
+    recv()
+    recv()
+    curi = 'file://' + os.path.join(cwd, 'c.yang')
+    ctext = ('module c {\n  namespace "urn:c";\n  prefix c;\n'
+             '  import n {\n    prefix n;\n  }\n}\n')
+    send({'method': 'textDocument/didOpen',
+          'params': {'textDocument': {'uri': curi, 'text': ctext}}})
+    for _i in range(4):
+        recv()
+    send({'method': 'textDocument/didChange',
+          'params': {'textDocument': {'uri': nuri},
+                     'contentChanges': [{'text': ntext}]}})
+    for _i in range(4):
+        recv()
+    send({'id': 6, 'method': 'shutdown'})
+    recv()
+    send({'method': 'exit'})
+    return p.wait()
+
+if __name__ == '__main__':
+    sys.exit(main())
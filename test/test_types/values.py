@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# check that types.validate_values gives the same results as
+# str_to_val and validate for each value
+
+import sys
+
+from pyang import context
+from pyang import error
+from pyang import repository
+from pyang import types
+
+VALUES = {
+    'r': ['-11', '-10', '0', '5', '10', '11', 'abc', '0x1', '+1'],
+    'u': ['0', '1', '18446744073709551615', '18446744073709551616', '-1'],
+    'p': ['ab', 'xab', 'a', 'abcdef', 'AB', ''],
+    'tp': ['1', '123', '1234', 'a'],
+    'e': ['a', 'b', 'c', ' a'],
+    'b': ['', 'x', 'x y', 'y x', 'z', 'x x'],
+    'd': ['1.5', '1.50', '1.501', '-1.5', '-1.51', '10', '10.00', 'abc',
+          '1.'],
+    'un': ['3', '6', 'none', 'abc', 'ab', '007'],
+    'bo': ['true', 'false', '1'],
+    'id': ['d1', 't:d1', 'base', 'nope', 'x:d1'],
+}
+
+def check(type_spec, string, module):
+    """Return the value of `string`, and whether it is valid, from
+    str_to_val and validate"""
+    pos = error.Position('values')
+    if isinstance(type_spec, types.UnionTypeSpec):
+        # the value of the first matching member type
+        for t in type_spec.types:
+            val, ok = check(t.i_type_spec, string, module)
+            if ok:
+                return val, ok
+        return None, False
+    errors = []
+    val = type_spec.str_to_val(errors, pos, string, module)
+    if val is None:
+        return None, False
+    return val, type_spec.validate(errors, pos, val, module)
+
+def main():
+    ctx = context.Context(repository.FileRepository('.', use_env=False))
+    with open('t.yang') as f:
+        module = ctx.add_module('t.yang', f.read())
+    ctx.validate()
+    for epos, etag, eargs in ctx.errors:
+        print('%s: %s' % (epos, error.err_to_str(etag, eargs)))
+    ok = True
+    for leaf in module.i_children:
+        type_spec = leaf.search_one('type').i_type_spec
+        strings = VALUES[leaf.arg]
+        values, mask = types.validate_values(type_spec, strings, module)
+        print('%s: %s' % (leaf.arg, ''.join(str(b) for b in mask)))
+        for string, val, bad in zip(strings, values, mask):
+            ref_val, ref_ok = check(type_spec, string, module)
+            if bool(bad) == ref_ok or (ref_ok and val != ref_val):
+                print('  %r: %r, expected %r' %
+                      (string, None if bad else val,
+                       ref_val if ref_ok else None))
+                ok = False
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
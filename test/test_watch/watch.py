@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# run pyang in watch mode, change a module which is both imported and
+# augmented by another module, break it and fix it again, and print
+# the output of each round
+
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+def main():
+    if os.path.exists('work'):
+        shutil.rmtree('work')
+    os.mkdir('work')
+    for f in ('a.yang', 'b.yang'):
+        shutil.copy(f, 'work')
+    # run in work, so that b.yang here is not found when work/b.yang
+    # cannot be parsed
+    cmd = sys.argv[1:] + ['--watch', '--watch-interval', '0.1',
+                          '-f', 'tree', 'a.yang', 'b.yang']
+    p = subprocess.Popen(cmd, cwd='work', stdout=subprocess.PIPE,
+                         stderr=subprocess.STDOUT, universal_newlines=True)
+    # fail instead of waiting forever for a round which never comes
+    timer = threading.Timer(30, p.terminate)
+    timer.start()
+
+    def round(marker):
+        # print the output until the line with marker
+        while True:
+            line = p.stdout.readline()
+            if line == '':
+                return False
+            sys.stdout.write(line)
+            if marker in line:
+                return True
+
+    def edit(old, new):
+        time.sleep(0.5)
+        with open('work/b.yang') as f:
+            text = f.read()
+        # replace the file at once, so that pyang does not read it while
+        # it is written
+        with open('work/b.tmp', 'w') as f:
+            f.write(text.replace(old, new))
+        os.rename('work/b.tmp', 'work/b.yang')
+        sys.stdout.write('--\n')
+
+    # the augmented leaf is the last line of each round
+    ok = round('a:y')
+    if ok:
+        edit('leaf z', 'leaf w')
+        ok = round('a:y')
+    # b cannot be parsed, so only a is printed
+    if ok:
+        edit('leaf w {', 'leaf w {{')
+        ok = round('b:t')
+    # b is fixed
+    if ok:
+        edit('leaf w {{', 'leaf w {')
+        ok = round('a:y')
+    timer.cancel()
+    p.terminate()
+    p.wait()
+    shutil.rmtree('work')
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())